@@ -11,6 +11,7 @@ try:
 except Exception:
     colorama_available = False
 
+from shop_bot.config import parse_bool
 from shop_bot.data_manager import database
 
 def main():
@@ -164,7 +165,7 @@ def main():
             start_support = False
             
             if auto_start:
-                if auto_start in ('1', 'true', 'yes', 'on', 'both', 'all'):
+                if parse_bool(auto_start) or auto_start in ('both', 'all'):
                     start_main = main_configured
                     start_support = support_configured
                 elif auto_start in ('main', 'bot'):
@@ -172,9 +173,9 @@ def main():
                 elif auto_start in ('support', 'support_bot'):
                     start_support = support_configured
             else:
-                if auto_start_main and auto_start_main in ('1', 'true', 'yes', 'on'):
+                if parse_bool(auto_start_main):
                     start_main = main_configured
-                if auto_start_support and auto_start_support in ('1', 'true', 'yes', 'on'):
+                if parse_bool(auto_start_support):
                     start_support = support_configured
             
             # Запускаем боты
@@ -6,15 +6,18 @@ import re
 import html as html_escape
 from datetime import datetime, timedelta
 import secrets
+import sqlite3
 import string
 
 from aiogram import Bot, Router, F, types
-from aiogram.filters import Command, StateFilter
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from shop_bot.bot import keyboards
+from shop_bot.bot.middlewares import add_banned, remove_banned, load_ban_set
 from shop_bot.data_manager import speedtest_runner
 from shop_bot.data_manager import resource_monitor, database
 from shop_bot.data_manager.database import (
@@ -41,6 +44,7 @@ from shop_bot.data_manager.database import (
     get_referral_count,
     get_referral_balance_all,
     get_referrals_for_user,
+    zero_referral_balances_bulk,
     # Promo API
     create_promo_code,
     list_promo_codes,
@@ -53,6 +57,149 @@ from shop_bot.modules.xui_api import create_or_update_key_on_host, delete_client
 
 logger = logging.getLogger(__name__)
 
+_BALANCE_PICK_USER_RE = re.compile(r"^admin_(add|deduct)_balance_(?:pick_user_)?(\d+)$")
+
+# Тексты уведомлений по заявкам на вывод (шаблоны собираются один раз при импорте)
+APPROVE_USER_TMPL = "✅ Ваша заявка на вывод {:.2f} RUB одобрена. Деньги будут переведены в ближайшее время.".format
+DECLINE_USER_MSG = "❌ Ваша заявка на вывод отклонена. Проверьте корректность реквизитов и попробуйте снова."
+APPROVE_ADMIN_TMPL = "✅ Выплата {:.2f} RUB пользователю {} подтверждена.".format
+DECLINE_ADMIN_TMPL = "❌ Заявка пользователя {} отклонена.".format
+WITHDRAW_LOW_BALANCE_MSG = "Баланс пользователя менее 100 руб."
+WITHDRAW_USER_NOT_FOUND_MSG = "Пользователь не найден."
+WITHDRAW_ALREADY_PROCESSED_MSG = "Заявка этого пользователя уже обработана."
+WITHDRAW_DB_ERROR_MSG = "Ошибка базы данных, попробуйте позже"
+
+# Сколько раз рассылка пытается отправить сообщение одному получателю при flood control
+_BROADCAST_SEND_ATTEMPTS = 3
+
+# Ссылки на фоновые задачи уведомлений, чтобы их не собрал GC до завершения
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _fire(coro) -> asyncio.Task:
+    """Запустить корутину в фоне (fire-and-forget), подавив её исключение."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+
+    def _done(t: asyncio.Task):
+        _background_tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            logger.debug(f"Фоновое уведомление не доставлено: {t.exception()}")
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def _notify(bot: Bot, user_id: int, text: str) -> None:
+    """Отправить пользователю уведомление, залогировав типовые ошибки доставки."""
+    try:
+        await bot.send_message(user_id, text)
+    except TelegramRetryAfter as e:
+        logger.warning(f"Уведомление пользователю {user_id} отложено Telegram (retry after {e.retry_after}s)")
+    except TelegramForbiddenError:
+        logger.info(f"Пользователь {user_id} заблокировал бота — уведомление не доставлено")
+    except Exception as e:
+        logger.warning(f"Не удалось отправить уведомление пользователю {user_id}: {e}")
+
+
+# --- Пакетное подтверждение заявок на вывод ---
+# Подтверждения, пришедшие в пределах окна, обнуляются одним UPDATE ... IN (...).
+_APPROVE_BATCH_WINDOW = 0.2  # секунды
+_APPROVE_MAX_BATCH = 50
+_MIN_WITHDRAW_BALANCE = 100
+_approve_queue: asyncio.Queue | None = None
+_approve_flusher: asyncio.Task | None = None
+
+
+def _enqueue_withdraw_approval(bot: Bot, user_id: int) -> asyncio.Future:
+    """Поставить подтверждение вывода в очередь; future вернёт (баланс до обнуления, None)
+    или (None, текст причины отказа для админа).
+    """
+    global _approve_queue, _approve_flusher
+    loop = asyncio.get_running_loop()
+    # Очередь и фоновая задача привязаны к циклу событий: после перезапуска бота создаём заново
+    if _approve_flusher is None or _approve_flusher.done() or _approve_flusher.get_loop() is not loop:
+        _approve_queue = asyncio.Queue()
+        _approve_flusher = asyncio.create_task(_flush_withdraw_approvals(_approve_queue))
+    future = loop.create_future()
+    _approve_queue.put_nowait((bot, user_id, future))
+    return future
+
+
+async def shutdown_withdraw_approvals(timeout: float = 5.0) -> None:
+    """Дообработать уже поставленные в очередь подтверждения, дождаться уведомлений
+    и остановить фоновую задачу. Вызывается при остановке бота, пока его HTTP-сессия открыта.
+    """
+    global _approve_queue, _approve_flusher
+    queue, flusher = _approve_queue, _approve_flusher
+    _approve_queue = _approve_flusher = None
+    if flusher is not None and not flusher.done():
+        # None — сигнал завершения: всё, что стоит в очереди перед ним, будет обработано
+        queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(flusher, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Не удалось дообработать подтверждения вывода до остановки бота")
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not None and not item[2].done():
+                item[2].set_result((None, WITHDRAW_DB_ERROR_MSG))
+    loop = asyncio.get_running_loop()
+    pending = [t for t in _background_tasks if t.get_loop() is loop]
+    if pending:
+        await asyncio.wait(pending, timeout=timeout)
+
+
+async def _flush_withdraw_approvals(queue: asyncio.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        item = await queue.get()
+        if item is None:
+            return
+        batch = [item]
+        deadline = loop.time() + _APPROVE_BATCH_WINDOW
+        while len(batch) < _APPROVE_MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+        try:
+            outcome = zero_referral_balances_bulk(
+                (user_id for _, user_id, _ in batch),
+                min_balance=_MIN_WITHDRAW_BALANCE
+            )
+        except Exception as e:
+            logger.error(f"Не удалось обработать пакет подтверждений вывода: {e}")
+            outcome = None
+        balances, existing = outcome if outcome is not None else ({}, set())
+        processed: set[int] = set()
+        for bot, user_id, future in batch:
+            if outcome is None:
+                result = (None, WITHDRAW_DB_ERROR_MSG)
+            elif user_id in processed:
+                # Повторное подтверждение того же пользователя в пакете не выплачивается дважды
+                result = (None, WITHDRAW_ALREADY_PROCESSED_MSG)
+            elif user_id in balances:
+                result = (balances[user_id], None)
+            elif user_id not in existing:
+                result = (None, WITHDRAW_USER_NOT_FOUND_MSG)
+            else:
+                result = (None, WITHDRAW_LOW_BALANCE_MSG)
+            processed.add(user_id)
+            if not future.done():
+                future.set_result(result)
+            if result[0] is not None:
+                _fire(_notify(bot, user_id, APPROVE_USER_TMPL(result[0])))
+
+
 class Broadcast(StatesGroup):
     waiting_for_message = State()
     waiting_for_button_option = State()
@@ -341,7 +488,7 @@ def get_admin_router() -> Router:
 
         # Выполнить тест (SSH + NET) и сохранить в БД
         try:
-            result = await speedtest_runner.run_both_for_host(host_name)
+            result = await speedtest_runner.run_both_for_host(host_name, force=True)
         except Exception as e:
             result = {"ok": False, "error": str(e), "details": {}}
 
@@ -418,10 +565,9 @@ def get_admin_router() -> Router:
         # пробежимся по хостам
         hosts = get_all_hosts() or []
         summary_lines = []
-        for h in hosts:
-            name = h.get('host_name')
+        results = await speedtest_runner.run_both_for_hosts([h['host_name'] for h in hosts if h.get('host_name')], force=True)
+        for name, res in results.items():
             try:
-                res = await speedtest_runner.run_both_for_host(name)
                 ok = res.get('ok')
                 det = res.get('details') or {}
                 dm = det.get('ssh', {}).get('download_mbps') or det.get('net', {}).get('download_mbps')
@@ -519,6 +665,7 @@ def get_admin_router() -> Router:
         ok = backup_manager.restore_from_file(dest)
         await state.clear()
         if ok:
+            load_ban_set(database.get_banned_user_ids())
             await message.answer("✅ Восстановление выполнено успешно.\nБот и панель продолжают работу с новой БД.")
         else:
             await message.answer("❌ Восстановление не удалось. Проверьте файл и повторите.")
@@ -1178,7 +1325,10 @@ def get_admin_router() -> Router:
             await callback.message.answer("❌ Неверный формат user_id")
             return
         try:
-            ban_user(user_id)
+            if not ban_user(user_id):
+                await callback.message.answer("❌ Не удалось забанить пользователя: ошибка базы данных")
+                return
+            add_banned(user_id)
             await callback.message.answer(f"🚫 Пользователь {user_id} забанен")
             try:
                 # Уведомление пользователю: только кнопка поддержки, без "Назад в меню"
@@ -1306,7 +1456,10 @@ def get_admin_router() -> Router:
             await callback.message.answer("❌ Неверный формат user_id")
             return
         try:
-            unban_user(user_id)
+            if not unban_user(user_id):
+                await callback.message.answer("❌ Не удалось разбанить пользователя: ошибка базы данных")
+                return
+            remove_banned(user_id)
             await callback.message.answer(f"✅ Пользователь {user_id} разбанен")
             try:
                 # Отправляем пользователю уведомление о разбане с кнопкой в главное меню
@@ -2090,18 +2243,14 @@ def get_admin_router() -> Router:
                 f"Email: {generated_email}"
             )
             await message.answer(text_admin)
-            try:
-                notify_text = (
-                    f"🎁 Администратор выдал вам подарочный ключ #{key_id}\n"
-                    f"Сервер: {host_name}\n"
-                    f"Срок: {days} дн.\n"
-                )
-                if connection_link:
-                    cs = html_escape.escape(connection_link)
-                    notify_text += f"\n🔗 Подписка:\n<pre><code>{cs}</code></pre>"
-                await message.bot.send_message(user_id, notify_text, parse_mode='HTML', disable_web_page_preview=True)
-            except Exception:
-                pass
+            cs = html_escape.escape(connection_link) if connection_link else None
+            notify_text = (
+                f"🎁 Администратор выдал вам подарочный ключ #{key_id}\n"
+                f"Сервер: {host_name}\n"
+                f"Срок: {days} дн.\n"
+                + (f"\n🔗 Подписка:\n<pre><code>{cs}</code></pre>" if cs else "")
+            )
+            _fire(message.bot.send_message(user_id, notify_text, parse_mode='HTML', disable_web_page_preview=True))
         else:
             await message.answer("❌ Не удалось сохранить ключ в базе данных.")
         await state.clear()
@@ -2126,24 +2275,6 @@ def get_admin_router() -> Router:
             reply_markup=keyboards.create_admin_users_pick_keyboard(users, page=0, action="add_balance")
         )
 
-    @admin_router.callback_query(F.data.startswith("admin_add_balance_"))
-    async def admin_add_balance_user(callback: types.CallbackQuery, state: FSMContext):
-        if not is_admin(callback.from_user.id):
-            await callback.answer("У вас нет прав.", show_alert=True)
-            return
-        await callback.answer()
-        try:
-            user_id = int(callback.data.split("_")[-1])
-        except Exception:
-            await callback.message.answer("❌ Неверный формат user_id")
-            return
-        await state.update_data(target_user_id=user_id)
-        await state.set_state(AdminMainRefill.waiting_for_amount)
-        await callback.message.edit_text(
-            f"Пользователь {user_id}. Введите сумму начисления (в рублях):",
-            reply_markup=keyboards.create_admin_cancel_keyboard()
-        )
-
     # Пагинация списка пользователей для начисления баланса
     @admin_router.callback_query(F.data.startswith("admin_add_balance_pick_user_page_"))
     async def admin_add_balance_pick_user_page(callback: types.CallbackQuery, state: FSMContext):
@@ -2161,25 +2292,6 @@ def get_admin_router() -> Router:
             reply_markup=keyboards.create_admin_users_pick_keyboard(users, page=page, action="add_balance")
         )
 
-    # Выбор пользователя для начисления: дальше админ вводит только сумму
-    @admin_router.callback_query(F.data.startswith("admin_add_balance_pick_user_"))
-    async def admin_add_balance_pick_user(callback: types.CallbackQuery, state: FSMContext):
-        if not is_admin(callback.from_user.id):
-            await callback.answer("У вас нет прав.", show_alert=True)
-            return
-        await callback.answer()
-        try:
-            user_id = int(callback.data.split("_")[-1])
-        except Exception:
-            await callback.message.answer("❌ Неверный формат user_id")
-            return
-        await state.update_data(target_user_id=user_id)
-        await state.set_state(AdminMainRefill.waiting_for_amount)
-        await callback.message.edit_text(
-            f"Пользователь {user_id}. Введите сумму начисления (в рублях):",
-            reply_markup=keyboards.create_admin_cancel_keyboard()
-        )
-
     @admin_router.message(AdminMainRefill.waiting_for_amount)
     async def handle_main_amount(message: types.Message, state: FSMContext):
         if not is_admin(message.from_user.id):
@@ -2198,10 +2310,7 @@ def get_admin_router() -> Router:
             ok = add_to_balance(user_id, amount)
             if ok:
                 await message.answer(f"✅ Начислено {amount:.2f} RUB на баланс пользователю {user_id}")
-                try:
-                    await message.bot.send_message(user_id, f"💰 Вам начислено {amount:.2f} RUB на баланс администратором.")
-                except Exception:
-                    pass
+                _fire(message.bot.send_message(user_id, f"💰 Вам начислено {amount:.2f} RUB на баланс администратором."))
             else:
                 await message.answer("❌ Пользователь не найден или ошибка БД")
         except Exception as e:
@@ -2233,19 +2342,18 @@ def get_admin_router() -> Router:
         except Exception:
             host_from_state = None
 
+        keys_fn = get_keys_for_host if host_from_state else get_keys_for_user
+        arg = host_from_state or int(key['user_id'])
+        keys = keys_fn(arg)
         if host_from_state:
-            host_name = host_from_state
-            keys = get_keys_for_host(host_name)
             await callback.message.edit_text(
-                f"🔑 Ключи на хосте {host_name}:",
-                reply_markup=keyboards.create_admin_keys_for_host_keyboard(host_name, keys)
+                f"🔑 Ключи на хосте {arg}:",
+                reply_markup=keyboards.create_admin_keys_for_host_keyboard(arg, keys)
             )
         else:
-            user_id = int(key.get('user_id'))
-            keys = get_keys_for_user(user_id)
             await callback.message.edit_text(
-                f"🔑 Ключи пользователя {user_id}:",
-                reply_markup=keyboards.create_admin_user_keys_keyboard(user_id, keys)
+                f"🔑 Ключи пользователя {arg}:",
+                reply_markup=keyboards.create_admin_user_keys_keyboard(arg, keys)
             )
 
     # noop callback to safely ignore placeholder buttons
@@ -2276,25 +2384,6 @@ def get_admin_router() -> Router:
             reply_markup=keyboards.create_admin_users_pick_keyboard(users, page=0, action="deduct_balance")
         )
 
-    # Быстрый путь из карточки пользователя
-    @admin_router.callback_query(F.data.startswith("admin_deduct_balance_"))
-    async def admin_deduct_balance_user(callback: types.CallbackQuery, state: FSMContext):
-        if not is_admin(callback.from_user.id):
-            await callback.answer("У вас нет прав.", show_alert=True)
-            return
-        await callback.answer()
-        try:
-            user_id = int(callback.data.split("_")[-1])
-        except Exception:
-            await callback.message.answer("❌ Неверный формат user_id")
-            return
-        await state.update_data(target_user_id=user_id)
-        await state.set_state(AdminMainDeduct.waiting_for_amount)
-        await callback.message.edit_text(
-            f"Пользователь {user_id}. Введите сумму списания (в рублях):",
-            reply_markup=keyboards.create_admin_cancel_keyboard()
-        )
-
     # Пагинация списка пользователей
     @admin_router.callback_query(F.data.startswith("admin_deduct_balance_pick_user_page_"))
     async def admin_deduct_balance_pick_user_page(callback: types.CallbackQuery, state: FSMContext):
@@ -2312,22 +2401,24 @@ def get_admin_router() -> Router:
             reply_markup=keyboards.create_admin_users_pick_keyboard(users, page=page, action="deduct_balance")
         )
 
-    # Выбор пользователя -> ввод суммы
-    @admin_router.callback_query(F.data.startswith("admin_deduct_balance_pick_user_"))
-    async def admin_deduct_balance_pick_user(callback: types.CallbackQuery, state: FSMContext):
+    # Выбор пользователя (из списка или из карточки пользователя) -> ввод суммы.
+    # Один обработчик на начисление и списание: admin_{add|deduct}_balance[_pick_user]_<id>
+    @admin_router.callback_query(F.data.regexp(_BALANCE_PICK_USER_RE))
+    async def admin_balance_pick_user(callback: types.CallbackQuery, state: FSMContext):
         if not is_admin(callback.from_user.id):
             await callback.answer("У вас нет прав.", show_alert=True)
             return
         await callback.answer()
-        try:
-            user_id = int(callback.data.split("_")[-1])
-        except Exception:
-            await callback.message.answer("❌ Неверный формат user_id")
-            return
+        action, raw_user_id = _BALANCE_PICK_USER_RE.match(callback.data).groups()
+        user_id = int(raw_user_id)
+        if action == "add":
+            next_state, verb = AdminMainRefill.waiting_for_amount, "начисления"
+        else:
+            next_state, verb = AdminMainDeduct.waiting_for_amount, "списания"
         await state.update_data(target_user_id=user_id)
-        await state.set_state(AdminMainDeduct.waiting_for_amount)
+        await state.set_state(next_state)
         await callback.message.edit_text(
-            f"Пользователь {user_id}. Введите сумму списания (в рублях):",
+            f"Пользователь {user_id}. Введите сумму {verb} (в рублях):",
             reply_markup=keyboards.create_admin_cancel_keyboard()
         )
 
@@ -2349,14 +2440,11 @@ def get_admin_router() -> Router:
             ok = deduct_from_balance(user_id, amount)
             if ok:
                 await message.answer(f"✅ Списано {amount:.2f} RUB с баланса пользователя {user_id}")
-                try:
-                    await message.bot.send_message(
-                        user_id,
-                        f"➖ С вашего баланса списано {amount:.2f} RUB администратором.\nЕсли это ошибка — напишите в поддержку.",
-                        reply_markup=keyboards.create_support_keyboard()
-                    )
-                except Exception:
-                    pass
+                _fire(message.bot.send_message(
+                    user_id,
+                    f"➖ С вашего баланса списано {amount:.2f} RUB администратором.\nЕсли это ошибка — напишите в поддержку.",
+                    reply_markup=keyboards.create_support_keyboard()
+                ))
             else:
                 await message.answer("❌ Пользователь не найден или недостаточно средств")
         except Exception as e:
@@ -2530,8 +2618,7 @@ def get_admin_router() -> Router:
         if not key:
             await message.answer("❌ Ключ не найден")
             return
-        host = key.get('host_name')
-        email = key.get('key_email')
+        host, email, user_id = key.get('host_name'), key.get('key_email'), key.get('user_id')
         if not host or not email:
             await message.answer("❌ У ключа отсутствуют данные о хосте или email")
             return
@@ -2551,10 +2638,10 @@ def get_admin_router() -> Router:
             logger.error(f"Extend flow: failed update DB for key #{key_id}: {e}")
         await state.clear()
         await message.answer(f"✅ Ключ #{key_id} продлён на {days} дн.")
-        # Попробуем уведомить пользователя
+        # Уведомляем пользователя в фоне
         try:
-            await message.bot.send_message(int(key.get('user_id')), f"ℹ️ Администратор продлил ваш ключ #{key_id} на {days} дн.")
-        except Exception:
+            _fire(message.bot.send_message(int(user_id), f"ℹ️ Администратор продлил ваш ключ #{key_id} на {days} дн."))
+        except (TypeError, ValueError):
             pass
 
     @admin_router.callback_query(F.data == "start_broadcast")
@@ -2574,13 +2661,26 @@ def get_admin_router() -> Router:
     @admin_router.message(Broadcast.waiting_for_message)
     async def broadcast_message_received_handler(message: types.Message, state: FSMContext):
         # сохраняем оригинальное сообщение целиком, чтобы потом скопировать
-        await state.update_data(message_to_send=message.model_dump_json())
+        await state.update_data(message_to_send=message.model_dump_json(), broadcast_silent=True)
         await message.answer(
             "Сообщение получено. Хотите добавить к нему кнопку со ссылкой?",
-            reply_markup=keyboards.create_broadcast_options_keyboard()
+            reply_markup=keyboards.create_broadcast_options_keyboard(silent=True)
         )
         await state.set_state(Broadcast.waiting_for_button_option)
 
+    @admin_router.callback_query(Broadcast.waiting_for_button_option, F.data == "broadcast_toggle_silent")
+    async def toggle_broadcast_silent_handler(callback: types.CallbackQuery, state: FSMContext):
+        await callback.answer()
+        data = await state.get_data()
+        silent = not data.get('broadcast_silent', True)
+        await state.update_data(broadcast_silent=silent)
+        try:
+            await callback.message.edit_reply_markup(
+                reply_markup=keyboards.create_broadcast_options_keyboard(silent=silent)
+            )
+        except Exception:
+            pass
+
     @admin_router.callback_query(Broadcast.waiting_for_button_option, F.data == "broadcast_add_button")
     async def add_button_prompt_handler(callback: types.CallbackQuery, state: FSMContext):
         await callback.answer()
@@ -2601,9 +2701,9 @@ def get_admin_router() -> Router:
 
     @admin_router.message(Broadcast.waiting_for_button_url)
     async def button_url_received_handler(message: types.Message, state: FSMContext, bot: Bot):
-        url_to_check = message.text
+        url_to_check = (message.text or "").strip()
         # Простая проверка схемы. Дальнейшую валидацию можно расширить при необходимости.
-        if not (url_to_check.startswith("http://") or url_to_check.startswith("https://")):
+        if not url_to_check.startswith(("http://", "https://")):
             await message.answer(
                 "❌ Ссылка должна начинаться с http:// или https://. Попробуйте еще раз.")
             return
@@ -2654,12 +2754,37 @@ def get_admin_router() -> Router:
 
         button_text = data.get('button_text')
         button_url = data.get('button_url')
+        # Тихая рассылка (без звука) — Telegram терпимее относится к массовой отправке таких сообщений
+        disable_notification = bool(data.get('broadcast_silent', True))
 
+        # Клавиатура собирается ровно один раз до цикла рассылки: один и тот же
+        # объект разметки передаётся каждому получателю по ссылке.
         final_keyboard = None
         if button_text and button_url:
             builder = InlineKeyboardBuilder()
             builder.button(text=button_text, url=button_url)
             final_keyboard = builder.as_markup()
+        from_chat_id = original_message.chat.id
+        source_message_id = original_message.message_id
+
+        async def _send(user_id: int):
+            for attempt in range(1, _BROADCAST_SEND_ATTEMPTS + 1):
+                try:
+                    await bot.copy_message(
+                        chat_id=user_id,
+                        from_chat_id=from_chat_id,
+                        message_id=source_message_id,
+                        reply_markup=final_keyboard,
+                        disable_notification=disable_notification
+                    )
+                    return
+                except TelegramRetryAfter as e:
+                    # Flood control: выжидаем указанное Telegram время и повторяем отправку,
+                    # после последней попытки ошибка уходит в счётчик неудачных
+                    if attempt == _BROADCAST_SEND_ATTEMPTS:
+                        raise
+                    logger.warning(f"Broadcast: flood control, retry after {e.retry_after}s (user {user_id})")
+                    await asyncio.sleep(e.retry_after)
 
         await state.clear()
 
@@ -2676,12 +2801,7 @@ def get_admin_router() -> Router:
                 banned_count += 1
                 continue
             try:
-                await bot.copy_message(
-                    chat_id=user_id,
-                    from_chat_id=original_message.chat.id,
-                    message_id=original_message.message_id,
-                    reply_markup=final_keyboard
-                )
+                await _send(user_id)
                 sent_count += 1
                 await asyncio.sleep(0.1)
             except Exception as e:
@@ -2703,39 +2823,56 @@ def get_admin_router() -> Router:
         await show_admin_menu(callback.message, edit_message=True)
 
     # --- Админ-команды для управления заявками на вывод ---
-    @admin_router.message(Command(commands=["approve_withdraw"]))
-    async def approve_withdraw_handler(message: types.Message):
+    @admin_router.message(Command(commands=["approve_withdraw"], magic=F.args.regexp(r"^\d+$")))
+    async def approve_withdraw_handler(message: types.Message, command: CommandObject):
         if not is_admin(message.from_user.id):
             return
-        try:
-            user_id = int(message.text.split("_")[-1])
-            user = get_user(user_id)
-            balance = user.get('referral_balance', 0)
-            if balance < 100:
-                await message.answer("Баланс пользователя менее 100 руб.")
-                return
-            set_referral_balance(user_id, 0)
-            set_referral_balance_all(user_id, 0)
-            await message.answer(f"✅ Выплата {balance:.2f} RUB пользователю {user_id} подтверждена.")
-            await message.bot.send_message(
-                user_id,
-                f"✅ Ваша заявка на вывод {balance:.2f} RUB одобрена. Деньги будут переведены в ближайшее время."
-            )
-        except Exception as e:
-            await message.answer(f"Ошибка: {e}")
+        user_id = int(command.args)
+        # Порог проверяется внутри UPDATE — отдельное чтение строки пользователя не нужно
+        balance, error = await _enqueue_withdraw_approval(message.bot, user_id)
+        if error:
+            await message.answer(error)
+            return
+        await message.answer(APPROVE_ADMIN_TMPL(balance, user_id))
+
+    @admin_router.message(Command(commands=["decline_withdraw"], magic=F.args.regexp(r"^\d+$")))
+    async def decline_withdraw_handler(message: types.Message, command: CommandObject):
+        if not is_admin(message.from_user.id):
+            return
+        user_id = int(command.args)
+        await message.answer(DECLINE_ADMIN_TMPL(user_id))
+        _fire(_notify(message.bot, user_id, DECLINE_USER_MSG))
 
-    @admin_router.message(Command(commands=["decline_withdraw"]))
-    async def decline_withdraw_handler(message: types.Message):
+    # Команда без аргумента или с нечисловым user_id — отсекается фильтром magic выше
+    @admin_router.message(Command(commands=["approve_withdraw", "decline_withdraw"]))
+    async def withdraw_bad_args_handler(message: types.Message):
         if not is_admin(message.from_user.id):
             return
+        await message.answer("Ошибка: bad user id")
+
+    # Единый обработчик ошибок админ-роутера вместо try/except в каждом хендлере.
+    # Ошибки из других роутеров тоже проходят через него, поэтому фильтр пропускает только
+    # сообщения админов; остальные ошибки остаются необработанными и логируются диспетчером
+    def _error_from_admin(event: types.ErrorEvent) -> bool:
+        message = event.update.message
+        return message is not None and message.from_user is not None and is_admin(message.from_user.id)
+
+    @admin_router.errors(_error_from_admin)
+    async def admin_error_handler(event: types.ErrorEvent):
+        exc = event.exception
+        logger.error(f"Admin handler error: {exc}", exc_info=exc)
+        message = event.update.message
+        if isinstance(exc, ValueError):
+            text = "Ошибка: некорректные данные"
+        elif isinstance(exc, sqlite3.Error):
+            text = "Ошибка базы данных, попробуйте позже"
+        elif isinstance(exc, TelegramAPIError):
+            text = "Ошибка Telegram API, попробуйте позже"
+        else:
+            text = "Ошибка: не удалось выполнить команду"
         try:
-            user_id = int(message.text.split("_")[-1])
-            await message.answer(f"❌ Заявка пользователя {user_id} отклонена.")
-            await message.bot.send_message(
-                user_id,
-                "❌ Ваша заявка на вывод отклонена. Проверьте корректность реквизитов и попробуйте снова."
-            )
-        except Exception as e:
-            await message.answer(f"Ошибка: {e}")
+            await message.answer(text)
+        except Exception:
+            pass
 
     return admin_router
@@ -1,14 +1,17 @@
 import logging
 import hashlib
 import re
+import functools
+import itertools
+import time
 
-from datetime import datetime
-from typing import Callable
+from types import MappingProxyType
+from typing import Callable, NamedTuple
 
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from shop_bot.data_manager.database import get_setting, normalize_host_name
+from shop_bot.data_manager.database import get_button_configs, get_setting, get_settings_bulk, normalize_host_name
 
 logger = logging.getLogger(__name__)
 
@@ -17,38 +20,132 @@ main_reply_keyboard = ReplyKeyboardMarkup(
     resize_keyboard=True
 )
 
+_EMPTY_DICT = MappingProxyType({})
+
+def _lbl(settings: dict, key: str, default: str) -> str:
+    """Подпись кнопки из настроек или значение по умолчанию."""
+    return settings.get(key) or default
+
+# Повторяющиеся подписи и callback_data
+_CANCEL_TEXT = "❌ Отмена"
+_BACK_TEXT = "⬅️ Назад"
+_BACK_TO_MENU_TEXT = "⬅️ Назад в меню"
+_ADMIN_MENU_CB = "admin_menu"
+_ADMIN_CANCEL_CB = "admin_cancel"
+_BACK_TO_MAIN_MENU_CB = "back_to_main_menu"
+
+# Неизменяемые кнопки, общие для многих клавиатур
+_BTN_ADMIN_BACK = InlineKeyboardButton(text="⬅️ В админ-меню", callback_data=_ADMIN_MENU_CB)
+_BTN_CANCEL_ADMIN = InlineKeyboardButton(text=_CANCEL_TEXT, callback_data=_ADMIN_CANCEL_CB)
+_BTN_BACK_TO_MENU = InlineKeyboardButton(text=_BACK_TO_MENU_TEXT, callback_data=_BACK_TO_MAIN_MENU_CB)
+_BTN_CANCEL_BROADCAST = InlineKeyboardButton(text=_CANCEL_TEXT, callback_data="cancel_broadcast")
+
+
+@functools.lru_cache(maxsize=8)
+def _back_to_menu_button(label: str | None) -> InlineKeyboardButton:
+    """Кнопка «Назад в меню» с подписью из настроек (по умолчанию — общая константа)."""
+    if not label:
+        return _BTN_BACK_TO_MENU
+    return InlineKeyboardButton(text=label, callback_data=_BACK_TO_MAIN_MENU_CB)
+
+# Наборы настроек, которые клавиатуры читают одним запросом
+_MAIN_MENU_KEYS = (
+    "btn_try", "btn_profile", "btn_my_keys", "btn_buy_key", "btn_top_up",
+    "btn_referral", "btn_support", "btn_about", "btn_howto", "btn_speed", "btn_admin",
+)
+_ABOUT_KEYS = ("btn_channel", "btn_terms", "btn_privacy", "btn_back_to_menu")
+_SUPPORT_KEYS = ("support_bot_username", "support_user", "btn_support", "btn_back_to_menu")
+_SUPPORT_LINK_KEYS = ("btn_support_open", "btn_back_to_menu")
+_SUPPORT_MENU_KEYS = ("btn_support_new_ticket", "btn_support_my_tickets", "btn_support_external", "btn_back_to_menu")
+_SKIP_EMAIL_KEYS = ("btn_skip_email", "btn_back_to_plans")
+_PAYMENT_METHOD_KEYS = ("btn_pay_with_balance", "sbp_enabled", "btn_back")
+# Кнопки платформ в инструкции: (ключ настройки, текст по умолчанию, callback_data)
+_HOWTO_PLATFORMS = (
+    ("btn_howto_android", "📱 Android", "howto_android"),
+    ("btn_howto_ios", "📱 iOS", "howto_ios"),
+    ("btn_howto_windows", "💻 Windows", "howto_windows"),
+    ("btn_howto_linux", "🐧 Linux", "howto_linux"),
+)
+_HOWTO_PLATFORM_KEYS = tuple(skey for skey, _, _ in _HOWTO_PLATFORMS)
+_HOWTO_KEY_KEYS = _HOWTO_PLATFORM_KEYS + ("btn_back_to_key",)
+_PAYMENT_CHECK_KEYS = ("btn_go_to_payment", "btn_check_payment")
+_TOPUP_KEYS = ("sbp_enabled", "btn_back_to_menu")
+_KEYS_MANAGEMENT_KEYS = ("btn_buy_key", "btn_back_to_menu")
+_KEY_INFO_KEYS = ("btn_extend_key", "btn_show_qr", "btn_instruction", "btn_switch_server", "btn_back_to_keys")
+_HOWTO_KEYS = _HOWTO_PLATFORM_KEYS + ("btn_back_to_menu",)
+_PROFILE_KEYS = ("btn_top_up", "btn_referral", "btn_back_to_menu")
+
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
 
+# Сколько символов email показывать в строке ключа в админском списке
+_KEY_TITLE_EMAIL_MAX = 24
+_HOST_CB_RE = re.compile(r"select_host:([^:]*):([^:]*):(.*)", re.DOTALL)
+
+
+@functools.lru_cache(maxsize=512)
 def encode_host_callback_token(host_name: str) -> str:
     """Сформировать короткий ASCII-токен для host_name для использования в callback_data."""
     normalized = normalize_host_name(host_name)
-    slug = re.sub(r"[^a-z0-9]+", "-", normalized.lower()).strip("-")
+    slug = _SLUG_RE.sub("-", normalized.lower()).strip("-")
     slug = slug[:24]
-    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:8]
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=4).hexdigest()
     if slug:
         return f"{slug}-{digest}"
     return digest
 
 
 def parse_host_callback_data(data: str) -> tuple[str, str, str] | None:
-    if not data or not data.startswith("select_host:"):
-        return None
-    parts = data.split(":", 3)
-    if len(parts) != 4:
+    m = _HOST_CB_RE.match(data or "")
+    if not m:
         return None
-    _, action, extra, token = parts
+    action, extra, token = m.groups()
     return action, extra or "-", token
 
 
 def find_host_by_callback_token(hosts: list[dict], token: str) -> dict | None:
     if not token:
         return None
-    for host in hosts or []:
-        if encode_host_callback_token(host.get('host_name', '')) == token:
-            return host
-    return None
+    return next(
+        (host for host in hosts or [] if encode_host_callback_token(host.get('host_name', '')) == token),
+        None,
+    )
+
+
+# --- Кеш конфигураций кнопок (меняются только из веб-панели) ---
+_CFG_CACHE_TTL = 60.0
+_CFG_CACHE: dict[str, tuple[float, list[dict]]] = {}
+
+
+def _get_button_configs_cached(menu_type: str) -> list[dict]:
+    now = time.monotonic()
+    cached = _CFG_CACHE.get(menu_type)
+    if cached and now - cached[0] < _CFG_CACHE_TTL:
+        return cached[1]
+    configs = get_button_configs(menu_type)
+    _CFG_CACHE[menu_type] = (now, configs)
+    return configs
+
+
+def invalidate_button_configs(menu_type: str | None = None) -> None:
+    """Сбросить кеш конфигураций кнопок для одного меню или целиком."""
+    if menu_type is None:
+        _CFG_CACHE.clear()
+    else:
+        _CFG_CACHE.pop(menu_type, None)
 
 
 # --- Generic builder from DB configs ---
+class _Btn(NamedTuple):
+    text: str
+    cb: str | None
+    url: str | None
+    width: int
+    row: int
+    col: int
+    sort: int
+
+
 def _build_keyboard_from_db(
     menu_type: str,
     text_replacements: dict[str, str] | None = None,
@@ -58,10 +155,9 @@ def _build_keyboard_from_db(
     Returns None if configs are missing or on error.
     """
     try:
-        from shop_bot.data_manager.database import get_button_configs
-        configs = get_button_configs(menu_type)
+        configs = _get_button_configs_cached(menu_type)
     except Exception as e:
-        logger.warning(f"DB configs for {menu_type} not available: {e}")
+        logger.warning("DB configs for %s not available: %s", menu_type, e)
         return None
 
     if not configs:
@@ -69,9 +165,17 @@ def _build_keyboard_from_db(
 
     builder = InlineKeyboardBuilder()
 
-    # Group by row, keep positions and widths
-    rows: dict[int, list[dict]] = {}
-    added: set[str] = set()
+    # Active buttons in config order (the sort below is stable); first config per button_id wins
+    buttons: list[_Btn] = []
+    seen_ids: set[str] = set()
+
+    # Все подстановки за один проход по строке
+    repl_re = None
+    if text_replacements:
+        repl_map = {k: str(v) for k, v in text_replacements.items() if k}
+        if repl_map:
+            repl_re = re.compile("|".join(map(re.escape, sorted(repl_map, key=len, reverse=True))))
+            repl_first = frozenset(k[0] for k in repl_map)
 
     for cfg in configs:
         if not cfg.get('is_active', True):
@@ -79,102 +183,66 @@ def _build_keyboard_from_db(
         if filter_func and not filter_func(cfg):
             continue
 
-        text = cfg.get('text', '') or ''
+        text = cfg['text']
         callback_data = cfg.get('callback_data')
         url = cfg.get('url')
-        button_id = (cfg.get('button_id') or '').strip()
+        button_id = cfg['button_id']
 
         if not callback_data and not url:
             continue
 
         # Deduplicate by button_id if provided
         if button_id:
-            if button_id in added:
+            if button_id in seen_ids:
                 continue
-            added.add(button_id)
+            seen_ids.add(button_id)
 
         # Apply text replacements (e.g., counts)
-        if text_replacements:
-            try:
-                for k, v in text_replacements.items():
-                    text = text.replace(k, str(v))
-            except Exception:
-                pass
+        if repl_re is not None and any(ch in text for ch in repl_first):
+            text = repl_re.sub(lambda m: repl_map[m.group(0)], text)
+
+        buttons.append(_Btn(
+            text, callback_data, url,
+            cfg['button_width'], cfg['row_position'], cfg['column_position'], cfg['sort_order'],
+        ))
 
-        row_pos = int(cfg.get('row_position', 0) or 0)
-        col_pos = int(cfg.get('column_position', 0) or 0)
-        sort_order = int(cfg.get('sort_order', 0) or 0)
-        width = int(cfg.get('button_width', 1) or 1)
-
-        rows.setdefault(row_pos, []).append({
-            'text': text,
-            'callback_data': callback_data,
-            'url': url,
-            'width': max(1, min(width, 3)),
-            'col': col_pos,
-            'sort': sort_order,
-        })
-
-    if not rows:
+    if not buttons:
         return None
+    buttons.sort(key=lambda b: (b.row, b.col, b.sort))
 
     # Build keyboard respecting row positions and button widths
     # In Telegram: width 1 = half row, width 2+ = full row
-    for row_idx in sorted(rows.keys()):
-        row_buttons = sorted(rows[row_idx], key=lambda b: (b['col'], b['sort']))
-        
-        # Process buttons for this row position
+    for _, row_group in itertools.groupby(buttons, key=lambda b: b.row):
+        row_buttons = list(row_group)
+        btns = [
+            InlineKeyboardButton(text=b.text, callback_data=b.cb) if b.cb
+            else InlineKeyboardButton(text=b.text, url=b.url)
+            for b in row_buttons
+        ]
+        widths = [b.width for b in row_buttons]
+
+        # Width 1 - pair with next button if it also has width 1
         i = 0
-        while i < len(row_buttons):
-            btn = row_buttons[i]
-            button_width = btn['width']
-            
-            # Width 2+ means full row
-            if button_width >= 2:
-                # Add as single button in row
-                if btn['callback_data']:
-                    builder.row(InlineKeyboardButton(text=btn['text'], callback_data=btn['callback_data']))
-                elif btn['url']:
-                    builder.row(InlineKeyboardButton(text=btn['text'], url=btn['url']))
-                i += 1
+        while i < len(btns):
+            if widths[i] == 1 and i + 1 < len(btns) and widths[i + 1] == 1:
+                builder.row(btns[i], btns[i + 1])
+                i += 2
             else:
-                # Width 1 - try to pair with next button if it also has width 1
-                if i + 1 < len(row_buttons) and row_buttons[i + 1]['width'] == 1:
-                    # Add two buttons in one row
-                    btn2 = row_buttons[i + 1]
-                    buttons = []
-                    
-                    if btn['callback_data']:
-                        buttons.append(InlineKeyboardButton(text=btn['text'], callback_data=btn['callback_data']))
-                    elif btn['url']:
-                        buttons.append(InlineKeyboardButton(text=btn['text'], url=btn['url']))
-                    
-                    if btn2['callback_data']:
-                        buttons.append(InlineKeyboardButton(text=btn2['text'], callback_data=btn2['callback_data']))
-                    elif btn2['url']:
-                        buttons.append(InlineKeyboardButton(text=btn2['text'], url=btn2['url']))
-                    
-                    builder.row(*buttons)
-                    i += 2
-                else:
-                    # Single button with width 1 - add alone
-                    if btn['callback_data']:
-                        builder.row(InlineKeyboardButton(text=btn['text'], callback_data=btn['callback_data']))
-                    elif btn['url']:
-                        builder.row(InlineKeyboardButton(text=btn['text'], url=btn['url']))
-                    i += 1
+                builder.row(btns[i])
+                i += 1
 
     return builder.as_markup()
 
 
 def create_main_menu_keyboard(user_keys: list, trial_available: bool, is_admin: bool) -> InlineKeyboardMarkup:
+    show_trial = trial_available and get_setting("trial_enabled") == "true"
+
     # Prepare filters and replacements for main menu
     def _filter(cfg: dict) -> bool:
-        button_id = (cfg.get('button_id') or '').strip()
+        button_id = cfg['button_id']
         # Filter trial button
-        if button_id == 'btn_try':
-            if not trial_available or get_setting("trial_enabled") != "true":
-                return False
+        if button_id == 'btn_try' and not show_trial:
+            return False
         # Filter admin button
         if button_id == 'btn_admin' and not is_admin:
             return False
@@ -191,147 +259,28 @@ def create_main_menu_keyboard(user_keys: list, trial_available: bool, is_admin:
     if kb:
         return kb
     
-    # Fallback to original implementation if DB config not available
+    # Fallback to hardcoded layout if DB config not available
+    logger.debug("Using fallback hardcoded button logic")
     builder = InlineKeyboardBuilder()
-    
-    # Try to get button configurations from database first
-    try:
-        from shop_bot.data_manager.database import get_button_configs
-        button_configs = get_button_configs('main_menu')
-
-        logger.info(f"Loaded {len(button_configs)} button configs from database")
-
-        if button_configs:
-            # Группируем по строкам с учётом позиций
-            rows: dict[int, list[dict]] = {}
-            added_buttons: set[str] = set()
-
-            for cfg in button_configs:
-                if not cfg.get('is_active', True):
-                    continue
-
-                text = cfg.get('text', '') or ''
-                callback_data = cfg.get('callback_data')
-                url = cfg.get('url')
-                button_id = cfg.get('button_id', '') or ''
-
-                # Пропускаем пустые действия
-                if not callback_data and not url:
-                    continue
-
-                # Фильтры по условиям (trial/admin)
-                if button_id == 'btn_try':
-                    if not trial_available or get_setting("trial_enabled") != "true":
-                        continue
-                if button_id == 'btn_admin' and not is_admin:
-                    continue
-
-                # Подстановка счётчика ключей
-                if button_id == 'btn_my_keys':
-                    try:
-                        text = text.replace('{count}', str(len(user_keys))).replace('((count))', f'({len(user_keys)})')
-                    except Exception:
-                        pass
-
-                # Исключаем дубликаты по button_id
-                if button_id:
-                    if button_id in added_buttons:
-                        logger.warning(f"Duplicate button detected: {button_id}, skipping")
-                        continue
-                    added_buttons.add(button_id)
-
-                row_pos = int(cfg.get('row_position', 0) or 0)
-                col_pos = int(cfg.get('column_position', 0) or 0)
-                sort_order = int(cfg.get('sort_order', 0) or 0)
-                width = int(cfg.get('button_width', 1) or 1)
-
-                rows.setdefault(row_pos, []).append({
-                    'text': text,
-                    'callback_data': callback_data,
-                    'url': url,
-                    'width': max(1, min(int(width), 3)),
-                    'col': col_pos,
-                    'sort': sort_order,
-                })
-
-            # Функция добавления кнопки в билдер
-            def _add(btn: dict):
-                if btn['callback_data']:
-                    builder.button(text=btn['text'], callback_data=btn['callback_data'])
-                elif btn['url']:
-                    builder.button(text=btn['text'], url=btn['url'])
-
-            # Build keyboard respecting row positions and button widths
-            # In Telegram: width 1 = half row, width 2+ = full row
-            for row_idx in sorted(rows.keys()):
-                row_buttons = sorted(rows[row_idx], key=lambda b: (b['col'], b['sort']))
-                
-                # Process buttons for this row position
-                i = 0
-                while i < len(row_buttons):
-                    btn = row_buttons[i]
-                    button_width = btn['width']
-                    
-                    # Width 2+ means full row
-                    if button_width >= 2:
-                        # Add as single button in row
-                        if btn['callback_data']:
-                            builder.row(InlineKeyboardButton(text=btn['text'], callback_data=btn['callback_data']))
-                        elif btn['url']:
-                            builder.row(InlineKeyboardButton(text=btn['text'], url=btn['url']))
-                        i += 1
-                    else:
-                        # Width 1 - try to pair with next button if it also has width 1
-                        if i + 1 < len(row_buttons) and row_buttons[i + 1]['width'] == 1:
-                            # Add two buttons in one row
-                            btn2 = row_buttons[i + 1]
-                            buttons = []
-                            
-                            if btn['callback_data']:
-                                buttons.append(InlineKeyboardButton(text=btn['text'], callback_data=btn['callback_data']))
-                            elif btn['url']:
-                                buttons.append(InlineKeyboardButton(text=btn['text'], url=btn['url']))
-                            
-                            if btn2['callback_data']:
-                                buttons.append(InlineKeyboardButton(text=btn2['text'], callback_data=btn2['callback_data']))
-                            elif btn2['url']:
-                                buttons.append(InlineKeyboardButton(text=btn2['text'], url=btn2['url']))
-                            
-                            builder.row(*buttons)
-                            i += 2
-                        else:
-                            # Single button with width 1 - add alone
-                            if btn['callback_data']:
-                                builder.row(InlineKeyboardButton(text=btn['text'], callback_data=btn['callback_data']))
-                            elif btn['url']:
-                                builder.row(InlineKeyboardButton(text=btn['text'], url=btn['url']))
-                            i += 1
-
-
-            return builder.as_markup()
-    except Exception as e:
-        logger.warning(f"Failed to load button configs from database: {e}, falling back to settings")
-    
-    # Fallback to original hardcoded logic
-    logger.info("Using fallback hardcoded button logic")
-    if trial_available and get_setting("trial_enabled") == "true":
-        builder.button(text=(get_setting("btn_try") or "🎁 Попробовать бесплатно"), callback_data="get_trial")
+    st = get_settings_bulk(_MAIN_MENU_KEYS)
+    if show_trial:
+        builder.button(text=_lbl(st, "btn_try", "🎁 Попробовать бесплатно"), callback_data="get_trial")
 
-    builder.button(text=(get_setting("btn_profile") or "👤 Мой профиль"), callback_data="show_profile")
-    keys_label_tpl = (get_setting("btn_my_keys") or "🔑 Мои ключи ({count})")
+    builder.button(text=_lbl(st, "btn_profile", "👤 Мой профиль"), callback_data="show_profile")
+    keys_label_tpl = _lbl(st, "btn_my_keys", "🔑 Мои ключи ({count})")
     builder.button(text=keys_label_tpl.replace("{count}", str(len(user_keys))), callback_data="manage_keys")
-    builder.button(text=(get_setting("btn_buy_key") or "💳 Купить ключ"), callback_data="buy_new_key")
-    builder.button(text=(get_setting("btn_top_up") or "➕ Пополнить баланс"), callback_data="top_up_start")
-    builder.button(text=(get_setting("btn_referral") or "🤝 Реферальная программа"), callback_data="show_referral_program")
-    builder.button(text=(get_setting("btn_support") or "🆘 Поддержка"), callback_data="show_help")
-    builder.button(text=(get_setting("btn_about") or "ℹ️ О проекте"), callback_data="show_about")
-    builder.button(text=(get_setting("btn_howto") or "❓ Как использовать"), callback_data="howto_vless")
-    builder.button(text=(get_setting("btn_speed") or "⚡ Тест скорости"), callback_data="user_speedtest")
+    builder.button(text=_lbl(st, "btn_buy_key", "💳 Купить ключ"), callback_data="buy_new_key")
+    builder.button(text=_lbl(st, "btn_top_up", "➕ Пополнить баланс"), callback_data="top_up_start")
+    builder.button(text=_lbl(st, "btn_referral", "🤝 Реферальная программа"), callback_data="show_referral_program")
+    builder.button(text=_lbl(st, "btn_support", "🆘 Поддержка"), callback_data="show_help")
+    builder.button(text=_lbl(st, "btn_about", "ℹ️ О проекте"), callback_data="show_about")
+    builder.button(text=_lbl(st, "btn_howto", "❓ Как использовать"), callback_data="howto_vless")
+    builder.button(text=_lbl(st, "btn_speed", "⚡ Тест скорости"), callback_data="user_speedtest")
     if is_admin:
-        builder.button(text=(get_setting("btn_admin") or "⚙️ Админка"), callback_data="admin_menu")
+        builder.button(text=_lbl(st, "btn_admin", "⚙️ Админка"), callback_data=_ADMIN_MENU_CB)
 
     layout = [
-        1 if trial_available and get_setting("trial_enabled") == "true" else 0,  # триал
+        1 if show_trial else 0,  # триал
         2,  # профиль + мои ключи
         2,  # купить ключ + пополнить баланс
         1,  # рефералка
@@ -362,54 +311,59 @@ def create_admin_menu_keyboard() -> InlineKeyboardMarkup:
     builder.button(text="👮 Администраторы", callback_data="admin_admins_menu")
     builder.button(text="🎟 Промокоды", callback_data="admin_promo_menu")
     builder.button(text="📢 Рассылка", callback_data="start_broadcast")
-    builder.button(text="⬅️ Назад в меню", callback_data="back_to_main_menu")
+    builder.add(_BTN_BACK_TO_MENU)
     builder.adjust(2, 2, 2, 2, 1, 1, 1)
     return builder.as_markup()
 
+@functools.cache
 def create_admins_menu_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="➕ Добавить админа", callback_data="admin_add_admin")
     builder.button(text="➖ Снять админа", callback_data="admin_remove_admin")
     builder.button(text="📋 Список админов", callback_data="admin_view_admins")
-    builder.button(text="⬅️ В админ-меню", callback_data="admin_menu")
+    builder.add(_BTN_ADMIN_BACK)
     builder.adjust(2, 2)
     return builder.as_markup()
 
 
+@functools.cache
 def create_admin_monitor_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text="🔄 Обновить", callback_data="admin_monitor_refresh")
-    builder.button(text="⬅️ В админ-меню", callback_data="admin_menu")
-    builder.adjust(1, 1)
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_monitor_refresh")],
+        [_BTN_ADMIN_BACK],
+    ])
 
-def create_admin_users_keyboard(users: list[dict], page: int = 0, page_size: int = 10) -> InlineKeyboardMarkup:
+@functools.lru_cache(maxsize=64)
+def _render_admin_users_page(page_users: tuple[tuple[int, str], ...], page: int, page_size: int, total: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    start = page * page_size
-    end = start + page_size
-    for u in users[start:end]:
-        user_id = u.get('telegram_id') or u.get('user_id') or u.get('id')
-        username = u.get('username') or '—'
+    end = page * page_size + page_size
+    for user_id, username in page_users:
         title = f"{user_id} • @{username}" if username != '—' else f"{user_id}"
         builder.button(text=title, callback_data=f"admin_view_user_{user_id}")
     # pagination
-    total = len(users)
     have_prev = page > 0
     have_next = end < total
     if have_prev:
-        builder.button(text="⬅️ Назад", callback_data=f"admin_users_page_{page-1}")
+        builder.button(text=_BACK_TEXT, callback_data=f"admin_users_page_{page-1}")
     if have_next:
         builder.button(text="Вперёд ➡️", callback_data=f"admin_users_page_{page+1}")
-    builder.button(text="⬅️ В админ-меню", callback_data="admin_menu")
+    builder.add(_BTN_ADMIN_BACK)
     # layout: list (1 per row), then pagination/buttons (2), then back (1)
-    rows = [1] * len(users[start:end])
-    tail = []
+    rows = (1,) * len(page_users)
     if have_prev or have_next:
-        tail.append(2 if (have_prev and have_next) else 1)
-    tail.append(1)
-    builder.adjust(*(rows + tail if rows else ([2] if (have_prev or have_next) else []) + [1]))
+        rows += (2 if (have_prev and have_next) else 1,)
+    builder.adjust(*rows, 1)
     return builder.as_markup()
 
+def create_admin_users_keyboard(users: list[dict], page: int = 0, page_size: int = 10) -> InlineKeyboardMarkup:
+    start = page * page_size
+    page_users = tuple(
+        (u.get('telegram_id') or u.get('user_id') or u.get('id'), u.get('username') or '—')
+        for u in users[start:start + page_size]
+    )
+    return _render_admin_users_page(page_users, page, page_size, len(users))
+
+@functools.lru_cache(maxsize=256)
 def create_admin_user_actions_keyboard(user_id: int, is_banned: bool | None = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="➕ Начислить баланс", callback_data=f"admin_add_balance_{user_id}")
@@ -422,7 +376,7 @@ def create_admin_user_actions_keyboard(user_id: int, is_banned: bool | None = No
         builder.button(text="🚫 Забанить", callback_data=f"admin_ban_user_{user_id}")
     builder.button(text="✏️ Ключи пользователя", callback_data=f"admin_user_keys_{user_id}")
     builder.button(text="⬅️ К списку", callback_data="admin_users")
-    builder.button(text="⬅️ В админ-меню", callback_data="admin_menu")
+    builder.add(_BTN_ADMIN_BACK)
     # Сделаем шире: 2 колонки, затем назад и в админ-меню
     builder.adjust(2, 2, 2, 2, 1)
     return builder.as_markup()
@@ -438,10 +392,11 @@ def create_admin_user_keys_keyboard(user_id: int, keys: list[dict]) -> InlineKey
             builder.button(text=title, callback_data=f"admin_edit_key_{kid}")
     else:
         builder.button(text="Ключей нет", callback_data="noop")
-    builder.button(text="⬅️ Назад", callback_data=f"admin_view_user_{user_id}")
+    builder.button(text=_BACK_TEXT, callback_data=f"admin_view_user_{user_id}")
     builder.adjust(1)
     return builder.as_markup()
 
+@functools.lru_cache(maxsize=256)
 def create_admin_key_actions_keyboard(key_id: int, user_id: int | None = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="🌍 Изменить сервер", callback_data=f"admin_key_edit_host_{key_id}")
@@ -456,90 +411,89 @@ def create_admin_key_actions_keyboard(key_id: int, user_id: int | None = None) -
     return builder.as_markup()
 
 def create_admin_delete_key_confirm_keyboard(key_id: int) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text="✅ Подтвердить удаление", callback_data=f"admin_key_delete_confirm_{key_id}")
-    builder.button(text="❌ Отмена", callback_data=f"admin_key_delete_cancel_{key_id}")
-    builder.adjust(1)
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Подтвердить удаление", callback_data=f"admin_key_delete_confirm_{key_id}")],
+        [InlineKeyboardButton(text=_CANCEL_TEXT, callback_data=f"admin_key_delete_cancel_{key_id}")],
+    ])
 
+@functools.cache
 def create_admin_cancel_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[[_BTN_CANCEL_ADMIN]])
 
+@functools.cache
 def create_admin_promo_code_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text="🎲 Сгенерировать код", callback_data="admin_promo_gen_code")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
-    builder.adjust(1)
-    return builder.as_markup()
-
-def create_broadcast_options_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text="➕ Добавить кнопку", callback_data="broadcast_add_button")
-    builder.button(text="➡️ Пропустить", callback_data="broadcast_skip_button")
-    builder.button(text="❌ Отмена", callback_data="cancel_broadcast")
-    builder.adjust(2, 1)
-    return builder.as_markup()
-
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🎲 Сгенерировать код", callback_data="admin_promo_gen_code")],
+        [_BTN_CANCEL_ADMIN],
+    ])
+
+@functools.cache
+def create_broadcast_options_keyboard(silent: bool = True) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="➕ Добавить кнопку", callback_data="broadcast_add_button"),
+            InlineKeyboardButton(text="➡️ Пропустить", callback_data="broadcast_skip_button"),
+        ],
+        [InlineKeyboardButton(text=("☑️ Без звука" if silent else "⬜️ Без звука"), callback_data="broadcast_toggle_silent")],
+        [_BTN_CANCEL_BROADCAST],
+    ])
+
+@functools.cache
 def create_broadcast_confirmation_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text="✅ Отправить всем", callback_data="confirm_broadcast")
-    builder.button(text="❌ Отмена", callback_data="cancel_broadcast")
-    builder.adjust(2)
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="✅ Отправить всем", callback_data="confirm_broadcast"),
+        _BTN_CANCEL_BROADCAST,
+    ]])
 
+@functools.cache
 def create_broadcast_cancel_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text="❌ Отмена", callback_data="cancel_broadcast")
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[[_BTN_CANCEL_BROADCAST]])
 
 def create_about_keyboard(channel_url: str | None, terms_url: str | None, privacy_url: str | None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
+    st = get_settings_bulk(_ABOUT_KEYS)
     if channel_url:
-        builder.button(text=(get_setting("btn_channel") or "📰 Наш канал"), url=channel_url)
+        builder.button(text=_lbl(st, "btn_channel", "📰 Наш канал"), url=channel_url)
     if terms_url:
-        builder.button(text=(get_setting("btn_terms") or "📄 Условия использования"), url=terms_url)
+        builder.button(text=_lbl(st, "btn_terms", "📄 Условия использования"), url=terms_url)
     if privacy_url:
-        builder.button(text=(get_setting("btn_privacy") or "🔒 Политика конфиденциальности"), url=privacy_url)
-    builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="back_to_main_menu")
+        builder.button(text=_lbl(st, "btn_privacy", "🔒 Политика конфиденциальности"), url=privacy_url)
+    builder.add(_back_to_menu_button(st.get("btn_back_to_menu")))
     builder.adjust(1)
     return builder.as_markup()
     
-def create_support_keyboard(support_user: str | None = None) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
+@functools.lru_cache(maxsize=32)
+def _resolve_support_url(support_user: str | None, support_bot_username: str | None, support_user_setting: str | None) -> str | None:
+    """Преобразовать username/ссылку поддержки в tg:// ссылку."""
     # Определяем username для поддержки
     username = (support_user or "").strip()
     if not username:
-        username = (get_setting("support_bot_username") or get_setting("support_user") or "").strip()
-    # Преобразуем в tg:// ссылку, если есть username/ссылка
-    url: str | None = None
-    if username:
-        if username.startswith("@"):  # @username
-            url = f"tg://resolve?domain={username[1:]}"
-        elif username.startswith("tg://"):  # уже tg-схема
-            url = username
-        elif username.startswith("http://") or username.startswith("https://"):
-            # http(s) ссылки на t.me/telegram.me -> в tg://
-            # Попробуем извлечь domain
-            try:
-                # простое извлечение последнего сегмента
-                part = username.split("/")[-1].split("?")[0]
-                if part:
-                    url = f"tg://resolve?domain={part}"
-            except Exception:
-                url = username
-        else:
-            # просто username без @
-            url = f"tg://resolve?domain={username}"
+        username = (support_bot_username or support_user_setting or "").strip()
+    if not username:
+        return None
+    if username.startswith("@"):  # @username
+        return f"tg://resolve?domain={username[1:]}"
+    if username.startswith("tg://"):  # уже tg-схема
+        return username
+    if username.startswith(("http://", "https://")):
+        # http(s) ссылки на t.me/telegram.me -> в tg://, извлекаем последний сегмент
+        part = username.split("/")[-1].split("?")[0]
+        return f"tg://resolve?domain={part}" if part else None
+    # просто username без @
+    return f"tg://resolve?domain={username}"
+
+def create_support_keyboard(support_user: str | None = None) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    st = get_settings_bulk(_SUPPORT_KEYS)
+    url = _resolve_support_url(support_user, st.get("support_bot_username"), st.get("support_user"))
 
     if url:
-        builder.button(text=(get_setting("btn_support") or "🆘 Поддержка"), url=url)
-        builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="back_to_main_menu")
+        builder.button(text=_lbl(st, "btn_support", "🆘 Поддержка"), url=url)
+        builder.add(_back_to_menu_button(st.get("btn_back_to_menu")))
     else:
         # Фолбэк: встроенное меню поддержки
-        builder.button(text=(get_setting("btn_support") or "🆘 Поддержка"), callback_data="show_help")
-        builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="back_to_main_menu")
+        builder.button(text=_lbl(st, "btn_support", "🆘 Поддержка"), callback_data="show_help")
+        builder.add(_back_to_menu_button(st.get("btn_back_to_menu")))
     builder.adjust(1)
     return builder.as_markup()
 
@@ -547,8 +501,9 @@ def create_support_bot_link_keyboard(support_bot_username: str) -> InlineKeyboar
     builder = InlineKeyboardBuilder()
     username = support_bot_username.lstrip("@")
     deep_link = f"tg://resolve?domain={username}&start=new"
-    builder.button(text=(get_setting("btn_support_open") or "🆘 Открыть поддержку"), url=deep_link)
-    builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="back_to_main_menu")
+    st = get_settings_bulk(_SUPPORT_LINK_KEYS)
+    builder.button(text=_lbl(st, "btn_support_open", "🆘 Открыть поддержку"), url=deep_link)
+    builder.add(_back_to_menu_button(st.get("btn_back_to_menu")))
     builder.adjust(1)
     return builder.as_markup()
 
@@ -557,8 +512,7 @@ def create_support_menu_keyboard(has_external: bool = False) -> InlineKeyboardMa
         # Если внешняя поддержка недоступна, скрыть кнопку support_external
         if not has_external:
             cd = (cfg.get('callback_data') or '').strip()
-            bid = (cfg.get('button_id') or '').strip()
-            if cd == 'support_external' or bid == 'btn_support_external':
+            if cd == 'support_external' or cfg['button_id'] == 'btn_support_external':
                 return False
         return True
 
@@ -567,11 +521,12 @@ def create_support_menu_keyboard(has_external: bool = False) -> InlineKeyboardMa
         return kb
 
     builder = InlineKeyboardBuilder()
-    builder.button(text=(get_setting("btn_support_new_ticket") or "✍️ Новое обращение"), callback_data="support_new_ticket")
-    builder.button(text=(get_setting("btn_support_my_tickets") or "📨 Мои обращения"), callback_data="support_my_tickets")
+    st = get_settings_bulk(_SUPPORT_MENU_KEYS)
+    builder.button(text=_lbl(st, "btn_support_new_ticket", "✍️ Новое обращение"), callback_data="support_new_ticket")
+    builder.button(text=_lbl(st, "btn_support_my_tickets", "📨 Мои обращения"), callback_data="support_my_tickets")
     if has_external:
-        builder.button(text=(get_setting("btn_support_external") or "🆘 Внешняя поддержка"), callback_data="support_external")
-    builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="back_to_main_menu")
+        builder.button(text=_lbl(st, "btn_support_external", "🆘 Внешняя поддержка"), callback_data="support_external")
+    builder.add(_back_to_menu_button(st.get("btn_back_to_menu")))
     builder.adjust(1)
     return builder.as_markup()
 
@@ -583,37 +538,40 @@ def create_tickets_list_keyboard(tickets: list[dict]) -> InlineKeyboardMarkup:
             if t.get('subject'):
                 title += f" • {t['subject'][:20]}"
             builder.button(text=title, callback_data=f"support_view_{t['ticket_id']}")
-    builder.button(text="⬅️ Назад", callback_data="support_menu")
+    builder.button(text=_BACK_TEXT, callback_data="support_menu")
     builder.adjust(1)
     return builder.as_markup()
 
 def create_ticket_actions_keyboard(ticket_id: int, is_open: bool = True) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
+    rows = []
     if is_open:
-        builder.button(text="💬 Ответить", callback_data=f"support_reply_{ticket_id}")
-        builder.button(text="✅ Закрыть", callback_data=f"support_close_{ticket_id}")
-    builder.button(text="⬅️ К списку", callback_data="support_my_tickets")
+        rows.append([InlineKeyboardButton(text="💬 Ответить", callback_data=f"support_reply_{ticket_id}")])
+        rows.append([InlineKeyboardButton(text="✅ Закрыть", callback_data=f"support_close_{ticket_id}")])
+    rows.append([InlineKeyboardButton(text="⬅️ К списку", callback_data="support_my_tickets")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+@functools.lru_cache(maxsize=64)
+def _build_host_kb(host_names: tuple[str, ...], prefix: str, back_label: str, back_cb: str) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for name in host_names:
+        builder.button(text=name, callback_data=f"{prefix}{encode_host_callback_token(name)}")
+    builder.button(text=back_label, callback_data=back_cb)
     builder.adjust(1)
     return builder.as_markup()
 
 def create_host_selection_keyboard(hosts: list, action: str) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
     base_action = action
     extra = "-"
     if action.startswith("switch_"):
         base_action = "switch"
         extra = action[len("switch_"):] or "-"
-    elif action in {"trial", "new"}:
-        base_action = action
-    else:
-        base_action = action
     prefix = f"select_host:{base_action}:{extra}:"
-    for host in hosts:
-        token = encode_host_callback_token(host['host_name'])
-        builder.button(text=host['host_name'], callback_data=f"{prefix}{token}")
-    builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="manage_keys" if action == 'new' else "back_to_main_menu")
-    builder.adjust(1)
-    return builder.as_markup()
+    return _build_host_kb(
+        tuple(host['host_name'] for host in hosts),
+        prefix,
+        get_setting("btn_back_to_menu") or _BACK_TO_MENU_TEXT,
+        "manage_keys" if action == 'new' else _BACK_TO_MAIN_MENU_CB,
+    )
 
 def create_plans_keyboard(plans: list[dict], action: str, host_name: str, key_id: int = 0) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
@@ -621,16 +579,16 @@ def create_plans_keyboard(plans: list[dict], action: str, host_name: str, key_id
         callback_data = f"buy_{host_name}_{plan['plan_id']}_{action}_{key_id}"
         builder.button(text=f"{plan['plan_name']} - {plan['price']:.0f} RUB", callback_data=callback_data)
     back_callback = "manage_keys" if action == "extend" else "buy_new_key"
-    builder.button(text=(get_setting("btn_back") or "⬅️ Назад"), callback_data=back_callback)
+    builder.button(text=(get_setting("btn_back") or _BACK_TEXT), callback_data=back_callback)
     builder.adjust(1) 
     return builder.as_markup()
 
 def create_skip_email_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text=(get_setting("btn_skip_email") or "➡️ Продолжить без почты"), callback_data="skip_email")
-    builder.button(text=(get_setting("btn_back_to_plans") or "⬅️ Назад к тарифам"), callback_data="back_to_plans")
-    builder.adjust(1)
-    return builder.as_markup()
+    st = get_settings_bulk(_SKIP_EMAIL_KEYS)
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=_lbl(st, "btn_skip_email", "➡️ Продолжить без почты"), callback_data="skip_email")],
+        [InlineKeyboardButton(text=_lbl(st, "btn_back_to_plans", "⬅️ Назад к тарифам"), callback_data="back_to_plans")],
+    ])
 
 def create_payment_method_keyboard(
     payment_methods: dict,
@@ -642,6 +600,8 @@ def create_payment_method_keyboard(
     has_promo_applied: bool | None = None,
 ) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
+    st = get_settings_bulk(_PAYMENT_METHOD_KEYS)
+    pm = payment_methods or _EMPTY_DICT
 
     # Промокод: ввести/убрать
     if has_promo_applied:
@@ -651,7 +611,7 @@ def create_payment_method_keyboard(
 
     # Кнопки оплаты с балансов (если разрешено/достаточно средств)
     if show_balance:
-        label = get_setting("btn_pay_with_balance") or "💼 Оплатить с баланса"
+        label = _lbl(st, "btn_pay_with_balance", "💼 Оплатить с баланса")
         if main_balance is not None:
             try:
                 label += f" ({main_balance:.0f} RUB)"
@@ -660,46 +620,47 @@ def create_payment_method_keyboard(
         builder.button(text=label, callback_data="pay_balance")
 
     # Внешние способы оплаты
-    if payment_methods and payment_methods.get("yookassa"):
-        if get_setting("sbp_enabled"):
+    if pm.get("yookassa"):
+        if st.get("sbp_enabled"):
             builder.button(text="🏦 СБП / Банковская карта", callback_data="pay_yookassa")
         else:
             builder.button(text="🏦 Банковская карта", callback_data="pay_yookassa")
-    if payment_methods and payment_methods.get("heleket"):
+    if pm.get("heleket"):
         builder.button(text="💎 Криптовалюта", callback_data="pay_heleket")
-    if payment_methods and payment_methods.get("cryptobot"):
+    if pm.get("cryptobot"):
         builder.button(text="🤖 CryptoBot", callback_data="pay_cryptobot")
-    if payment_methods and payment_methods.get("yoomoney"):
+    if pm.get("yoomoney"):
         builder.button(text="💜 ЮMoney (кошелёк)", callback_data="pay_yoomoney")
-    if payment_methods and payment_methods.get("stars"):
+    if pm.get("stars"):
         builder.button(text="⭐ Telegram Stars", callback_data="pay_stars")
-    if payment_methods and payment_methods.get("tonconnect"):
-        callback_data_ton = "pay_tonconnect"
-        logger.info(f"Creating TON button with callback_data: '{callback_data_ton}'")
-        builder.button(text="🪙 TON Connect", callback_data=callback_data_ton)
+    if pm.get("tonconnect"):
+        builder.button(text="🪙 TON Connect", callback_data="pay_tonconnect")
 
-    builder.button(text=(get_setting("btn_back") or "⬅️ Назад"), callback_data="back_to_email_prompt")
+    builder.button(text=_lbl(st, "btn_back", _BACK_TEXT), callback_data="back_to_email_prompt")
     builder.adjust(1)
     return builder.as_markup()
 
 
+@functools.cache
 def create_admin_promos_menu_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="➕ Создать промокод", callback_data="admin_promo_create")
     builder.button(text="📋 Список промокодов", callback_data="admin_promo_list")
-    builder.button(text="⬅️ В админ-меню", callback_data="admin_menu")
+    builder.add(_BTN_ADMIN_BACK)
     builder.adjust(1)
     return builder.as_markup()
 
+@functools.cache
 def create_admin_promo_discount_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     # Первый шаг: выбрать тип скидки
     builder.button(text="Процент", callback_data="admin_promo_discount_type_percent")
     builder.button(text="Фикс (RUB)", callback_data="admin_promo_discount_type_amount")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
+    builder.add(_BTN_CANCEL_ADMIN)
     builder.adjust(2, 1)
     return builder.as_markup()
 
+@functools.cache
 def create_admin_promo_discount_percent_menu_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     # Пресеты процентов
@@ -709,10 +670,11 @@ def create_admin_promo_discount_percent_menu_keyboard() -> InlineKeyboardMarkup:
     builder.button(text="🖊 Ввести процент", callback_data="admin_promo_discount_manual_percent")
     builder.button(text="🖊 Ввести фикс RUB", callback_data="admin_promo_discount_manual_amount")
     builder.button(text="↔️ Фикс-меню", callback_data="admin_promo_discount_show_amount_menu")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
+    builder.add(_BTN_CANCEL_ADMIN)
     builder.adjust(3, 3, 1, 1, 1)
     return builder.as_markup()
 
+@functools.cache
 def create_admin_promo_discount_amount_menu_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     # Пресеты сумм в рублях
@@ -721,48 +683,53 @@ def create_admin_promo_discount_amount_menu_keyboard() -> InlineKeyboardMarkup:
     builder.button(text="🖊 Ввести фикс RUB", callback_data="admin_promo_discount_manual_amount")
     builder.button(text="🖊 Ввести процент", callback_data="admin_promo_discount_manual_percent")
     builder.button(text="↔️ Процент-меню", callback_data="admin_promo_discount_show_percent_menu")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
+    builder.add(_BTN_CANCEL_ADMIN)
     builder.adjust(3, 3, 1, 1, 1)
     return builder.as_markup()
 
+@functools.cache
 def create_admin_promo_limits_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     # СТАРАЯ клавиатура оставлена для совместимости, но не используется в новом мастере
     builder.button(text="Пропустить", callback_data="admin_promo_limits_skip")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
+    builder.add(_BTN_CANCEL_ADMIN)
     builder.adjust(1, 1)
     return builder.as_markup()
 
+@functools.cache
 def create_admin_promo_limits_type_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="Общий лимит", callback_data="admin_promo_limits_type_total")
     builder.button(text="Лимит на пользователя", callback_data="admin_promo_limits_type_per")
     builder.button(text="Оба лимита", callback_data="admin_promo_limits_type_both")
     builder.button(text="Пропустить", callback_data="admin_promo_limits_skip")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
+    builder.add(_BTN_CANCEL_ADMIN)
     builder.adjust(2, 1, 1, 1)
     return builder.as_markup()
 
+@functools.cache
 def create_admin_promo_limits_total_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for n in (10, 50, 100, 200, 500, 1000):
         builder.button(text=str(n), callback_data=f"admin_promo_limits_total_preset_{n}")
     builder.button(text="🖊 Ввести значение", callback_data="admin_promo_limits_total_manual")
-    builder.button(text="⬅️ Назад", callback_data="admin_promo_limits_back_to_type")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
+    builder.button(text=_BACK_TEXT, callback_data="admin_promo_limits_back_to_type")
+    builder.add(_BTN_CANCEL_ADMIN)
     builder.adjust(3, 3, 1, 1)
     return builder.as_markup()
 
+@functools.cache
 def create_admin_promo_limits_per_user_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for n in (1, 2, 3, 5, 10):
         builder.button(text=str(n), callback_data=f"admin_promo_limits_per_preset_{n}")
     builder.button(text="🖊 Ввести значение", callback_data="admin_promo_limits_per_manual")
-    builder.button(text="⬅️ Назад", callback_data="admin_promo_limits_back_to_type")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
+    builder.button(text=_BACK_TEXT, callback_data="admin_promo_limits_back_to_type")
+    builder.add(_BTN_CANCEL_ADMIN)
     builder.adjust(3, 2, 1, 1)
     return builder.as_markup()
 
+@functools.cache
 def create_admin_promo_dates_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     # Быстрые пресеты по дням
@@ -777,112 +744,120 @@ def create_admin_promo_dates_keyboard() -> InlineKeyboardMarkup:
     # Ручной ввод количества дней и пропуск
     builder.button(text="🖊 Ввести число дней", callback_data="admin_promo_dates_custom_days")
     builder.button(text="Пропустить", callback_data="admin_promo_dates_skip")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
+    builder.add(_BTN_CANCEL_ADMIN)
     builder.adjust(2, 2, 1, 2, 1)
     return builder.as_markup()
 
+@functools.cache
 def create_admin_promo_description_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.button(text="Пропустить", callback_data="admin_promo_desc_skip")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
+    builder.add(_BTN_CANCEL_ADMIN)
     builder.adjust(1)
     return builder.as_markup()
 
+@functools.cache
 def create_admin_promo_confirm_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text="✅ Создать", callback_data="admin_promo_confirm_create")
-    builder.button(text="❌ Отмена", callback_data="admin_cancel")
-    builder.adjust(2)
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="✅ Создать", callback_data="admin_promo_confirm_create"),
+        _BTN_CANCEL_ADMIN,
+    ]])
 
 def create_ton_connect_keyboard(connect_url: str) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text="🚀 Открыть кошелек", url=connect_url)
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="🚀 Открыть кошелек", url=connect_url),
+    ]])
 
 def create_payment_keyboard(payment_url: str) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text=(get_setting("btn_go_to_payment") or "Перейти к оплате"), url=payment_url)
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text=(get_setting("btn_go_to_payment") or "Перейти к оплате"), url=payment_url),
+    ]])
 
 def create_payment_with_check_keyboard(payment_url: str, check_callback: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text=(get_setting("btn_go_to_payment") or "Перейти к оплате"), url=payment_url)
-    builder.button(text=(get_setting("btn_check_payment") or "✅ Проверить оплату"), callback_data=check_callback)
+    st = get_settings_bulk(_PAYMENT_CHECK_KEYS)
+    builder.button(text=_lbl(st, "btn_go_to_payment", "Перейти к оплате"), url=payment_url)
+    builder.button(text=_lbl(st, "btn_check_payment", "✅ Проверить оплату"), callback_data=check_callback)
     builder.adjust(1)
     return builder.as_markup()
 
 def create_topup_payment_method_keyboard(payment_methods: dict) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
+    st = get_settings_bulk(_TOPUP_KEYS)
+    pm = payment_methods or _EMPTY_DICT
     # Только внешние способы оплаты, без оплаты с баланса
-    if payment_methods and payment_methods.get("yookassa"):
-        if get_setting("sbp_enabled"):
+    if pm.get("yookassa"):
+        if st.get("sbp_enabled"):
             builder.button(text="🏦 СБП / Банковская карта", callback_data="topup_pay_yookassa")
         else:
             builder.button(text="🏦 Банковская карта", callback_data="topup_pay_yookassa")
-    if payment_methods and payment_methods.get("heleket"):
+    if pm.get("heleket"):
         builder.button(text="💎 Криптовалюта", callback_data="topup_pay_heleket")
-    if payment_methods and payment_methods.get("cryptobot"):
+    if pm.get("cryptobot"):
         builder.button(text="🤖 CryptoBot", callback_data="topup_pay_cryptobot")
-    if payment_methods and payment_methods.get("yoomoney"):
+    if pm.get("yoomoney"):
         builder.button(text="💜 ЮMoney (кошелёк)", callback_data="topup_pay_yoomoney")
-    if payment_methods and payment_methods.get("stars"):
+    if pm.get("stars"):
         builder.button(text="⭐ Telegram Stars", callback_data="topup_pay_stars")
-    if payment_methods and payment_methods.get("tonconnect"):
+    if pm.get("tonconnect"):
         builder.button(text="🪙 TON Connect", callback_data="topup_pay_tonconnect")
 
-    builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="show_profile")
+    builder.button(text=_lbl(st, "btn_back_to_menu", _BACK_TO_MENU_TEXT), callback_data="show_profile")
     builder.adjust(1)
     return builder.as_markup()
 
 def create_keys_management_keyboard(keys: list) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
+    st = get_settings_bulk(_KEYS_MANAGEMENT_KEYS)
     if keys:
+        from datetime import datetime
+        now = datetime.now()
         for i, key in enumerate(keys):
             expiry_date = datetime.fromisoformat(key['expiry_date'])
-            status_icon = "✅" if expiry_date > datetime.now() else "❌"
+            status_icon = "✅" if expiry_date > now else "❌"
             host_name = key.get('host_name', 'Неизвестный хост')
             button_text = f"{status_icon} Ключ #{i+1} ({host_name}) (до {expiry_date.strftime('%d.%m.%Y')})"
             builder.button(text=button_text, callback_data=f"show_key_{key['key_id']}")
-    builder.button(text=(get_setting("btn_buy_key") or "➕ Купить новый ключ"), callback_data="buy_new_key")
-    builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="back_to_main_menu")
+    builder.button(text=_lbl(st, "btn_buy_key", "➕ Купить новый ключ"), callback_data="buy_new_key")
+    builder.add(_back_to_menu_button(st.get("btn_back_to_menu")))
     builder.adjust(1)
     return builder.as_markup()
 
 def create_key_info_keyboard(key_id: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    builder.button(text=(get_setting("btn_extend_key") or "➕ Продлить этот ключ"), callback_data=f"extend_key_{key_id}")
-    builder.button(text=(get_setting("btn_show_qr") or "📱 Показать QR-код"), callback_data=f"show_qr_{key_id}")
-    builder.button(text=(get_setting("btn_instruction") or "📖 Инструкция"), callback_data=f"howto_vless_{key_id}")
-    builder.button(text=(get_setting("btn_switch_server") or "🌍 Сменить сервер"), callback_data=f"switch_server_{key_id}")
-    builder.button(text=(get_setting("btn_back_to_keys") or "⬅️ Назад к списку ключей"), callback_data="manage_keys")
+    st = get_settings_bulk(_KEY_INFO_KEYS)
+    builder.button(text=_lbl(st, "btn_extend_key", "➕ Продлить этот ключ"), callback_data=f"extend_key_{key_id}")
+    builder.button(text=_lbl(st, "btn_show_qr", "📱 Показать QR-код"), callback_data=f"show_qr_{key_id}")
+    builder.button(text=_lbl(st, "btn_instruction", "📖 Инструкция"), callback_data=f"howto_vless_{key_id}")
+    builder.button(text=_lbl(st, "btn_switch_server", "🌍 Сменить сервер"), callback_data=f"switch_server_{key_id}")
+    builder.button(text=_lbl(st, "btn_back_to_keys", "⬅️ Назад к списку ключей"), callback_data="manage_keys")
     builder.adjust(1)
     return builder.as_markup()
 
+@functools.lru_cache(maxsize=512)
+def _howto_markup(labels: tuple[str | None, ...], back_cb: str, back_default: str) -> InlineKeyboardMarkup:
+    """Сетка 2+2+1: четыре платформы и кнопка «назад». labels — значения настроек в порядке _HOWTO_PLATFORMS + back."""
+    buttons = [
+        InlineKeyboardButton(text=(label or default), callback_data=cb)
+        for label, (_, default, cb) in zip(labels, _HOWTO_PLATFORMS)
+    ]
+    back = InlineKeyboardButton(text=(labels[-1] or back_default), callback_data=back_cb)
+    return InlineKeyboardMarkup(inline_keyboard=[buttons[0:2], buttons[2:4], [back]])
+
 def create_howto_vless_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text=(get_setting("btn_howto_android") or "📱 Android"), callback_data="howto_android")
-    builder.button(text=(get_setting("btn_howto_ios") or "📱 iOS"), callback_data="howto_ios")
-    builder.button(text=(get_setting("btn_howto_windows") or "💻 Windows"), callback_data="howto_windows")
-    builder.button(text=(get_setting("btn_howto_linux") or "🐧 Linux"), callback_data="howto_linux")
-    builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="back_to_main_menu")
-    builder.adjust(2, 2, 1)
-    return builder.as_markup()
+    st = get_settings_bulk(_HOWTO_KEYS)
+    return _howto_markup(tuple(st.get(k) for k in _HOWTO_KEYS), _BACK_TO_MAIN_MENU_CB, _BACK_TO_MENU_TEXT)
 
 def create_howto_vless_keyboard_key(key_id: int) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text=(get_setting("btn_howto_android") or "📱 Android"), callback_data="howto_android")
-    builder.button(text=(get_setting("btn_howto_ios") or "📱 iOS"), callback_data="howto_ios")
-    builder.button(text=(get_setting("btn_howto_windows") or "💻 Windows"), callback_data="howto_windows")
-    builder.button(text=(get_setting("btn_howto_linux") or "🐧 Linux"), callback_data="howto_linux")
-    builder.button(text=(get_setting("btn_back_to_key") or "⬅️ Назад к ключу"), callback_data=f"show_key_{key_id}")
-    builder.adjust(2, 2, 1)
-    return builder.as_markup()
+    st = get_settings_bulk(_HOWTO_KEY_KEYS)
+    return _howto_markup(tuple(st.get(k) for k in _HOWTO_KEY_KEYS), f"show_key_{key_id}", "⬅️ Назад к ключу")
+
+@functools.lru_cache(maxsize=8)
+def _back_to_menu_markup(label: str | None) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[[_back_to_menu_button(label)]])
 
 def create_back_to_menu_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="back_to_main_menu")
-    return builder.as_markup()
+    return _back_to_menu_markup(get_setting("btn_back_to_menu"))
 
 def create_profile_keyboard() -> InlineKeyboardMarkup:
     kb = _build_keyboard_from_db('profile_menu')
@@ -890,9 +865,10 @@ def create_profile_keyboard() -> InlineKeyboardMarkup:
         return kb
 
     builder = InlineKeyboardBuilder()
-    builder.button(text=(get_setting("btn_top_up") or "➕ Пополнить баланс"), callback_data="top_up_start")
-    builder.button(text=(get_setting("btn_referral") or "🤝 Реферальная программа"), callback_data="show_referral_program")
-    builder.button(text=(get_setting("btn_back_to_menu") or "⬅️ Назад в меню"), callback_data="back_to_main_menu")
+    st = get_settings_bulk(_PROFILE_KEYS)
+    builder.button(text=_lbl(st, "btn_top_up", "➕ Пополнить баланс"), callback_data="top_up_start")
+    builder.button(text=_lbl(st, "btn_referral", "🤝 Реферальная программа"), callback_data="show_referral_program")
+    builder.add(_back_to_menu_button(st.get("btn_back_to_menu")))
     builder.adjust(1)
     return builder.as_markup()
 
@@ -922,7 +898,8 @@ def create_admin_users_pick_keyboard(users: list[dict], page: int = 0, page_size
     builder = InlineKeyboardBuilder()
     start = page * page_size
     end = start + page_size
-    for u in users[start:end]:
+    page_users = users[start:end]
+    for u in page_users:
         user_id = u.get('telegram_id') or u.get('user_id') or u.get('id')
         username = u.get('username') or '—'
         title = f"{user_id} • @{username}" if username != '—' else f"{user_id}"
@@ -931,16 +908,14 @@ def create_admin_users_pick_keyboard(users: list[dict], page: int = 0, page_size
     have_prev = page > 0
     have_next = end < total
     if have_prev:
-        builder.button(text="⬅️ Назад", callback_data=f"admin_{action}_pick_user_page_{page-1}")
+        builder.button(text=_BACK_TEXT, callback_data=f"admin_{action}_pick_user_page_{page-1}")
     if have_next:
         builder.button(text="Вперёд ➡️", callback_data=f"admin_{action}_pick_user_page_{page+1}")
-    builder.button(text="⬅️ В админ-меню", callback_data="admin_menu")
-    rows = [1] * len(users[start:end])
-    tail = []
+    builder.add(_BTN_ADMIN_BACK)
+    rows = (1,) * len(page_users)
     if have_prev or have_next:
-        tail.append(2 if (have_prev and have_next) else 1)
-    tail.append(1)
-    builder.adjust(*(rows + tail if rows else ([2] if (have_prev or have_next) else []) + [1]))
+        rows += (2 if (have_prev and have_next) else 1,)
+    builder.adjust(*rows, 1)
     return builder.as_markup()
 
 def create_admin_hosts_pick_keyboard(hosts: list[dict], action: str = "gift") -> InlineKeyboardMarkup:
@@ -959,15 +934,14 @@ def create_admin_hosts_pick_keyboard(hosts: list[dict], action: str = "gift") ->
     # Дополнительные опции для speedtest
     if action == "speedtest":
         builder.button(text="🚀 Запустить для всех", callback_data="admin_speedtest_run_all")
-    builder.button(text="⬅️ Назад", callback_data=f"admin_{action}_back_to_users")
+    builder.button(text=_BACK_TEXT, callback_data=f"admin_{action}_back_to_users")
     # Сетка: по 2 в ряд для speedtest (хост + автоустановка), иначе по 1
+    n = len(hosts) if hosts else 1
     if action == "speedtest":
-        rows = [2] * (len(hosts) if hosts else 1)
-        tail = [1, 1]
+        rows = (2,) * n + (1, 1)
     else:
-        rows = [1] * (len(hosts) if hosts else 1)
-        tail = [1]
-    builder.adjust(*(rows + tail))
+        rows = (1,) * (n + 1)
+    builder.adjust(*rows)
     return builder.as_markup()
 
 def create_admin_keys_for_host_keyboard(
@@ -981,53 +955,54 @@ def create_admin_keys_for_host_keyboard(
     if not keys:
         builder.button(text="Ключей на хосте нет", callback_data="noop")
         builder.button(text="⬅️ К выбору хоста", callback_data="admin_hostkeys_back_to_hosts")
-        builder.button(text="⬅️ В админ-меню", callback_data="admin_menu")
+        builder.add(_BTN_ADMIN_BACK)
         builder.adjust(1)
         return builder.as_markup()
 
     # Пагинация
     start = page * page_size
     end = start + page_size
-    for k in keys[start:end]:
+    page_keys = keys[start:end]
+    for k in page_keys:
         kid = k.get('key_id')
         email = k.get('key_email') or '—'
-        expiry = k.get('expiry_date') or '—'
-        title = f"#{kid} • {email[:24]} • до {expiry}"
-        builder.button(text=title, callback_data=f"admin_edit_key_{kid}")
+        if len(email) > _KEY_TITLE_EMAIL_MAX:
+            email = email[:_KEY_TITLE_EMAIL_MAX]
+        builder.button(
+            text=f"#{kid} • {email} • до {k.get('expiry_date') or '—'}",
+            callback_data=f"admin_edit_key_{kid}",
+        )
 
     total = len(keys)
     have_prev = page > 0
     have_next = end < total
     if have_prev:
-        builder.button(text="⬅️ Назад", callback_data=f"admin_hostkeys_page_{page-1}")
+        builder.button(text=_BACK_TEXT, callback_data=f"admin_hostkeys_page_{page-1}")
     if have_next:
         builder.button(text="Вперёд ➡️", callback_data=f"admin_hostkeys_page_{page+1}")
 
     # Кнопки навигации
     builder.button(text="⬅️ К выбору хоста", callback_data="admin_hostkeys_back_to_hosts")
-    builder.button(text="⬅️ В админ-меню", callback_data="admin_menu")
+    builder.add(_BTN_ADMIN_BACK)
 
     # Сетка: список (по 1 в ряд) + пагинация (1 или 2 в ряд) + две кнопки назад
-    rows = [1] * len(keys[start:end])
-    tail = []
+    rows = (1,) * len(page_keys)
     if have_prev or have_next:
-        tail.append(2 if (have_prev and have_next) else 1)
-    tail.extend([1, 1])
-    builder.adjust(*(rows + tail if rows else ([2] if (have_prev or have_next) else []) + [1, 1]))
+        rows += (2 if (have_prev and have_next) else 1,)
+    builder.adjust(*rows, 1, 1)
     return builder.as_markup()
 
+@functools.lru_cache(maxsize=256)
 def create_admin_months_pick_keyboard(action: str = "gift") -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for m in (1, 3, 6, 12):
         builder.button(text=f"{m} мес.", callback_data=f"admin_{action}_pick_months_{m}")
-    builder.button(text="⬅️ Назад", callback_data=f"admin_{action}_back_to_hosts")
+    builder.button(text=_BACK_TEXT, callback_data=f"admin_{action}_back_to_hosts")
     builder.adjust(2, 2, 1)
     return builder.as_markup()
 
 
+@functools.cache
 def create_back_to_main_menu_keyboard() -> InlineKeyboardMarkup:
     """Создать клавиатуру с кнопкой возврата в главное меню"""
-    builder = InlineKeyboardBuilder()
-    builder.button(text="⬅️ Назад в меню", callback_data="back_to_main_menu")
-    builder.adjust(1)
-    return builder.as_markup()
+    return InlineKeyboardMarkup(inline_keyboard=[[_BTN_BACK_TO_MENU]])
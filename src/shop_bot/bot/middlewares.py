@@ -1,8 +1,63 @@
+import functools
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, Message, CallbackQuery, Chat
+from aiogram.types import TelegramObject, Message, CallbackQuery, Chat, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from shop_bot.data_manager.database import get_user, get_setting
+from shop_bot.data_manager.database import get_setting
+
+# Забаненные пользователи: загружается при старте бота и поддерживается при ban/unban,
+# поэтому проверка в middleware — одно обращение к множеству без запросов к БД
+_BANNED_IDS: set[int] = set()
+
+def load_ban_set(user_ids) -> None:
+    """Заменить множество забаненных (при старте бота и после восстановления БД)."""
+    global _BANNED_IDS
+    _BANNED_IDS = {int(uid) for uid in user_ids}
+
+def add_banned(user_id: int) -> None:
+    _BANNED_IDS.add(int(user_id))
+
+def remove_banned(user_id: int) -> None:
+    _BANNED_IDS.discard(int(user_id))
+
+BAN_MESSAGE_TEXT = "🚫 Вы заблокированы и не можете использовать этого бота."
+
+def _from_at(support: str) -> str | None:
+    return f"tg://resolve?domain={support[1:]}"
+
+def _passthrough(support: str) -> str | None:
+    return support
+
+def _from_http(support: str) -> str | None:
+    # https://t.me/username?start=... -> username
+    part = support.rsplit("/", 1)[-1].split("?", 1)[0]
+    return f"tg://resolve?domain={part}" if part else None
+
+# Префикс значения support_user -> преобразование в ссылку; иначе считаем значение username
+_URL_HANDLERS = (
+    ("@", _from_at),
+    ("tg://", _passthrough),
+    ("http://", _from_http),
+    ("https://", _from_http),
+)
+
+@functools.lru_cache(maxsize=4)
+def _build_ban_kb(support: str) -> InlineKeyboardMarkup:
+    """Клавиатура поддержки для забаненных (без кнопки "Назад в меню"); строится один раз на значение настройки."""
+    url: str | None = None
+    if support:
+        for prefix, to_url in _URL_HANDLERS:
+            if support.startswith(prefix):
+                url = to_url(support)
+                break
+        else:
+            url = f"tg://resolve?domain={support}"
+    kb_builder = InlineKeyboardBuilder()
+    if url:
+        kb_builder.button(text="🆘 Написать в поддержку", url=url)
+    else:
+        kb_builder.button(text="🆘 Поддержка", callback_data="show_help")
+    return kb_builder.as_markup()
 
 class BanMiddleware(BaseMiddleware):
     async def __call__(
@@ -12,56 +67,30 @@ class BanMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         user = data.get('event_from_user')
-        if not user:
+        if not user or user.id not in _BANNED_IDS:
             return await handler(event, data)
 
-        user_data = get_user(user.id)
-        if user_data and user_data.get('is_banned'):
-            ban_message_text = "🚫 Вы заблокированы и не можете использовать этого бота."
-            # Соберём клавиатуру поддержки без кнопки "Назад в меню"
+        try:
+            support = (get_setting("support_bot_username") or get_setting("support_user") or "").strip()
+        except Exception:
+            support = ""
+        ban_kb = _build_ban_kb(support)
+
+        if isinstance(event, CallbackQuery):
+            # Показать алерт и дополнительно отправить сообщение с кнопкой поддержки
+            await event.answer(BAN_MESSAGE_TEXT, show_alert=True)
             try:
-                support = (get_setting("support_bot_username") or get_setting("support_user") or "").strip()
+                await event.bot.send_message(
+                    chat_id=event.from_user.id,
+                    text=BAN_MESSAGE_TEXT,
+                    reply_markup=ban_kb
+                )
             except Exception:
-                support = ""
-            kb_builder = InlineKeyboardBuilder()
-            url: str | None = None
-            if support:
-                if support.startswith("@"):  # @username
-                    url = f"tg://resolve?domain={support[1:]}"
-                elif support.startswith("tg://"):
-                    url = support
-                elif support.startswith("http://") or support.startswith("https://"):
-                    try:
-                        part = support.split("/")[-1].split("?")[0]
-                        if part:
-                            url = f"tg://resolve?domain={part}"
-                    except Exception:
-                        url = support
-                else:
-                    url = f"tg://resolve?domain={support}"
-            if url:
-                kb_builder.button(text="🆘 Написать в поддержку", url=url)
-            else:
-                kb_builder.button(text="🆘 Поддержка", callback_data="show_help")
-            ban_kb = kb_builder.as_markup()
-
-            if isinstance(event, CallbackQuery):
-                # Показать алерт и дополнительно отправить сообщение с кнопкой поддержки
-                await event.answer(ban_message_text, show_alert=True)
-                try:
-                    await event.bot.send_message(
-                        chat_id=event.from_user.id,
-                        text=ban_message_text,
-                        reply_markup=ban_kb
-                    )
-                except Exception:
-                    pass
-            elif isinstance(event, Message):
-                try:
-                    await event.answer(ban_message_text, reply_markup=ban_kb)
-                except Exception:
-                    # Фолбэк без клавиатуры
-                    await event.answer(ban_message_text)
-            return
-        
-        return await handler(event, data)
+                pass
+        elif isinstance(event, Message):
+            try:
+                await event.answer(BAN_MESSAGE_TEXT, reply_markup=ban_kb)
+            except Exception:
+                # Фолбэк без клавиатуры
+                await event.answer(BAN_MESSAGE_TEXT)
+        return
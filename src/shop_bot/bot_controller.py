@@ -6,10 +6,11 @@ from aiogram import Bot, Dispatcher, Router
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode 
 
+from shop_bot.config import parse_bool
 from shop_bot.data_manager import database
 from shop_bot.bot.handlers import get_user_router
-from shop_bot.bot.admin_handlers import get_admin_router
-from shop_bot.bot.middlewares import BanMiddleware
+from shop_bot.bot.admin_handlers import get_admin_router, shutdown_withdraw_approvals
+from shop_bot.bot.middlewares import BanMiddleware, load_ban_set
 from shop_bot.bot import handlers
 
 logger = logging.getLogger(__name__)
@@ -17,6 +18,7 @@ logger = logging.getLogger(__name__)
 class BotController:
     def __init__(self):
         self._dp = None
+        self._dp_key = None
         self._bot = None
         self._task = None
         self._is_running = False
@@ -33,6 +35,11 @@ class BotController:
         self._is_running = True
         logger.info("Запущен опрос Telegram (Основной-бот).")
         try:
+            # Вебхук снимаем до первого getUpdates, иначе Telegram вернёт конфликт
+            try:
+                await self._bot.delete_webhook(drop_pending_updates=True)
+            except Exception as e:
+                logger.warning(f"Не удалось удалить вебхук перед запуском опроса: {e}")
             await self._dp.start_polling(self._bot)
         except asyncio.CancelledError:
             logger.info("Опрос остановлен (задача отменена).")
@@ -42,10 +49,36 @@ class BotController:
             logger.info("Опрос корректно остановлен.")
             self._is_running = False
             self._task = None
-            if self._bot:
-                await self._bot.close()
+            # Подтверждения вывода из очереди дообрабатываем до закрытия сессии бота
+            try:
+                await shutdown_withdraw_approvals()
+            except Exception as e:
+                logger.error(f"Не удалось дообработать подтверждения вывода: {e}")
+            # start_polling уже закрывает HTTP-сессию; Bot.close() — это метод API «close»,
+            # а не освобождение ресурсов, поэтому его не вызываем. session.close() идемпотентен.
+            if self._bot is not None:
+                await self._bot.session.close()
             self._bot = None
-            self._dp = None
+
+    def _build_dispatcher(self) -> Dispatcher:
+        dp = Dispatcher()
+
+        # Вешаем BanMiddleware на уровни событий, где доступен event_from_user
+        # Вместо уровня update, чтобы корректно отлавливать сообщения/колбэки забаненных пользователей
+        dp.message.middleware(BanMiddleware())
+        dp.callback_query.middleware(BanMiddleware())
+
+        user_router = get_user_router()
+        admin_router = get_admin_router()
+
+        if not isinstance(user_router, Router):
+            raise TypeError(f"get_user_router() must return Router instance, got: {type(user_router)}")
+        if not isinstance(admin_router, Router):
+            raise TypeError(f"get_admin_router() must return Router instance, got: {type(admin_router)}")
+
+        dp.include_router(user_router)
+        dp.include_router(admin_router)
+        return dp
 
     def start(self):
         if self._is_running:
@@ -54,9 +87,11 @@ class BotController:
         if not self._loop or not self._loop.is_running():
             return {"status": "error", "message": "Критическая ошибка: цикл событий не установлен."}
 
-        token = database.get_setting("telegram_bot_token")
-        bot_username = database.get_setting("telegram_bot_username")
-        admin_id = database.get_setting("admin_telegram_id")
+        # Один SELECT прогревает кеш настроек для всех последующих get_setting()
+        settings = database.get_all_settings()
+        token = settings.get("telegram_bot_token")
+        bot_username = settings.get("telegram_bot_username")
+        admin_id = settings.get("admin_telegram_id")
 
         if not all([token, bot_username, admin_id]):
             return {
@@ -65,52 +100,32 @@ class BotController:
             }
 
         try:
+            # Bot создаём заново: его HTTP-сессия закрывается при остановке опроса
             self._bot = Bot(token=token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-            self._dp = Dispatcher()
-            
-            # Вешаем BanMiddleware на уровни событий, где доступен event_from_user
-            # Вместо уровня update, чтобы корректно отлавливать сообщения/колбэки забаненных пользователей
-            self._dp.message.middleware(BanMiddleware())
-            self._dp.callback_query.middleware(BanMiddleware())
-            
-            user_router = get_user_router()
-            admin_router = get_admin_router()
-
-            if not isinstance(user_router, Router):
-                raise TypeError(f"get_user_router() must return Router instance, got: {type(user_router)}")
-            if not isinstance(admin_router, Router):
-                raise TypeError(f"get_admin_router() must return Router instance, got: {type(admin_router)}")
-            
-            self._dp.include_router(user_router)
-            self._dp.include_router(admin_router)
-            
-            try:
-                asyncio.run_coroutine_threadsafe(self._bot.delete_webhook(drop_pending_updates=True), self._loop)
-            except Exception as e:
-                logger.warning(f"Не удалось удалить вебхук перед запуском опроса: {e}")
-
-            yookassa_shop_id = database.get_setting("yookassa_shop_id")
-            yookassa_secret_key = database.get_setting("yookassa_secret_key")
+            load_ban_set(database.get_banned_user_ids())
+
+            # Dispatcher с роутерами переживает stop/start, пока не изменились основные настройки
+            # бота; права админов роутеры проверяют через is_admin() на каждый вызов
+            dp_key = hash((token, bot_username, admin_id))
+            if self._dp is None or self._dp_key != dp_key:
+                self._dp = self._build_dispatcher()
+                self._dp_key = dp_key
+            else:
+                logger.info("Использую ранее собранный диспетчер.")
+
+            # Платёжные настройки берём из того же снимка, без отдельных запросов
+            yookassa_shop_id = settings.get("yookassa_shop_id")
+            yookassa_secret_key = settings.get("yookassa_secret_key")
             yookassa_enabled = bool(yookassa_shop_id and yookassa_secret_key)
 
-            cryptobot_token = database.get_setting("cryptobot_token")
-            cryptobot_enabled = bool(cryptobot_token)
-
-            heleket_shop_id = database.get_setting("heleket_merchant_id")
-            heleket_api_key = database.get_setting("heleket_api_key")
-            heleket_enabled = bool(heleket_api_key and heleket_shop_id)
-            
-            ton_wallet_address = database.get_setting("ton_wallet_address")
-            tonapi_key = database.get_setting("tonapi_key")
-            tonconnect_enabled = bool(ton_wallet_address and tonapi_key)
+            cryptobot_enabled = bool(settings.get("cryptobot_token"))
+            heleket_enabled = bool(settings.get("heleket_api_key") and settings.get("heleket_merchant_id"))
+            tonconnect_enabled = bool(settings.get("ton_wallet_address") and settings.get("tonapi_key"))
 
             # Telegram Stars (оплата в звёздах) — включается флагом в настройках
-            stars_flag = database.get_setting("stars_enabled")
-            stars_enabled = str(stars_flag).lower() in ("true", "1", "yes", "on")
+            stars_enabled = parse_bool(settings.get("stars_enabled"))
             # YooMoney (отдельная платёжка)
-            ym_flag = database.get_setting("yoomoney_enabled")
-            ym_wallet = database.get_setting("yoomoney_wallet")
-            yoomoney_enabled = (str(ym_flag).lower() in ("true", "1", "yes", "on")) and bool(ym_wallet)
+            yoomoney_enabled = parse_bool(settings.get("yoomoney_enabled")) and bool(settings.get("yoomoney_wallet"))
 
             if yookassa_enabled:
                 Configuration.account_id = yookassa_shop_id
@@ -135,6 +150,7 @@ class BotController:
             logger.error(f"Не удалось запустить бота: {e}", exc_info=True)
             self._bot = None
             self._dp = None
+            self._dp_key = None
             return {"status": "error", "message": f"Ошибка при запуске: {e}"}
 
     def stop(self):
@@ -5,6 +5,12 @@ CHOOSE_PAYMENT_METHOD_MESSAGE = "Выберите удобный способ о
 VPN_INACTIVE_TEXT = "❌ <b>Статус VPN:</b> Неактивен (срок истек)"
 VPN_NO_DATA_TEXT = "ℹ️ <b>Статус VPN:</b> У вас пока нет активных ключей."
 
+_BOOL_TRUE = frozenset({"true", "1", "yes", "on", "y", "t"})
+
+def parse_bool(value) -> bool:
+    """Строковый флаг из настроек/окружения -> bool ("true", "1", "yes", "on" ...)."""
+    return str(value).strip().lower() in _BOOL_TRUE
+
 def get_profile_text(username, total_spent, total_months, vpn_status_text):
     return (
         f"👤 <b>Профиль:</b> {username}\n\n"
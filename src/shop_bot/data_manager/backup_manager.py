@@ -175,6 +175,7 @@ def restore_from_file(uploaded_path: Path) -> bool:
         with sqlite3.connect(candidate_db) as src:
             with sqlite3.connect(DB_FILE) as dst:
                 src.backup(dst)
+        database.clear_settings_cache()
         
         # Миграции на всякий случай
         try:
@@ -5,6 +5,8 @@ from pathlib import Path
 import json
 import re
 from functools import lru_cache, wraps
+from contextlib import contextmanager
+import queue
 import time
 
 logger = logging.getLogger(__name__)
@@ -22,31 +24,66 @@ def normalize_host_name(name: str | None) -> str:
     return s
 
 # === Кеширование настроек для производительности ===
-_settings_cache: dict[str, tuple[str | None, float]] = {}  # {key: (value, timestamp)}
+_MISSING = object()  # маркер промаха: None в кеше означает «настройки нет в БД»
+_settings_cache: dict[str, tuple[float, str | None]] = {}  # {key: (expires_at, value)}
 _SETTINGS_CACHE_TTL = 300  # 5 минут
 
-def _get_cached_setting(key: str) -> str | None:
-    """Получить значение из кеша если оно еще свежее."""
-    if key in _settings_cache:
-        value, timestamp = _settings_cache[key]
-        if time.time() - timestamp < _SETTINGS_CACHE_TTL:
-            return value
-        else:
-            del _settings_cache[key]
-    return None
+def _get_cached_setting(key: str):
+    """Получить значение из кеша если оно еще свежее, иначе _MISSING."""
+    entry = _settings_cache.get(key)
+    if entry is None:
+        return _MISSING
+    expires_at, value = entry
+    if expires_at > time.monotonic():
+        return value
+    _settings_cache.pop(key, None)
+    return _MISSING
 
 def _set_cached_setting(key: str, value: str | None) -> None:
     """Установить значение в кеш."""
-    _settings_cache[key] = (value, time.time())
+    _settings_cache[key] = (time.monotonic() + _SETTINGS_CACHE_TTL, value)
+
+# Снимок всей таблицы bot_settings: (expires_at, {key: value})
+_all_settings_snapshot: tuple[float, dict[str, str | None]] | None = None
 
-def _clear_settings_cache() -> None:
+def clear_settings_cache() -> None:
     """Очистить кеш всех настроек."""
+    global _all_settings_snapshot
     _settings_cache.clear()
+    _all_settings_snapshot = None
+
+# === Пул соединений SQLite для горячих запросов ===
+# Соединения переиспользуются между вызовами вместо connect/close на каждый запрос.
+# Каждое соединение пула держит собственный кеш подготовленных выражений (ключ — текст SQL),
+# поэтому повторные запросы с тем же SQL не проходят разбор заново.
+_CONN_POOL_SIZE = 8
+_CONN_STATEMENT_CACHE = 256
+_conn_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=_CONN_POOL_SIZE)
+
+@contextmanager
+def _pooled_connection():
+    """Взять соединение из пула (или открыть новое) и вернуть его обратно после использования.
+    Транзакция фиксируется при успешном выходе и откатывается при исключении.
+    """
+    try:
+        conn = _conn_pool.get_nowait()
+    except queue.Empty:
+        conn = sqlite3.connect(DB_FILE, check_same_thread=False, cached_statements=_CONN_STATEMENT_CACHE)
+    try:
+        with conn:
+            yield conn
+    finally:
+        try:
+            _conn_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
 
 def initialize_db():
     try:
         with sqlite3.connect(DB_FILE) as conn:
             cursor = conn.cursor()
+            # WAL: читатели не блокируют писателя (режим сохраняется в файле БД)
+            cursor.execute("PRAGMA journal_mode=WAL")
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS users (
                     telegram_id INTEGER PRIMARY KEY, username TEXT, total_spent REAL DEFAULT 0,
@@ -306,6 +343,7 @@ def initialize_db():
             for key, value in default_settings.items():
                 cursor.execute("INSERT OR IGNORE INTO bot_settings (key, value) VALUES (?, ?)", (key, value))
             conn.commit()
+            clear_settings_cache()
             
             # Check if button configs exist, if not - migrate them
             cursor.execute("SELECT COUNT(*) FROM button_configs")
@@ -1282,6 +1320,42 @@ def find_and_complete_pending_transaction(
         logging.error(f"Не удалось завершить ожидающую транзакцию {payment_id}: {e}")
         return None
 
+_HOST_SPEEDTEST_INSERT_SQL = '''
+    INSERT INTO host_speedtests
+    (host_name, method, ping_ms, jitter_ms, download_mbps, upload_mbps, server_name, server_id, ok, error)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _host_speedtest_params(
+    host_name: str,
+    method: str,
+    ping_ms: float | None = None,
+    jitter_ms: float | None = None,
+    download_mbps: float | None = None,
+    upload_mbps: float | None = None,
+    server_name: str | None = None,
+    server_id: str | None = None,
+    ok: bool = True,
+    error: str | None = None,
+) -> tuple:
+    method_s = (method or '').strip().lower()
+    if method_s not in ('ssh', 'net'):
+        method_s = 'ssh'
+    return (
+        normalize_host_name(host_name),
+        method_s,
+        ping_ms,
+        jitter_ms,
+        download_mbps,
+        upload_mbps,
+        server_name,
+        server_id,
+        1 if ok else 0,
+        (error or None)
+    )
+
+
 def insert_host_speedtest(
     host_name: str,
     method: str,
@@ -1296,37 +1370,34 @@ def insert_host_speedtest(
 ) -> bool:
     """Сохранить результат спидтеста в таблицу host_speedtests."""
     try:
-        host_name_n = normalize_host_name(host_name)
-        method_s = (method or '').strip().lower()
-        if method_s not in ('ssh', 'net'):
-            method_s = 'ssh'
+        params = _host_speedtest_params(
+            host_name, method, ping_ms, jitter_ms, download_mbps, upload_mbps,
+            server_name, server_id, ok, error,
+        )
         with sqlite3.connect(DB_FILE) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                '''
-                INSERT INTO host_speedtests
-                (host_name, method, ping_ms, jitter_ms, download_mbps, upload_mbps, server_name, server_id, ok, error)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                '''
-                , (
-                    host_name_n,
-                    method_s,
-                    ping_ms,
-                    jitter_ms,
-                    download_mbps,
-                    upload_mbps,
-                    server_name,
-                    server_id,
-                    1 if ok else 0,
-                    (error or None)
-                )
-            )
+            cursor.execute(_HOST_SPEEDTEST_INSERT_SQL, params)
             conn.commit()
             return True
     except sqlite3.Error as e:
         logging.error(f"Не удалось сохранить запись speedtest для '{host_name}': {e}")
         return False
 
+
+def insert_host_speedtests_batch(rows: list[dict]) -> bool:
+    """Сохранить несколько результатов спидтестов одной транзакцией.
+    rows — именованные аргументы insert_host_speedtest.
+    """
+    if not rows:
+        return True
+    try:
+        with _pooled_connection() as conn:
+            conn.executemany(_HOST_SPEEDTEST_INSERT_SQL, [_host_speedtest_params(**r) for r in rows])
+        return True
+    except sqlite3.Error as e:
+        logging.error(f"Не удалось сохранить пачку записей speedtest: {e}")
+        return False
+
 def get_admin_stats() -> dict:
     """Return aggregated statistics for the admin dashboard.
     Includes:
@@ -1485,21 +1556,32 @@ def create_gift_key(user_id: int, host_name: str, key_email: str, months: int, x
 def get_setting(key: str) -> str | None:
     # Сначала проверяем кеш
     cached = _get_cached_setting(key)
-    if cached is not None:
+    if cached is not _MISSING:
         return cached
-    
-    try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT value FROM bot_settings WHERE key = ?", (key,))
-            result = cursor.fetchone()
-            value = result[0] if result else None
-            # Кешируем результат
-            _set_cached_setting(key, value)
-            return value
-    except sqlite3.Error as e:
-        logging.error(f"Не удалось получить настройку '{key}': {e}")
+    # Промах — читаем всю таблицу одним запросом (заодно прогревается кеш остальных ключей)
+    snapshot = _settings_snapshot()
+    if snapshot is None:
         return None
+    value = snapshot.get(key)
+    _set_cached_setting(key, value)
+    return value
+
+def get_settings_bulk(keys) -> dict[str, str | None]:
+    """Получить несколько настроек сразу; свежие значения берутся из кеша."""
+    result: dict[str, str | None] = {}
+    snapshot = None
+    for key in keys:
+        cached = _get_cached_setting(key)
+        if cached is _MISSING:
+            if snapshot is None:
+                snapshot = _settings_snapshot()
+            if snapshot is None:
+                result[key] = None
+                continue
+            cached = snapshot.get(key)
+            _set_cached_setting(key, cached)
+        result[key] = cached
+    return result
 
 def get_admin_ids() -> set[int]:
     """Возвращает множество ID администраторов из настроек.
@@ -1570,20 +1652,30 @@ def get_referrals_for_user(user_id: int) -> list[dict]:
         logging.error(f"Не удалось получить рефералов для пользователя {user_id}: {e}")
         return []
         
-def get_all_settings() -> dict:
-    settings = {}
+def _settings_snapshot() -> dict[str, str | None] | None:
+    """Вся таблица настроек из кеша; перечитывается одним SELECT по истечении TTL.
+    Возвращает общий словарь — не изменять. None — если БД недоступна.
+    """
+    global _all_settings_snapshot
+    snap = _all_settings_snapshot
+    now = time.monotonic()
+    if snap is not None and snap[0] > now:
+        return snap[1]
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT key, value FROM bot_settings")
-            rows = cursor.fetchall()
-            for row in rows:
-                settings[row['key']] = row['value']
+        with _pooled_connection() as conn:
+            settings = dict(conn.execute("SELECT key, value FROM bot_settings").fetchall())
     except sqlite3.Error as e:
         logging.error(f"Не удалось получить все настройки: {e}")
+        return None
+    expires_at = now + _SETTINGS_CACHE_TTL
+    _all_settings_snapshot = (expires_at, settings)
+    for key, value in settings.items():
+        _settings_cache[key] = (expires_at, value)
     return settings
 
+def get_all_settings() -> dict:
+    return dict(_settings_snapshot() or {})
+
 def update_setting(key: str, value: str):
     try:
         with sqlite3.connect(DB_FILE) as conn:
@@ -1592,6 +1684,8 @@ def update_setting(key: str, value: str):
             conn.commit()
             # Инвалидируем кеш для этой настройки
             _set_cached_setting(key, value)
+            if _all_settings_snapshot is not None:
+                _all_settings_snapshot[1][key] = value
             logging.info(f"Настройка '{key}' обновлена.")
     except sqlite3.Error as e:
         logging.error(f"Не удалось обновить настройку '{key}': {e}")
@@ -1700,22 +1794,55 @@ def add_to_referral_balance(user_id: int, amount: float):
 
 def set_referral_balance(user_id: int, value: float):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
+        with _pooled_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE users SET referral_balance = ? WHERE telegram_id = ?", (value, user_id))
-            conn.commit()
     except sqlite3.Error as e:
         logging.error(f"Не удалось установить реферальный баланс для пользователя {user_id}: {e}")
 
 def set_referral_balance_all(user_id: int, value: float):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
+        with _pooled_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE users SET referral_balance_all = ? WHERE telegram_id = ?", (value, user_id))
-            conn.commit()
     except sqlite3.Error as e:
         logging.error(f"Не удалось установить общий реферальный баланс для пользователя {user_id}: {e}")
 
+def zero_referral_balances_bulk(user_ids, min_balance: float | None = None) -> tuple[dict[int, float], set[int]] | None:
+    """Обнулить реферальные балансы сразу для пачки пользователей одним UPDATE ... IN (...).
+    При заданном min_balance обнуляются только пользователи с referral_balance >= min_balance.
+    Возвращает ({telegram_id: реферальный баланс до обнуления} для обнулённых, множество
+    найденных в БД telegram_id) или None при ошибке БД.
+    """
+    ids = list(dict.fromkeys(int(u) for u in user_ids))
+    if not ids:
+        return {}, set()
+    placeholders = ",".join("?" * len(ids))
+    try:
+        with _pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                f"SELECT telegram_id, referral_balance FROM users WHERE telegram_id IN ({placeholders})",
+                ids
+            )
+            rows = cursor.fetchall()
+            existing = {row[0] for row in rows}
+            zeroed = {
+                row[0]: (row[1] or 0.0) for row in rows
+                if min_balance is None or (row[1] or 0.0) >= min_balance
+            }
+            if zeroed:
+                cursor.execute(
+                    "UPDATE users SET referral_balance = 0, referral_balance_all = 0 "
+                    f"WHERE telegram_id IN ({','.join('?' * len(zeroed))})",
+                    list(zeroed)
+                )
+            return zeroed, existing
+    except sqlite3.Error as e:
+        logging.error(f"Не удалось обнулить реферальные балансы для пользователей {ids}: {e}")
+        return None
+
 def add_to_referral_balance_all(user_id: int, amount: float):
     try:
         with sqlite3.connect(DB_FILE) as conn:
@@ -1741,7 +1868,7 @@ def get_referral_balance_all(user_id: int) -> float:
 
 def get_referral_balance(user_id: int) -> float:
     try:
-        with sqlite3.connect(DB_FILE) as conn:
+        with _pooled_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT referral_balance FROM users WHERE telegram_id = ?", (user_id,))
             result = cursor.fetchone()
@@ -1849,9 +1976,9 @@ def get_referral_count(user_id: int) -> int:
 
 def get_user(telegram_id: int):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            conn.row_factory = sqlite3.Row
+        with _pooled_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
             cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
             user_data = cursor.fetchone()
             return dict(user_data) if user_data else None
@@ -2273,23 +2400,47 @@ def get_users_paginated(page: int = 1, per_page: int = 20, q: str | None = None)
         return [], 0
     return users, total
 
-def ban_user(telegram_id: int):
+def ban_user(telegram_id: int) -> bool:
     try:
         with sqlite3.connect(DB_FILE) as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE users SET is_banned = 1 WHERE telegram_id = ?", (telegram_id,))
             conn.commit()
+            return True
     except sqlite3.Error as e:
         logging.error(f"Не удалось ban user {telegram_id}: {e}")
+        return False
+
+def get_all_user_ids() -> set[int]:
+    """Множество telegram_id всех пользователей."""
+    try:
+        with _pooled_connection() as conn:
+            rows = conn.execute("SELECT telegram_id FROM users").fetchall()
+            return {row[0] for row in rows}
+    except sqlite3.Error as e:
+        logging.error(f"Не удалось получить список пользователей: {e}")
+        return set()
 
-def unban_user(telegram_id: int):
+def get_banned_user_ids() -> set[int]:
+    """Множество telegram_id всех забаненных пользователей."""
+    try:
+        with _pooled_connection() as conn:
+            rows = conn.execute("SELECT telegram_id FROM users WHERE is_banned = 1").fetchall()
+            return {row[0] for row in rows}
+    except sqlite3.Error as e:
+        logging.error(f"Не удалось получить список забаненных пользователей: {e}")
+        return set()
+
+def unban_user(telegram_id: int) -> bool:
     try:
         with sqlite3.connect(DB_FILE) as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE users SET is_banned = 0 WHERE telegram_id = ?", (telegram_id,))
             conn.commit()
+            return True
     except sqlite3.Error as e:
         logging.error(f"Не удалось unban user {telegram_id}: {e}")
+        return False
 
 def delete_user_keys(user_id: int):
     try:
@@ -2508,39 +2659,44 @@ def get_all_tickets_count() -> int:
         logging.error("Не удалось get all tickets count: %s", e)
         return 0
 # --- Host metrics helpers ---
+_HOST_METRICS_INSERT_SQL = '''
+    INSERT INTO host_metrics (
+        host_name, cpu_percent, mem_percent, mem_used, mem_total,
+        disk_percent, disk_used, disk_total, load1, load5, load15,
+        uptime_seconds, ok, error
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _host_metrics_params(host_name: str, metrics: dict) -> tuple:
+    host_name_n = normalize_host_name(host_name)
+    m = metrics or {}
+    load = m.get('loadavg') or {}
+    return (
+        host_name_n,
+        float(m.get('cpu_percent')) if m.get('cpu_percent') is not None else None,
+        float(m.get('mem_percent')) if m.get('mem_percent') is not None else None,
+        int(m.get('mem_used')) if m.get('mem_used') is not None else None,
+        int(m.get('mem_total')) if m.get('mem_total') is not None else None,
+        float(m.get('disk_percent')) if m.get('disk_percent') is not None else None,
+        int(m.get('disk_used')) if m.get('disk_used') is not None else None,
+        int(m.get('disk_total')) if m.get('disk_total') is not None else None,
+        float(load.get('1m')) if load.get('1m') is not None else None,
+        float(load.get('5m')) if load.get('5m') is not None else None,
+        float(load.get('15m')) if load.get('15m') is not None else None,
+        float(m.get('uptime_seconds')) if m.get('uptime_seconds') is not None else None,
+        1 if (m.get('ok') in (True, 1, '1')) else 0,
+        str(m.get('error')) if m.get('error') else None,
+    )
+
+
 def insert_host_metrics(host_name: str, metrics: dict) -> bool:
     """Insert a resource metrics row for host_name using dict from resource_monitor.get_host_metrics_via_ssh."""
     try:
-        host_name_n = normalize_host_name(host_name)
-        m = metrics or {}
-        load = m.get('loadavg') or {}
+        params = _host_metrics_params(host_name, metrics)
         with sqlite3.connect(DB_FILE) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                '''
-                INSERT INTO host_metrics (
-                    host_name, cpu_percent, mem_percent, mem_used, mem_total,
-                    disk_percent, disk_used, disk_total, load1, load5, load15,
-                    uptime_seconds, ok, error
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''',
-                (
-                    host_name_n,
-                    float(m.get('cpu_percent')) if m.get('cpu_percent') is not None else None,
-                    float(m.get('mem_percent')) if m.get('mem_percent') is not None else None,
-                    int(m.get('mem_used')) if m.get('mem_used') is not None else None,
-                    int(m.get('mem_total')) if m.get('mem_total') is not None else None,
-                    float(m.get('disk_percent')) if m.get('disk_percent') is not None else None,
-                    int(m.get('disk_used')) if m.get('disk_used') is not None else None,
-                    int(m.get('disk_total')) if m.get('disk_total') is not None else None,
-                    float(load.get('1m')) if load.get('1m') is not None else None,
-                    float(load.get('5m')) if load.get('5m') is not None else None,
-                    float(load.get('15m')) if load.get('15m') is not None else None,
-                    float(m.get('uptime_seconds')) if m.get('uptime_seconds') is not None else None,
-                    1 if (m.get('ok') in (True, 1, '1')) else 0,
-                    str(m.get('error')) if m.get('error') else None,
-                )
-            )
+            cursor.execute(_HOST_METRICS_INSERT_SQL, params)
             conn.commit()
             return True
     except sqlite3.Error as e:
@@ -2593,6 +2749,16 @@ def get_latest_host_metrics(host_name: str) -> dict | None:
         return None
 
 # --- Button Configs Functions ---
+def _normalize_button_config(row: sqlite3.Row) -> dict:
+    """Привести числовые поля конфигурации кнопки к int и обрезать button_id."""
+    cfg = dict(row)
+    cfg['button_id'] = (cfg.get('button_id') or '').strip()
+    cfg['text'] = cfg.get('text') or ''
+    for field in ('row_position', 'column_position', 'sort_order'):
+        cfg[field] = int(cfg.get(field) or 0)
+    cfg['button_width'] = max(1, min(int(cfg.get('button_width') or 1), 3))
+    return cfg
+
 def get_button_configs(menu_type: str = None) -> list[dict]:
     """Get all button configurations, optionally filtered by menu_type."""
     try:
@@ -2610,7 +2776,7 @@ def get_button_configs(menu_type: str = None) -> list[dict]:
                     "SELECT * FROM button_configs ORDER BY menu_type, sort_order, id"
                 )
             
-            return [dict(row) for row in cursor.fetchall()]
+            return [_normalize_button_config(row) for row in cursor.fetchall()]
     except sqlite3.Error as e:
         logging.error(f"Не удалось get button configs: {e}")
         return []
@@ -2930,6 +3096,34 @@ def force_button_migration() -> bool:
 
 
 # Resource metrics functions
+_RESOURCE_METRIC_INSERT_SQL = '''
+    INSERT INTO resource_metrics (
+        scope, object_name, cpu_percent, mem_percent, disk_percent, load1,
+        net_bytes_sent, net_bytes_recv, raw_json
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _resource_metric_params(
+    scope: str,
+    object_name: str,
+    *,
+    cpu_percent: float | None = None,
+    mem_percent: float | None = None,
+    disk_percent: float | None = None,
+    load1: float | None = None,
+    net_bytes_sent: int | None = None,
+    net_bytes_recv: int | None = None,
+    raw_json: str | None = None,
+) -> tuple:
+    return (
+        (scope or '').strip(),
+        (object_name or '').strip(),
+        cpu_percent, mem_percent, disk_percent, load1,
+        net_bytes_sent, net_bytes_recv, raw_json,
+    )
+
+
 def insert_resource_metric(
     scope: str,
     object_name: str,
@@ -2947,17 +3141,11 @@ def insert_resource_metric(
         with sqlite3.connect(DB_FILE) as conn:
             cursor = conn.cursor()
             cursor.execute(
-                '''
-                INSERT INTO resource_metrics (
-                    scope, object_name, cpu_percent, mem_percent, disk_percent, load1,
-                    net_bytes_sent, net_bytes_recv, raw_json
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''',
-                (
-                    (scope or '').strip(),
-                    (object_name or '').strip(),
-                    cpu_percent, mem_percent, disk_percent, load1,
-                    net_bytes_sent, net_bytes_recv, raw_json,
+                _RESOURCE_METRIC_INSERT_SQL,
+                _resource_metric_params(
+                    scope, object_name,
+                    cpu_percent=cpu_percent, mem_percent=mem_percent, disk_percent=disk_percent, load1=load1,
+                    net_bytes_sent=net_bytes_sent, net_bytes_recv=net_bytes_recv, raw_json=raw_json,
                 )
             )
             conn.commit()
@@ -2967,6 +3155,32 @@ def insert_resource_metric(
         return None
 
 
+def insert_metrics_batch(host_metrics: list[tuple[str, dict]], resource_metrics: list[dict]) -> bool:
+    """Записать метрики одного цикла сбора одной транзакцией.
+    host_metrics — пары (host_name, metrics) как для insert_host_metrics,
+    resource_metrics — именованные аргументы insert_resource_metric (scope, object_name, ...).
+    """
+    host_rows = []
+    for host_name, m in host_metrics:
+        try:
+            host_rows.append(_host_metrics_params(host_name, m))
+        except (TypeError, ValueError) as e:
+            logging.warning("Пропускаю некорректные метрики хоста %s: %s", host_name, e)
+    resource_rows = [_resource_metric_params(**r) for r in resource_metrics]
+    if not host_rows and not resource_rows:
+        return True
+    try:
+        with _pooled_connection() as conn:
+            if host_rows:
+                conn.executemany(_HOST_METRICS_INSERT_SQL, host_rows)
+            if resource_rows:
+                conn.executemany(_RESOURCE_METRIC_INSERT_SQL, resource_rows)
+        return True
+    except sqlite3.Error as e:
+        logging.error("Не удалось записать пачку метрик: %s", e)
+        return False
+
+
 def get_latest_resource_metric(scope: str, object_name: str) -> dict | None:
     """Get the latest resource metric for a scope/object."""
     try:
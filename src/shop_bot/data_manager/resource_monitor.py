@@ -2,7 +2,11 @@ import os
 import json
 import time
 import logging
+import select
 import shutil
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Tuple
 
@@ -14,34 +18,83 @@ logger = logging.getLogger(__name__)
 
 
 # -------- Local metrics (container/host running the panel) --------
+# psutil.cpu_percent(interval=None) не блокирует поток и отдаёт загрузку с момента прошлого вызова.
+# Первый вызов делаем при импорте; при слишком частых вызовах (<1 с) возвращаем прошлое значение.
+_CPU_MIN_INTERVAL = 1.0
+_cpu_state: Dict[str, Any] = {'at': None, 'value': None}
+
+try:
+    import psutil as _psutil  # type: ignore
+    _psutil.cpu_percent(interval=None)
+    _cpu_state['at'] = time.monotonic()
+except Exception:
+    pass
+
+
+def _cpu_percent_since_last_call(psutil) -> float | None:
+    now = time.monotonic()
+    last_at = _cpu_state['at']
+    if last_at is not None and now - last_at < _CPU_MIN_INTERVAL:
+        return _cpu_state['value']
+    value = float(psutil.cpu_percent(interval=None))
+    _cpu_state['at'] = now
+    if last_at is None:
+        # Без предыдущего замера psutil возвращает бессмысленный 0.0
+        return None
+    _cpu_state['value'] = value
+    return value
+
+
+def _read_proc_file(path: str, size: int = 8192) -> bytes:
+    # procfs генерирует содержимое при чтении: один read() даёт согласованный снимок
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, size)
+    finally:
+        os.close(fd)
+
+
+def _meminfo_field_kb(buf: bytes, key: bytes) -> int | None:
+    i = buf.find(key)
+    if i < 0:
+        return None
+    j = buf.find(b'\n', i)
+    return int(buf[i + len(key):j if j >= 0 else None].split()[0])
+
+
 def _read_proc_meminfo() -> Tuple[int | None, int | None]:
-    total_kb = None
-    avail_kb = None
     try:
-        with open('/proc/meminfo', 'r') as f:
-            for line in f:
-                if line.startswith('MemTotal:'):
-                    parts = line.split()
-                    total_kb = int(parts[1])
-                elif line.startswith('MemAvailable:'):
-                    parts = line.split()
-                    avail_kb = int(parts[1])
-                if total_kb is not None and avail_kb is not None:
-                    break
+        buf = _read_proc_file('/proc/meminfo')
+        return _meminfo_field_kb(buf, b'MemTotal:'), _meminfo_field_kb(buf, b'MemAvailable:')
     except Exception:
-        pass
-    return total_kb, avail_kb
+        return None, None
 
 
 def _get_uptime_seconds_fallback() -> float | None:
     try:
-        with open('/proc/uptime', 'r') as f:
-            txt = f.read().strip().split()
-            return float(txt[0])
+        return float(_read_proc_file('/proc/uptime', 64).split()[0])
     except Exception:
         return None
 
 
+# Заполненность диска меняется медленно: statvfs не чаще раза в минуту
+_DISK_CACHE_TTL = 60.0
+_disk_cache: Tuple[float, Any] | None = None
+
+
+def _disk_usage_cached():
+    global _disk_cache
+    now = time.monotonic()
+    if _disk_cache is not None and now - _disk_cache[0] < _DISK_CACHE_TTL:
+        return _disk_cache[1]
+    disk_path = '/'
+    if os.name == 'nt':
+        disk_path = os.environ.get('SystemDrive', 'C:') + '\\'
+    du = shutil.disk_usage(disk_path)
+    _disk_cache = (now, du)
+    return du
+
+
 def get_local_metrics() -> Dict[str, Any]:
     out: Dict[str, Any] = {
         'ok': True,
@@ -75,10 +128,7 @@ def get_local_metrics() -> Dict[str, Any]:
 
     # Disk usage (root)
     try:
-        disk_path = '/'
-        if os.name == 'nt':
-            disk_path = os.environ.get('SystemDrive', 'C:') + '\\'
-        du = shutil.disk_usage(disk_path)
+        du = _disk_usage_cached()
         out['disk_total'] = int(du.total)
         out['disk_used'] = int(du.used)
         out['disk_free'] = int(du.free)
@@ -90,7 +140,7 @@ def get_local_metrics() -> Dict[str, Any]:
     try:
         import psutil  # type: ignore
 
-        out['cpu_percent'] = float(psutil.cpu_percent(interval=0.1))
+        out['cpu_percent'] = _cpu_percent_since_last_call(psutil)
         vm = psutil.virtual_memory()
         out['mem_total'] = int(vm.total)
         out['mem_used'] = int(vm.used)
@@ -132,6 +182,28 @@ def get_local_metrics() -> Dict[str, Any]:
 
 
 # -------- Remote host metrics (via SSH) --------
+# Разобранные приватные ключи: (путь, mtime_ns) -> PKey или None, если формат не распознан
+_PKEY_CACHE: Dict[Tuple[str, int], paramiko.PKey | None] = {}
+
+
+def _load_private_key(path: str) -> paramiko.PKey | None:
+    try:
+        cache_key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+    if cache_key in _PKEY_CACHE:
+        return _PKEY_CACHE[cache_key]
+    pkey = None
+    for KeyClass in (paramiko.RSAKey, paramiko.Ed25519Key):
+        try:
+            pkey = KeyClass.from_private_key_file(path)
+            break
+        except Exception:
+            pkey = None
+    _PKEY_CACHE[cache_key] = pkey
+    return pkey
+
+
 def _ssh_connect(host_row: dict) -> paramiko.SSHClient:
     ssh_host = (host_row.get('ssh_host') or '').strip()
     ssh_port = int(host_row.get('ssh_port') or 22)
@@ -144,24 +216,160 @@ def _ssh_connect(host_row: dict) -> paramiko.SSHClient:
 
     ssh = paramiko.SSHClient()
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    pkey = None
-    if ssh_key_path:
-        for KeyClass in (paramiko.RSAKey, paramiko.Ed25519Key):
-            try:
-                pkey = KeyClass.from_private_key_file(ssh_key_path)
-                break
-            except Exception:
-                pkey = None
+    pkey = _load_private_key(ssh_key_path) if ssh_key_path else None
     ssh.connect(ssh_host, port=ssh_port, username=ssh_user, password=ssh_password, pkey=pkey, timeout=20)
     return ssh
 
 
+# Пул SSH-подключений: одна сессия на хост переживает интервалы между опросами метрик
+_SSH_POOL: Dict[tuple, Tuple[paramiko.SSHClient, float]] = {}
+_SSH_POOL_LOCK = threading.Lock()
+_SSH_KEEPALIVE_SECONDS = 30
+_SSH_IDLE_SECONDS = 600
+
+# Сколько хостов collect_hosts_metrics() опрашивает одновременно
+_COLLECT_MAX_WORKERS = 16
+
+# Ошибки, после которых соединение из пула считаем мёртвым
+_SSH_CONN_ERRORS = (paramiko.SSHException, EOFError, socket.error)
+
+
+def _ssh_pool_key(host_row: dict) -> tuple:
+    return (
+        (host_row.get('ssh_host') or '').strip(),
+        int(host_row.get('ssh_port') or 22),
+        (host_row.get('ssh_user') or '').strip(),
+        host_row.get('ssh_password'),
+        (host_row.get('ssh_key_path') or '').strip(),
+    )
+
+
+def _close_quietly(ssh: paramiko.SSHClient) -> None:
+    try:
+        ssh.close()
+    except Exception:
+        pass
+
+
+def _is_alive(ssh: paramiko.SSHClient) -> bool:
+    transport = ssh.get_transport()
+    return transport is not None and transport.is_active()
+
+
+def _get_pooled_ssh(host_row: dict) -> paramiko.SSHClient:
+    """Живое подключение из пула или новое (с keepalive), если его нет или оно умерло."""
+    key = _ssh_pool_key(host_row)
+    with _SSH_POOL_LOCK:
+        entry = _SSH_POOL.get(key)
+        if entry is not None:
+            ssh = entry[0]
+            if _is_alive(ssh):
+                _SSH_POOL[key] = (ssh, time.monotonic())
+                return ssh
+            del _SSH_POOL[key]
+            _close_quietly(ssh)
+
+    # Подключаемся вне блокировки: рукопожатие может занять секунды
+    ssh = _ssh_connect(host_row)
+    transport = ssh.get_transport()
+    if transport is not None:
+        transport.set_keepalive(_SSH_KEEPALIVE_SECONDS)
+
+    with _SSH_POOL_LOCK:
+        entry = _SSH_POOL.get(key)
+        if entry is not None and _is_alive(entry[0]):
+            # Параллельный вызов успел положить своё подключение — используем его
+            _close_quietly(ssh)
+            ssh = entry[0]
+        _SSH_POOL[key] = (ssh, time.monotonic())
+    return ssh
+
+
+def _evict_ssh(host_row: dict, ssh: paramiko.SSHClient) -> None:
+    key = _ssh_pool_key(host_row)
+    with _SSH_POOL_LOCK:
+        entry = _SSH_POOL.get(key)
+        if entry is not None and entry[0] is ssh:
+            del _SSH_POOL[key]
+        _UPTIME_ANCHORS.pop(key, None)
+    _close_quietly(ssh)
+
+
+def acquire_ssh(host_row: dict) -> paramiko.SSHClient:
+    """Подключение к хосту из общего пула; после работы вернуть через release_ssh()."""
+    return _get_pooled_ssh(host_row)
+
+
+def release_ssh(host_row: dict, ssh: paramiko.SSHClient) -> None:
+    """Вернуть подключение в пул: живое остаётся для следующих операций, оборванное закрывается."""
+    if not _is_alive(ssh):
+        _evict_ssh(host_row, ssh)
+        return
+    key = _ssh_pool_key(host_row)
+    with _SSH_POOL_LOCK:
+        entry = _SSH_POOL.get(key)
+        if entry is not None and entry[0] is ssh:
+            _SSH_POOL[key] = (ssh, time.monotonic())
+
+
+def close_idle_ssh_connections(max_idle: float = _SSH_IDLE_SECONDS) -> int:
+    """Закрывает подключения из пула, не использовавшиеся дольше max_idle секунд."""
+    now = time.monotonic()
+    with _SSH_POOL_LOCK:
+        stale = [k for k, (_, last_used) in _SSH_POOL.items() if now - last_used > max_idle]
+        clients = [_SSH_POOL.pop(k)[0] for k in stale]
+        for k in stale:
+            _UPTIME_ANCHORS.pop(k, None)
+    for ssh in clients:
+        _close_quietly(ssh)
+    return len(clients)
+
+
+def ssh_exec_raw(ssh: paramiko.SSHClient, cmd: str, timeout: float = 20,
+                 open_timeout: float = 20) -> Tuple[int, bytes, bytes]:
+    """Выполнить команду в отдельном канале и вернуть (rc, stdout, stderr) в байтах.
+    Оба потока вычитываются по мере поступления (заполненный stderr не блокирует команду),
+    после статуса выхода — дочитываются до EOF. По истечении timeout — socket.timeout."""
+    transport = ssh.get_transport()
+    if transport is None or not transport.is_active():
+        raise paramiko.SSHException('SSH transport is not active')
+    chan = transport.open_session(timeout=open_timeout)
+    try:
+        chan.exec_command(cmd)
+        deadline = time.monotonic() + timeout
+        chunks: List[bytes] = []
+        err_chunks: List[bytes] = []
+        while True:
+            if chan.recv_ready():
+                chunks.append(chan.recv(65536))
+                continue
+            if chan.recv_stderr_ready():
+                err_chunks.append(chan.recv_stderr(65536))
+                continue
+            if chan.exit_status_ready():
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout(f'SSH command timed out after {timeout}s')
+            # stderr select не будит, поэтому ждём не дольше 0.5 с
+            select.select([chan], [], [], min(0.5, remaining))
+        # Статус выхода мог прийти вместе с последними данными: дочитываем оба потока до EOF
+        chan.settimeout(max(deadline - time.monotonic(), 1.0))
+        for recv, sink in ((chan.recv, chunks), (chan.recv_stderr, err_chunks)):
+            while True:
+                data = recv(65536)
+                if not data:
+                    break
+                sink.append(data)
+        return chan.recv_exit_status(), b''.join(chunks), b''.join(err_chunks)
+    finally:
+        chan.close()
+
+
 def _ssh_exec(ssh: paramiko.SSHClient, cmd: str, timeout: int = 20) -> Tuple[int, str, str]:
-    stdin, stdout, stderr = ssh.exec_command(cmd, timeout=timeout)
-    out = stdout.read().decode('utf-8', errors='ignore')
-    err = stderr.read().decode('utf-8', errors='ignore')
-    rc = stdout.channel.recv_exit_status() if hasattr(stdout, 'channel') else 0
-    return rc, out, err
+    """Выполнить команду через ssh_exec_raw; stderr возвращается только при ошибке."""
+    rc, out, err = ssh_exec_raw(ssh, cmd, timeout=timeout, open_timeout=timeout)
+    return rc, out.decode('utf-8', errors='ignore'), (err if rc else b'').decode('utf-8', errors='ignore')
 
 
 def get_host_metrics_via_ssh(host_row: dict) -> Dict[str, Any]:
@@ -183,138 +391,193 @@ def get_host_metrics_via_ssh(host_row: dict) -> Dict[str, Any]:
         'error': None,
     }
     try:
-        ssh = _ssh_connect(host_row)
+        ssh = _get_pooled_ssh(host_row)
     except Exception as e:
         res['error'] = f'SSH connect failed: {e}'
         return res
 
     try:
-        # CPU count
-        rc, out, _ = _ssh_exec(ssh, 'nproc || getconf _NPROCESSORS_ONLN || echo 1')
         try:
-            res['cpu_count'] = int((out or '1').strip().splitlines()[0])
-        except Exception:
-            res['cpu_count'] = 1
+            _collect_with_uptime_anchor(host_row, ssh, res)
+        except _SSH_CONN_ERRORS:
+            # Подключение из пула могло оборваться между опросами — переподключаемся один раз
+            _evict_ssh(host_row, ssh)
+            ssh = _get_pooled_ssh(host_row)
+            _collect_with_uptime_anchor(host_row, ssh, res)
+        res['ok'] = True
+    except Exception as e:
+        if isinstance(e, _SSH_CONN_ERRORS):
+            _evict_ssh(host_row, ssh)
+        res['ok'] = False
+        res['error'] = str(e)
+    return res
 
-        # loadavg
-        rc, out, _ = _ssh_exec(ssh, 'cat /proc/loadavg || uptime')
-        la = None
-        try:
-            parts = (out or '').strip().split()
-            la = {
-                '1m': float(parts[0]),
-                '5m': float(parts[1]),
-                '15m': float(parts[2]),
-            }
-        except Exception:
-            la = None
-        res['loadavg'] = la
-
-        if res['cpu_count']:
-            try:
-                cpu_pct = (la.get('1m') / float(res['cpu_count'])) * 100.0 if la and la.get('1m') is not None else None
-            except Exception:
-                cpu_pct = None
-            if cpu_pct is not None:
-                if cpu_pct < 0:
-                    cpu_pct = 0.0
-                res['cpu_percent'] = round(min(cpu_pct, 100.0), 2)
-
-        # meminfo
-        rc, out, _ = _ssh_exec(ssh, "grep -E 'MemTotal:|MemAvailable:' /proc/meminfo || cat /proc/meminfo")
-        total_kb = None
-        avail_kb = None
-        try:
-            for line in out.splitlines():
-                if line.startswith('MemTotal:'):
-                    total_kb = int(line.split()[1])
-                elif line.startswith('MemAvailable:'):
-                    avail_kb = int(line.split()[1])
-        except Exception:
-            pass
-        if total_kb is not None and avail_kb is not None:
-            total = total_kb * 1024
-            avail = avail_kb * 1024
-            used = total - avail
-            res['mem_total'] = total
-            res['mem_available'] = avail
-            res['mem_used'] = used
-            res['mem_percent'] = round((used / total) * 100.0, 2) if total else None
 
-        # disk usage (root)
-        rc, out, _ = _ssh_exec(ssh, "LC_ALL=C df -P -B1 / | tail -n 1")
-        try:
-            parts = out.strip().split()
-            if len(parts) >= 5:
-                total = int(parts[1])
-                used = int(parts[2])
-                avail = int(parts[3])
-                res['disk_total'] = total
-                res['disk_used'] = used
-                res['disk_free'] = avail
-                res['disk_percent'] = round((used / total) * 100.0, 2) if total else None
-        except Exception:
-            pass
+# Все метрики снимаются одной командой: разделы помечены маркерами ===NAME===
+_REMOTE_METRICS_CMD = (
+    "echo ===NPROC===; nproc || getconf _NPROCESSORS_ONLN || echo 1; "
+    "echo ===LOAD===; cat /proc/loadavg || uptime; "
+    "echo ===MEM===; awk '/^MemTotal:/ || /^MemAvailable:/' /proc/meminfo; "
+    "echo ===DF===; LC_ALL=C df -P -B1 / | tail -n 1"
+)
+_REMOTE_UPTIME_CMD = "; echo ===UP===; cat /proc/uptime || uptime -s"
+
+# Аптайм хоста растёт вместе с реальным временем, поэтому читаем его только при новом
+# SSH-подключении (перезагрузка хоста рвёт соединение) и раз в сутки, а между замерами
+# досчитываем по часам панели. Ключ — как у пула; значение: (аптайм, time.time() замера, клиент).
+_UPTIME_ANCHOR_SECONDS = 24 * 3600
+_UPTIME_ANCHORS: Dict[tuple, Tuple[float, float, paramiko.SSHClient]] = {}
+
+
+def _split_sections(out: str) -> Dict[str, str]:
+    sections: Dict[str, List[str]] = {}
+    current: List[str] | None = None
+    for line in out.splitlines():
+        if line.startswith('===') and line.endswith('===') and len(line) > 6:
+            current = sections.setdefault(line[3:-3], [])
+        elif current is not None:
+            current.append(line)
+    return {name: '\n'.join(lines) for name, lines in sections.items()}
+
+
+def _parse_cpu_count(out: str) -> int:
+    try:
+        return int((out or '1').strip().splitlines()[0])
+    except Exception:
+        return 1
+
+
+def _parse_loadavg(out: str) -> Dict[str, float] | None:
+    try:
+        parts = (out or '').strip().split()
+        return {
+            '1m': float(parts[0]),
+            '5m': float(parts[1]),
+            '15m': float(parts[2]),
+        }
+    except Exception:
+        return None
+
+
+def _parse_meminfo(out: str) -> Tuple[int | None, int | None]:
+    total_kb = None
+    avail_kb = None
+    try:
+        for line in out.splitlines():
+            if line.startswith('MemTotal:'):
+                total_kb = int(line.split()[1])
+            elif line.startswith('MemAvailable:'):
+                avail_kb = int(line.split()[1])
+    except Exception:
+        pass
+    return total_kb, avail_kb
+
+
+def _parse_uptime(out: str) -> float | None:
+    try:
+        return float(out.strip().split()[0])
+    except Exception:
+        pass
+    # `uptime -s` печатает время загрузки: "2024-01-01 10:00:00"
+    boot_str = (out or '').strip()
+    if not boot_str:
+        return None
+    try:
+        return (datetime.now() - datetime.fromisoformat(boot_str)).total_seconds()
+    except Exception:
+        return None
+
+
+def _collect_with_uptime_anchor(host_row: dict, ssh: paramiko.SSHClient, res: Dict[str, Any]) -> None:
+    key = _ssh_pool_key(host_row)
+    anchor = _UPTIME_ANCHORS.get(key)
+    now = time.time()
+    anchored = anchor is not None and anchor[2] is ssh and now - anchor[1] < _UPTIME_ANCHOR_SECONDS
+    _collect_remote_metrics(ssh, res, with_uptime=not anchored)
+    if anchored:
+        res['uptime_seconds'] = anchor[0] + (now - anchor[1])
+    elif res['uptime_seconds'] is not None:
+        _UPTIME_ANCHORS[key] = (res['uptime_seconds'], now, ssh)
 
-        # uptime seconds
-        rc, out, _ = _ssh_exec(ssh, 'cat /proc/uptime || uptime -s')
-        up = None
+
+def _collect_remote_metrics(ssh: paramiko.SSHClient, res: Dict[str, Any], with_uptime: bool = True) -> None:
+    rc, out, _ = _ssh_exec(ssh, _REMOTE_METRICS_CMD + _REMOTE_UPTIME_CMD if with_uptime else _REMOTE_METRICS_CMD)
+    sections = _split_sections(out or '')
+
+    res['cpu_count'] = _parse_cpu_count(sections.get('NPROC', ''))
+
+    la = _parse_loadavg(sections.get('LOAD', ''))
+    res['loadavg'] = la
+
+    if res['cpu_count']:
         try:
-            up = float(out.strip().split()[0])
+            cpu_pct = (la.get('1m') / float(res['cpu_count'])) * 100.0 if la and la.get('1m') is not None else None
         except Exception:
-            # try parse boot time
-            try:
-                rc, out2, _ = _ssh_exec(ssh, 'uptime -s')
-                boot_str = (out2 or '').strip()
-                if boot_str:
-                    try:
-                        boot_dt = datetime.fromisoformat(boot_str)
-                        up = (datetime.now() - boot_dt).total_seconds()
-                    except Exception:
-                        up = None
-            except Exception:
-                up = None
-        res['uptime_seconds'] = up
+            cpu_pct = None
+        if cpu_pct is not None:
+            if cpu_pct < 0:
+                cpu_pct = 0.0
+            res['cpu_percent'] = round(min(cpu_pct, 100.0), 2)
+
+    total_kb, avail_kb = _parse_meminfo(sections.get('MEM', ''))
+    if total_kb is not None and avail_kb is not None:
+        total = total_kb * 1024
+        avail = avail_kb * 1024
+        used = total - avail
+        res['mem_total'] = total
+        res['mem_available'] = avail
+        res['mem_used'] = used
+        res['mem_percent'] = round((used / total) * 100.0, 2) if total else None
+
+    # disk usage (root)
+    try:
+        parts = sections.get('DF', '').strip().split()
+        if len(parts) >= 5:
+            total = int(parts[1])
+            used = int(parts[2])
+            avail = int(parts[3])
+            res['disk_total'] = total
+            res['disk_used'] = used
+            res['disk_free'] = avail
+            res['disk_percent'] = round((used / total) * 100.0, 2) if total else None
+    except Exception:
+        pass
 
-        res['ok'] = True
-    except Exception as e:
-        res['ok'] = False
-        res['error'] = str(e)
-    finally:
+    if with_uptime:
+        res['uptime_seconds'] = _parse_uptime(sections.get('UP', ''))
+
+
+def _host_metrics_or_stub(h: dict) -> Dict[str, Any]:
+    # Проверяем наличие SSH настроек
+    if h.get('ssh_host') and h.get('ssh_user'):
+        # Хост с SSH - получаем метрики
         try:
-            ssh.close()
-        except Exception:
-            pass
-    return res
+            return get_host_metrics_via_ssh(h)
+        except Exception as e:
+            return {'ok': False, 'host_name': h.get('host_name'), 'error': str(e)}
+    # Хост без SSH - показываем базовую информацию
+    return {
+        'ok': False,
+        'host_name': h.get('host_name'),
+        'host_url': h.get('host_url'),
+        'error': 'SSH не настроен',
+        'cpu_percent': None,
+        'mem_percent': None,
+        'disk_percent': None,
+        'uptime_seconds': None
+    }
 
 
 def collect_hosts_metrics() -> Dict[str, Any]:
-    items: List[Dict[str, Any]] = []
     try:
         hosts = database.get_all_hosts()
     except Exception as e:
         return {'ok': False, 'items': [], 'error': f'get_all_hosts failed: {e}'}
+    if not hosts:
+        return {'ok': True, 'items': []}
 
-    for h in hosts:
-        # Проверяем наличие SSH настроек
-        if h.get('ssh_host') and h.get('ssh_user'):
-            # Хост с SSH - получаем метрики
-            try:
-                m = get_host_metrics_via_ssh(h)
-            except Exception as e:
-                m = {'ok': False, 'host_name': h.get('host_name'), 'error': str(e)}
-        else:
-            # Хост без SSH - показываем базовую информацию
-            m = {
-                'ok': False,
-                'host_name': h.get('host_name'),
-                'host_url': h.get('host_url'),
-                'error': 'SSH не настроен',
-                'cpu_percent': None,
-                'mem_percent': None,
-                'disk_percent': None,
-                'uptime_seconds': None
-            }
-        items.append(m)
+    # Хосты опрашиваются параллельно; map сохраняет порядок хостов
+    with ThreadPoolExecutor(max_workers=min(_COLLECT_MAX_WORKERS, len(hosts)), thread_name_prefix='host-metrics') as pool:
+        items: List[Dict[str, Any]] = list(pool.map(_host_metrics_or_stub, hosts))
 
     return {'ok': True, 'items': items}
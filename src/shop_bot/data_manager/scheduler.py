@@ -1,6 +1,9 @@
 ﻿import asyncio
 import logging
 import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from datetime import datetime, timedelta
 
@@ -16,9 +19,22 @@ from shop_bot.data_manager import resource_monitor
 from shop_bot.modules import xui_api
 from shop_bot.bot import keyboards
 
+try:
+    # orjson не обязателен: если установлен, метрики сериализуются быстрее
+    import orjson  # type: ignore
+
+    def _dumps_metrics(obj) -> str:
+        return orjson.dumps(obj).decode()
+except Exception:
+    def _dumps_metrics(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
 CHECK_INTERVAL_SECONDS = 300
 NOTIFY_BEFORE_HOURS = {72, 48, 24, 1}
-notified_users = {}
+# Бит для каждой отметки NOTIFY_BEFORE_HOURS
+_NOTIFY_MARK_BIT = {hours: 1 << i for i, hours in enumerate(sorted(NOTIFY_BEFORE_HOURS))}
+# key_id -> битовая маска отметок, по которым уведомление уже отправлено
+notified_users: dict[int, int] = {}
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +47,61 @@ _last_backup_run_at: datetime | None = None
 METRICS_INTERVAL_SECONDS = 5 * 60
 _last_metrics_run_at: datetime | None = None
 
+# Хосты опрашиваются параллельно; лимиты не дают перегрузить sshd и канал панели
+# (лимит спидтестов общий с speedtest_runner)
+METRICS_CONCURRENCY = 16
+SPEEDTEST_CONCURRENCY = speedtest_runner.SPEEDTEST_CONCURRENCY
+
+# Отдельный пул потоков для блокирующих SSH-опросов метрик: не делит default executor
+# с бэкапами и прочими to_thread-задачами, поэтому метрики не ждут в их очереди
+_SSH_EXECUTOR = ThreadPoolExecutor(max_workers=METRICS_CONCURRENCY, thread_name_prefix='ssh-metrics')
+
+# Список хостов читается одним запросом на цикл планировщика, а не в каждой задаче
+HOSTS_CACHE_TTL_SECONDS = 60
+_hosts_cache: tuple[float, list[dict]] | None = None
+
+def _hosts_snapshot() -> list[dict]:
+    global _hosts_cache
+    now = time.monotonic()
+    if _hosts_cache is not None and now - _hosts_cache[0] < HOSTS_CACHE_TTL_SECONDS:
+        return _hosts_cache[1]
+    hosts = database.get_all_hosts()
+    _hosts_cache = (now, hosts)
+    return hosts
+
+def invalidate_hosts_cache() -> None:
+    global _hosts_cache
+    _hosts_cache = None
+
+_EMAIL_USER_ID_RE = re.compile(r"user(\d+)")
+
+def _extract_user_id(email: str) -> int | None:
+    """user_id из email клиента вида user12345-key1-...@telegram.bot (или None)."""
+    head = email.split('-', 1)[0]
+    if head.startswith('user') and head[4:].isdigit():
+        return int(head[4:])
+    # Нестандартный формат: ищем userNNN в любом месте, как раньше
+    m = _EMAIL_USER_ID_RE.search(email)
+    return int(m.group(1)) if m else None
+
+def _build_orphan(email: str, client, host_name: str) -> tuple[int, int, str] | None:
+    """(user_id, expiry_ms, uuid) для клиента панели без записи в БД или None, если привязать нельзя."""
+    user_id = _extract_user_id(email)
+    if not user_id:
+        logger.warning(
+            f"Scheduler: Найден осиротевший клиент '{email}' на '{host_name}', но не удалось определить user_id — пропускаю."
+        )
+        return None
+    client_uuid = getattr(client, 'id', None) or getattr(client, 'email', None)
+    if not client_uuid:
+        logger.warning(
+            f"Scheduler: У осиротевшего клиента '{email}' нет UUID/id — не могу привязать."
+        )
+        return None
+    reset_days = getattr(client, 'reset', 0) or 0
+    expiry_ms = int(getattr(client, 'expiry_time', 0) or 0) + int(reset_days) * 24 * 3600 * 1000
+    return user_id, expiry_ms, str(client_uuid)
+
 def format_time_left(hours: int) -> str:
     if hours >= 24:
         days = hours // 24
@@ -72,31 +143,19 @@ async def send_subscription_notification(bot: Bot, user_id: int, key_id: int, ti
         logger.error(f"Scheduler: Ошибка отправки уведомления пользователю {user_id}: {e}")
 
 def _cleanup_notified_users(all_db_keys: list[dict]):
+    global notified_users
     if not notified_users:
         return
 
     logger.debug("Scheduler: Очищаю кэш уведомлений...")
-    
+
     active_key_ids = {key['key_id'] for key in all_db_keys}
-    
-    users_to_check = list(notified_users.keys())
-    
-    cleaned_users = 0
-    cleaned_keys = 0
-
-    for user_id in users_to_check:
-        keys_to_check = list(notified_users[user_id].keys())
-        for key_id in keys_to_check:
-            if key_id not in active_key_ids:
-                del notified_users[user_id][key_id]
-                cleaned_keys += 1
-        
-        if not notified_users[user_id]:
-            del notified_users[user_id]
-            cleaned_users += 1
-    
-    if cleaned_users > 0 or cleaned_keys > 0:
-        logger.debug(f"Scheduler: Очистка завершена. Удалено записей пользователей: {cleaned_users}, ключей: {cleaned_keys}.")
+    before = len(notified_users)
+    notified_users = {k: v for k, v in notified_users.items() if k in active_key_ids}
+    cleaned_keys = before - len(notified_users)
+
+    if cleaned_keys > 0:
+        logger.debug(f"Scheduler: Очистка завершена. Удалено записей ключей: {cleaned_keys}.")
 
 async def check_expiring_subscriptions(bot: Bot):
     logger.debug("Scheduler: Проверяю истекающие подписки...")
@@ -104,40 +163,61 @@ async def check_expiring_subscriptions(bot: Bot):
     all_keys = database.get_all_keys()
     
     _cleanup_notified_users(all_keys)
-    
+
+    # Границы окна уведомлений в формате, в котором sqlite хранит expiry_date
+    # ("YYYY-MM-DD HH:MM:SS[.ffffff]"): такие строки сравниваются лексикографически,
+    # поэтому ключи вне окна отсекаются без разбора даты.
+    window_start = str(current_time)[:19]
+    window_end = str(current_time + timedelta(hours=max(NOTIFY_BEFORE_HOURS) + 1))
+    now_ts = current_time.timestamp()
+
     for key in all_keys:
         try:
-            expiry_date = datetime.fromisoformat(key['expiry_date'])
-            time_left = expiry_date - current_time
+            raw_expiry = key['expiry_date']
+            if (
+                isinstance(raw_expiry, str) and raw_expiry[10:11] == ' '
+                and not (window_start <= raw_expiry <= window_end)
+            ):
+                continue
+            expiry_date = datetime.fromisoformat(raw_expiry)
+            seconds_left = expiry_date.timestamp() - now_ts
 
-            if time_left.total_seconds() < 0:
+            if seconds_left < 0:
+                continue
+
+            # Часы целые, поэтому условие «mark - 1 < hours_left <= mark» равносильно hours_left == mark
+            hours_mark = int(seconds_left / 3600)
+            bit = _NOTIFY_MARK_BIT.get(hours_mark)
+            if bit is None:
                 continue
 
-            total_hours_left = int(time_left.total_seconds() / 3600)
-            user_id = key['user_id']
             key_id = key['key_id']
+            sent = notified_users.get(key_id, 0)
+            if not sent & bit:
+                await send_subscription_notification(bot, key['user_id'], key_id, hours_mark, expiry_date)
+                notified_users[key_id] = sent | bit
 
-            for hours_mark in NOTIFY_BEFORE_HOURS:
-                if hours_mark - 1 < total_hours_left <= hours_mark:
-                    notified_users.setdefault(user_id, {}).setdefault(key_id, set())
-                    
-                    if hours_mark not in notified_users[user_id][key_id]:
-                        await send_subscription_notification(bot, user_id, key_id, hours_mark, expiry_date)
-                        notified_users[user_id][key_id].add(hours_mark)
-                    break 
-                    
         except Exception as e:
             logger.error(f"Scheduler: Ошибка обработки истечения для ключа {key.get('key_id')}: {e}")
 
 async def sync_keys_with_panels():
     logger.debug("Scheduler: Запускаю синхронизацию с XUI-панелями...")
     total_affected_records = 0
+    # ID пользователей для привязки осиротевших клиентов: загружаются одним запросом при первой необходимости
+    known_user_ids: set[int] | None = None
+    # Ключи, истёкшие раньше этого момента (более 5 дней назад), удаляются
+    purge_before_ts = time.time() - 5 * 24 * 3600
     
-    all_hosts = database.get_all_hosts()
+    all_hosts = _hosts_snapshot()
     if not all_hosts:
         logger.debug("Scheduler: Хосты в базе не настроены. Синхронизация пропущена.")
         return
 
+    # Все ключи одним запросом, сгруппированные по хосту (TRIM как в get_keys_for_host)
+    keys_by_host: dict[str, list[dict]] = {}
+    for k in database.get_all_keys():
+        keys_by_host.setdefault((k.get('host_name') or '').strip(' '), []).append(k)
+
     for host in all_hosts:
         host_name = host['host_name']
         logger.debug(f"Scheduler: Обрабатываю хост: '{host_name}'")
@@ -158,13 +238,12 @@ async def sync_keys_with_panels():
             clients_on_server = {client.email: client for client in (full_inbound_details.settings.clients or [])}
             logger.debug(f"Scheduler: Найдено клиентов на панели '{host_name}': {len(clients_on_server)}")
 
-            keys_in_db = database.get_keys_for_host(host_name)
+            keys_in_db = keys_by_host.get(database.normalize_host_name(host_name).strip(' '), [])
             
             for db_key in keys_in_db:
                 key_email = db_key['key_email']
-                expiry_date = datetime.fromisoformat(db_key['expiry_date'])
-                now = datetime.now()
-                if expiry_date < now - timedelta(days=5):
+                expiry_ts = datetime.fromisoformat(db_key['expiry_date']).timestamp()
+                if expiry_ts < purge_before_ts:
                     logger.debug(f"Scheduler: Ключ '{key_email}' просрочен более 5 дней. Удаляю с панели и из БД.")
                     try:
                         await xui_api.delete_client_on_host(host_name, key_email)
@@ -183,8 +262,7 @@ async def sync_keys_with_panels():
                 if server_client:
                     reset_days = server_client.reset if server_client.reset is not None else 0
                     server_expiry_ms = server_client.expiry_time + reset_days * 24 * 3600 * 1000
-                    local_expiry_dt = expiry_date
-                    local_expiry_ms = int(local_expiry_dt.timestamp() * 1000)
+                    local_expiry_ms = int(expiry_ts * 1000)
 
                     if abs(server_expiry_ms - local_expiry_ms) > 1000:
                         database.update_key_status_from_server(key_email, server_client)
@@ -198,61 +276,47 @@ async def sync_keys_with_panels():
             if clients_on_server:
                 # Try to attach orphan clients from panel to local DB so old keys get subscriptions
                 for orphan_email, orphan_client in clients_on_server.items():
-                    try:
-                        # Extract user_id from email like: user12345-key1-...@telegram.bot
-                        import re
-                        m = re.search(r"user(\d+)", orphan_email)
-                        user_id = int(m.group(1)) if m else None
-                        if not user_id:
-                            logger.warning(
-                                f"Scheduler: Найден осиротевший клиент '{orphan_email}' на '{host_name}', но не удалось определить user_id — пропускаю."
-                            )
-                            continue
-
-                        # Check that user exists
-                        usr = database.get_user(user_id)
-                        if not usr:
-                            logger.warning(
-                                f"Scheduler: Осиротевший клиент '{orphan_email}' указывает на user_id={user_id}, но пользователь не найден — пропускаю."
-                            )
-                            continue
+                    orphan = _build_orphan(orphan_email, orphan_client, host_name)
+                    if orphan is None:
+                        continue
+                    user_id, expiry_ms, client_uuid = orphan
+
+                    # Check that user exists
+                    if known_user_ids is None:
+                        known_user_ids = database.get_all_user_ids()
+                    if user_id not in known_user_ids:
+                        logger.warning(
+                            f"Scheduler: Осиротевший клиент '{orphan_email}' указывает на user_id={user_id}, но пользователь не найден — пропускаю."
+                        )
+                        continue
 
+                    try:
                         # If key already present (race/duplicate), skip insert
-                        existing = database.get_key_by_email(orphan_email)
-                        if existing:
-                            continue
-
-                        reset_days = getattr(orphan_client, 'reset', 0) or 0
-                        expiry_ms = int(getattr(orphan_client, 'expiry_time', 0)) + int(reset_days) * 24 * 3600 * 1000
-                        client_uuid = getattr(orphan_client, 'id', None) or getattr(orphan_client, 'email', None) or ''
-
-                        if not client_uuid:
-                            logger.warning(
-                                f"Scheduler: У осиротевшего клиента '{orphan_email}' нет UUID/id — не могу привязать."
-                            )
+                        if database.get_key_by_email(orphan_email):
                             continue
-
                         new_id = database.add_new_key(
                             user_id=user_id,
                             host_name=host_name,
-                            xui_client_uuid=str(client_uuid),
+                            xui_client_uuid=client_uuid,
                             key_email=orphan_email,
                             expiry_timestamp_ms=expiry_ms,
                         )
-                        if new_id:
-                            logger.info(
-                                f"Scheduler: Осиротевший клиент '{orphan_email}' на '{host_name}' привязан к пользователю {user_id} как key_id={new_id}."
-                            )
-                            total_affected_records += 1
-                        else:
-                            logger.warning(
-                                f"Scheduler: Не удалось привязать осиротевшего клиента '{orphan_email}' на '{host_name}'."
-                            )
                     except Exception as e:
                         logger.error(
                             f"Scheduler: Ошибка при попытке привязать осиротевшего клиента '{orphan_email}' на '{host_name}': {e}",
                             exc_info=True,
                         )
+                        continue
+
+                    if new_id:
+                        logger.info(
+                            f"Scheduler: Осиротевший клиент '{orphan_email}' на '{host_name}' привязан к пользователю {user_id} как key_id={new_id}."
+                        )
+                        total_affected_records += 1
+                    else:
+                        logger.warning(
+                            f"Scheduler: Не удалось привязать осиротевшего клиента '{orphan_email}' на '{host_name}'."
+                        )
 
         except Exception as e:
             logger.error(f"Scheduler: Непредвиденная ошибка при обработке хоста '{host_name}': {e}", exc_info=True)
@@ -263,33 +327,41 @@ async def periodic_subscription_check(bot_controller: BotController):
     logger.info("Scheduler: Планировщик фоновых задач запущен.")
     await asyncio.sleep(10)
 
-    while True:
-        try:
-            await sync_keys_with_panels()
-
-            # Периодические измерения скорости по всем хостам (оба варианта: SSH и сетевой)
-            await _maybe_run_periodic_speedtests()
-            await _maybe_collect_host_metrics()
+    try:
+        while True:
+            # Каждый цикл начинается со свежего списка хостов (мог измениться в панели)
+            invalidate_hosts_cache()
+            try:
+                await sync_keys_with_panels()
 
-            # Ежедневный автобэкап БД с отправкой админам
-            bot = bot_controller.get_bot_instance() if bot_controller.get_status().get("is_running") else None
-            if bot:
-                await _maybe_run_daily_backup(bot)
+                # Периодические измерения скорости по всем хостам (оба варианта: SSH и сетевой)
+                await _maybe_run_periodic_speedtests()
+                await _maybe_collect_host_metrics()
 
-            if bot_controller.get_status().get("is_running"):
-                bot = bot_controller.get_bot_instance()
+                # Ежедневный автобэкап БД с отправкой админам
+                bot = bot_controller.get_bot_instance() if bot_controller.get_status().get("is_running") else None
                 if bot:
-                    await check_expiring_subscriptions(bot)
+                    await _maybe_run_daily_backup(bot)
+
+                if bot_controller.get_status().get("is_running"):
+                    bot = bot_controller.get_bot_instance()
+                    if bot:
+                        await check_expiring_subscriptions(bot)
+                    else:
+                        logger.warning("Scheduler: Бот помечен как запущенный, но экземпляр недоступен.")
                 else:
-                    logger.warning("Scheduler: Бот помечен как запущенный, но экземпляр недоступен.")
-            else:
-                logger.debug("Scheduler: Бот остановлен, уведомления пользователям пропущены.")
+                    logger.debug("Scheduler: Бот остановлен, уведомления пользователям пропущены.")
 
-        except Exception as e:
-            logger.error(f"Scheduler: Необработанная ошибка в основном цикле: {e}", exc_info=True)
+            except Exception as e:
+                logger.error(f"Scheduler: Необработанная ошибка в основном цикле: {e}", exc_info=True)
             
-        logger.info(f"Scheduler: Цикл завершён. Следующая проверка через {CHECK_INTERVAL_SECONDS} сек.")
-        await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+            logger.info(f"Scheduler: Цикл завершён. Следующая проверка через {CHECK_INTERVAL_SECONDS} сек.")
+            await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+    finally:
+        # Планировщик отменён (завершение приложения): освобождаем потоки SSH-опроса
+        _SSH_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        await speedtest_runner.close_session()
+        speedtest_runner.shutdown_executor()
 
 async def _maybe_run_periodic_speedtests():
     global _last_speedtests_run_at
@@ -303,34 +375,36 @@ async def _maybe_run_periodic_speedtests():
         logger.error(f"Scheduler: Ошибка запуска speedtests: {e}", exc_info=True)
 
 async def _run_speedtests_for_all_hosts():
-    hosts = database.get_all_hosts()
+    hosts = _hosts_snapshot()
     if not hosts:
         logger.debug("Scheduler: Нет хостов для измерений скорости.")
         return
     logger.info(f"Scheduler: Запускаю speedtest для {len(hosts)} хост(ов)...")
-    for h in hosts:
-        host_name = h.get('host_name')
-        if not host_name:
-            continue
-        try:
-            logger.info(f"Scheduler: Speedtest для '{host_name}' запущен...")
-            # Ограничим каждый хост таймаутом, чтобы не зависнуть надолго
+    sem = asyncio.Semaphore(SPEEDTEST_CONCURRENCY)
+
+    async def _run_one(host_name: str):
+        async with sem:
             try:
-                async with asyncio.timeout(180):
-                    res = await speedtest_runner.run_both_for_host(host_name)
-            except AttributeError:
-                # Для Python <3.11: fallback через wait_for
-                res = await asyncio.wait_for(speedtest_runner.run_both_for_host(host_name), timeout=180)
-            ok = res.get('ok')
-            err = res.get('error')
-            if ok:
-                logger.info(f"Scheduler: Speedtest для '{host_name}' завершён успешно")
-            else:
-                logger.warning(f"Scheduler: Speedtest для '{host_name}' завершён с ошибками: {err}")
-        except asyncio.TimeoutError:
-            logger.warning(f"Scheduler: Таймаут speedtest для хоста '{host_name}'")
-        except Exception as e:
-            logger.error(f"Scheduler: Ошибка выполнения speedtest для '{host_name}': {e}", exc_info=True)
+                logger.info(f"Scheduler: Speedtest для '{host_name}' запущен...")
+                # Ограничим каждый хост таймаутом, чтобы не зависнуть надолго
+                try:
+                    async with asyncio.timeout(180):
+                        res = await speedtest_runner.run_both_for_host(host_name)
+                except AttributeError:
+                    # Для Python <3.11: fallback через wait_for
+                    res = await asyncio.wait_for(speedtest_runner.run_both_for_host(host_name), timeout=180)
+                ok = res.get('ok')
+                err = res.get('error')
+                if ok:
+                    logger.info(f"Scheduler: Speedtest для '{host_name}' завершён успешно")
+                else:
+                    logger.warning(f"Scheduler: Speedtest для '{host_name}' завершён с ошибками: {err}")
+            except asyncio.TimeoutError:
+                logger.warning(f"Scheduler: Таймаут speedtest для хоста '{host_name}'")
+            except Exception as e:
+                logger.error(f"Scheduler: Ошибка выполнения speedtest для '{host_name}': {e}", exc_info=True)
+
+    await asyncio.gather(*(_run_one(h['host_name']) for h in hosts if h.get('host_name')))
 
 async def _maybe_run_daily_backup(bot: Bot):
     global _last_backup_run_at
@@ -367,55 +441,65 @@ async def _maybe_collect_host_metrics():
     if _last_metrics_run_at and (now - _last_metrics_run_at).total_seconds() < METRICS_INTERVAL_SECONDS:
         return
     
+    # Метрики цикла копятся здесь и записываются в БД одной транзакцией в конце
+    host_rows: list[tuple[str, dict]] = []
+    resource_rows: list[dict] = []
+
     # Собираем локальные метрики
     try:
         local_metrics = await asyncio.wait_for(asyncio.to_thread(resource_monitor.get_local_metrics), timeout=10)
         if local_metrics and local_metrics.get('ok'):
-            database.insert_resource_metric(
-                'local', 'panel',
+            resource_rows.append(dict(
+                scope='local', object_name='panel',
                 cpu_percent=local_metrics.get('cpu_percent'),
                 mem_percent=local_metrics.get('mem_percent'),
                 disk_percent=local_metrics.get('disk_percent'),
                 load1=local_metrics.get('loadavg', {}).get('1m') if local_metrics.get('loadavg') else None,
                 net_bytes_sent=local_metrics.get('network_sent'),
                 net_bytes_recv=local_metrics.get('network_recv'),
-                raw_json=json.dumps(local_metrics, ensure_ascii=False)
-            )
+                raw_json=_dumps_metrics(local_metrics)
+            ))
     except Exception as e:
         logger.error(f"Scheduler: Ошибка сбора локальных метрик: {e}")
     
+    # Закрываем SSH-подключения хостов, которые давно не опрашивались (хост удалён/сменились доступы)
+    try:
+        resource_monitor.close_idle_ssh_connections()
+    except Exception as e:
+        logger.debug(f"Scheduler: Ошибка очистки пула SSH: {e}")
+
     # Собираем метрики хостов
-    hosts = database.get_all_hosts()
-    if not hosts:
-        _last_metrics_run_at = now
-        return
-    for h in hosts:
-        host_name = h.get('host_name')
-        if not host_name:
+    hosts = _hosts_snapshot()
+    ssh_hosts = [h for h in (hosts or []) if h.get('host_name') and h.get('ssh_host') and h.get('ssh_user')]
+    sem = asyncio.Semaphore(METRICS_CONCURRENCY)
+
+    async def _fetch(h: dict):
+        async with sem:
+            fut = asyncio.get_running_loop().run_in_executor(_SSH_EXECUTOR, resource_monitor.get_host_metrics_via_ssh, h)
+            return await asyncio.wait_for(fut, timeout=30)
+
+    # Опрашиваем хосты параллельно
+    results = await asyncio.gather(*(_fetch(h) for h in ssh_hosts), return_exceptions=True)
+    for h, m in zip(ssh_hosts, results):
+        host_name = h['host_name']
+        if isinstance(m, asyncio.TimeoutError):
+            logger.warning(f"Scheduler: Таймаут сбора метрик для хоста '{host_name}'")
             continue
-        if not (h.get('ssh_host') and h.get('ssh_user')):
+        if isinstance(m, BaseException):
+            logger.error(f"Scheduler: Ошибка сбора метрик для '{host_name}': {m}")
             continue
-        try:
-            try:
-                m = await asyncio.wait_for(asyncio.to_thread(resource_monitor.get_host_metrics_via_ssh, h), timeout=30)
-            except AttributeError:
-                m = await asyncio.wait_for(asyncio.to_thread(resource_monitor.get_host_metrics_via_ssh, h), timeout=30)
-            try:
-                database.insert_host_metrics(host_name, m)
-                # Также сохраняем в resource_metrics для графиков
-                if m and m.get('ok'):
-                    database.insert_resource_metric(
-                        'host', host_name,
-                        cpu_percent=m.get('cpu_percent'),
-                        mem_percent=m.get('mem_percent'),
-                        disk_percent=m.get('disk_percent'),
-                        load1=m.get('loadavg', {}).get('1m') if m.get('loadavg') else None,
-                        raw_json=json.dumps(m, ensure_ascii=False)
-                    )
-            except Exception as e:
-                logger.warning(f"Scheduler: insert_host_metrics failed for {host_name}: {e}")
-        except asyncio.TimeoutError:
-            logger.warning(f"Scheduler: Таймаут сбора метрик для хоста '{host_name}'")
-        except Exception as e:
-            logger.error(f"Scheduler: Ошибка сбора метрик для '{host_name}': {e}")
+        host_rows.append((host_name, m))
+        # Также сохраняем в resource_metrics для графиков
+        if m and m.get('ok'):
+            resource_rows.append(dict(
+                scope='host', object_name=host_name,
+                cpu_percent=m.get('cpu_percent'),
+                mem_percent=m.get('mem_percent'),
+                disk_percent=m.get('disk_percent'),
+                load1=m.get('loadavg', {}).get('1m') if m.get('loadavg') else None,
+                raw_json=_dumps_metrics(m)
+            ))
+
+    if not database.insert_metrics_batch(host_rows, resource_rows):
+        logger.warning("Scheduler: Не удалось сохранить метрики цикла")
     _last_metrics_run_at = now
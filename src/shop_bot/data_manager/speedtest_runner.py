@@ -2,15 +2,111 @@ import asyncio
 import json
 import logging
 import re
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 
 import aiohttp
 import paramiko
 
 from shop_bot.data_manager import database
+from shop_bot.data_manager import resource_monitor
 
 logger = logging.getLogger(__name__)
 
+try:
+    # orjson не обязателен: если установлен, вывод speedtest разбирается быстрее
+    from orjson import loads as _json_loads  # type: ignore
+except Exception:
+    _json_loads = json.loads
+
+# Сколько хостов тестируется одновременно (run_both_for_hosts и плановые тесты планировщика):
+# спидтест нагружает канал хоста на десятки секунд, поэтому лимит небольшой.
+# Под SSH-часть — свой пул потоков, чтобы спидтесты не занимали общий executor event loop
+SPEEDTEST_CONCURRENCY = 4
+_SSH_EXECUTOR = ThreadPoolExecutor(max_workers=SPEEDTEST_CONCURRENCY, thread_name_prefix='ssh-speedtest')
+
+# HTTP-сессии для сетевых проб: соединения и DNS переиспользуются между вызовами.
+# Своя сессия на каждый event loop (бот/планировщик и веб-панель, запускающая пробы
+# через asyncio.run в потоках запросов); словарь защищён блокировкой.
+_HTTP_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=5, sock_read=5)
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+_sessions_lock = threading.Lock()
+
+
+async def _on_connection_create_start(session, trace_config_ctx, params) -> None:
+    ctx = trace_config_ctx.trace_request_ctx
+    if isinstance(ctx, dict):
+        ctx['connect_started'] = asyncio.get_running_loop().time()
+
+
+async def _on_connection_create_end(session, trace_config_ctx, params) -> None:
+    ctx = trace_config_ctx.trace_request_ctx
+    if isinstance(ctx, dict) and 'connect_started' in ctx and 'connect_ms' not in ctx:
+        ctx['connect_ms'] = (asyncio.get_running_loop().time() - ctx['connect_started']) * 1000.0
+
+
+def _new_session() -> aiohttp.ClientSession:
+    resolver = None
+    try:
+        import aiodns  # noqa: F401
+        resolver = aiohttp.AsyncResolver()
+    except ImportError:
+        pass
+    connector = aiohttp.TCPConnector(
+        ssl=False,
+        limit=100,
+        limit_per_host=10,
+        ttl_dns_cache=300,
+        keepalive_timeout=75,
+        enable_cleanup_closed=True,
+        resolver=resolver,
+    )
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_start.append(_on_connection_create_start)
+    trace.on_connection_create_end.append(_on_connection_create_end)
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=_HTTP_TIMEOUT,
+        trace_configs=[trace],
+    )
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    with _sessions_lock:
+        session = _sessions.get(loop)
+        if session is None or session.closed:
+            session = _new_session()
+            _sessions[loop] = session
+    return session
+
+
+async def close_session() -> None:
+    """Закрыть HTTP-сессию текущего event loop (при остановке или перед завершением loop)."""
+    loop = asyncio.get_running_loop()
+    with _sessions_lock:
+        session = _sessions.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def shutdown_executor() -> None:
+    """Остановить пул потоков SSH-спидтестов (при завершении приложения)."""
+    _SSH_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+
+
+def run_sync(coro):
+    """asyncio.run для вызовов из синхронного кода: сессия этого loop закрывается вместе с ним."""
+    async def _runner():
+        try:
+            return await coro
+        finally:
+            await close_session()
+    return asyncio.run(_runner())
+
 
 def _parse_host_port_from_url(url: str) -> tuple[str | None, int | None, bool]:
     try:
@@ -25,9 +121,15 @@ def _parse_host_port_from_url(url: str) -> tuple[str | None, int | None, bool]:
         return None, None, False
 
 
+# Ответы на HEAD, после которых пробуем GET (метод не поддерживается или запрещён сервером/CDN)
+_HEAD_UNSUPPORTED_STATUSES = frozenset({403, 405, 501})
+_GET_PROBE_HEADERS = {'Range': 'bytes=0-0'}
+
+
 async def net_probe_for_host(host_row: dict) -> dict:
-    """Lightweight network probe from panel to host_url: TCP connect + HTTP GET / (HEAD).
-    Returns dict with ok, ping_ms (TCP connect time), http_ms, error (if any).
+    """Lightweight network probe from panel to host_url: HTTP HEAD (GET fallback).
+    Returns dict with ok, ping_ms (connection setup time of the same request; time to headers
+    if a pooled connection was reused), http_ms, error (if any).
     """
     url = (host_row.get('host_url') or '').strip()
     target_host, target_port, _ = _parse_host_port_from_url(url)
@@ -47,76 +149,166 @@ async def net_probe_for_host(host_row: dict) -> dict:
         result['error'] = f'Invalid host_url: {url}'
         return result
 
-    # TCP connect timing
     try:
-        loop = asyncio.get_event_loop()
-        start = loop.time()
-        reader, writer = await asyncio.wait_for(
-            asyncio.open_connection(target_host, target_port), timeout=10.0
-        )
-        tcp_ms = (loop.time() - start) * 1000.0
-        result['ping_ms'] = round(tcp_ms, 2)
-        try:
-            writer.close()
-            await writer.wait_closed()
-        except Exception:
-            pass
+        session = await _get_session()
     except Exception as e:
-        result['error'] = f'TCP connect failed: {e}'
+        result['error'] = f'HTTP failed: {e}'
         return result
 
-    # HTTP HEAD/GET timing
+    # HTTP HEAD/GET timing; время установки соединения снимает трассировка сессии.
+    # Время ответа — до заголовков, тело не читаем
+    now = asyncio.get_running_loop().time
+    trace_ctx: dict = {}
+    head_error = None
+    status = None
     try:
-        connector = aiohttp.TCPConnector(ssl=False)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            start = asyncio.get_event_loop().time()
-            async with session.head(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
-                _ = resp.status
-            http_ms = (asyncio.get_event_loop().time() - start) * 1000.0
-            result['http_ms'] = round(http_ms, 2)
+        start = now()
+        async with session.head(url, trace_request_ctx=trace_ctx) as resp:
+            http_ms = (now() - start) * 1000.0
+            status = resp.status
+    except aiohttp.ClientConnectorError as e:
+        result['error'] = f'TCP connect failed: {e}'
+        return result
+    except asyncio.TimeoutError:
+        result['error'] = 'HTTP failed: timeout'
+        return result
+    except Exception as e:
+        head_error = e
+
+    if head_error is None and status not in _HEAD_UNSUPPORTED_STATUSES:
+        result['http_ms'] = round(http_ms, 2)
         result['ok'] = True
-    except Exception:
-        # fallback to GET if HEAD not supported
+    else:
+        # fallback to GET if HEAD not supported: запрашиваем один байт и сразу отпускаем ответ
         try:
-            connector = aiohttp.TCPConnector(ssl=False)
-            async with aiohttp.ClientSession(connector=connector) as session:
-                start = asyncio.get_event_loop().time()
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
-                    _ = await resp.text()
-                http_ms = (asyncio.get_event_loop().time() - start) * 1000.0
-                result['http_ms'] = round(http_ms, 2)
+            start = now()
+            async with session.get(url, headers=_GET_PROBE_HEADERS, trace_request_ctx=trace_ctx) as resp:
+                http_ms = (now() - start) * 1000.0
+                _ = resp.status
+            result['http_ms'] = round(http_ms, 2)
             result['ok'] = True
+        except aiohttp.ClientConnectorError as e:
+            result['error'] = f'TCP connect failed: {e}'
+        except asyncio.TimeoutError:
+            result['error'] = 'HTTP failed: timeout'
         except Exception as e:
             result['error'] = f'HTTP failed: {e}'
+    if 'connect_ms' in trace_ctx:
+        result['ping_ms'] = round(trace_ctx['connect_ms'], 2)
+    elif result['ok']:
+        # Соединение взято тёплым из пула — установки не было; RTT оцениваем по времени до заголовков
+        result['ping_ms'] = result['http_ms']
     return result
 
 
+# JSON в хвосте вывода: сначала пробуем последнюю строку, начинающуюся с '{' (Ookla и
+# speedtest-cli печатают результат одной строкой), регулярку — только как запасной путь
+_JSON_TAIL_RE = re.compile(r"\{.*\}$", re.S)
+_JSON_SCAN_BYTES = 65536
+
+
+def _extract_json(out: bytes) -> dict | None:
+    out = out.strip()
+    if not out:
+        return None
+    pos = out.rfind(b'\n{', max(0, len(out) - _JSON_SCAN_BYTES))
+    start = pos + 1 if pos >= 0 else (0 if out.startswith(b'{') else -1)
+    if start >= 0:
+        try:
+            return _json_loads(out[start:])
+        except ValueError:
+            pass
+    # attempt to extract JSON if there is noise
+    text = out.decode('utf-8', errors='ignore')
+    m = _JSON_TAIL_RE.search(text)
+    try:
+        return _json_loads(m.group(0) if m else text)
+    except ValueError:
+        return None
+
+
 def _ssh_exec_json(ssh: paramiko.SSHClient, commands: list[str]) -> tuple[dict | None, str | None]:
     """Try commands sequentially; expect JSON on stdout. Returns (json_obj, error)."""
     for cmd in commands:
         try:
-            stdin, stdout, stderr = ssh.exec_command(cmd, timeout=120)
-            out = stdout.read().decode('utf-8', errors='ignore')
-            err = stderr.read().decode('utf-8', errors='ignore')
-            if out:
-                out = out.strip()
-                # attempt to extract JSON if there is noise
-                m = re.search(r"\{.*\}$", out, re.S)
-                if m:
-                    out = m.group(0)
-                try:
-                    data = json.loads(out)
-                    return data, None
-                except Exception:
-                    pass
+            _, out, err = resource_monitor.ssh_exec_raw(ssh, cmd, timeout=120)
+            data = _extract_json(out)
+            if data is not None:
+                return data, None
             if err:
-                logger.debug(f"SSH cmd error ({cmd}): {err}")
+                logger.debug(f"SSH cmd error ({cmd}): {err.decode('utf-8', errors='ignore')}")
         except Exception as e:
             logger.debug(f"SSH exec failed for '{cmd}': {e}")
             continue
     return None, 'No JSON output from speedtest commands'
 
 
+# Ookla CLI с построчным прогрессом: фазу upload обрываем, как только скорость стабилизировалась
+_SPEEDTEST_STREAM_CMD = 'speedtest --accept-license --accept-gdpr -p yes -f jsonl'
+_EARLY_STOP_MIN_MS = 3000       # не раньше чем через 3 с после начала upload
+_EARLY_STOP_WINDOW_MS = 2000    # окно, в котором скорость должна держаться ровно
+_EARLY_STOP_TOLERANCE = 0.05    # ±5% от среднего по окну
+_UPLOAD_MAX_MS = 10000          # страховка: дольше 10 с upload не ждём
+
+
+def _stable_bandwidth(samples: list[tuple[float, float]]) -> float | None:
+    """Средняя скорость за последнее окно, если все замеры в нём в пределах допуска, иначе None."""
+    last_ms = samples[-1][0]
+    if last_ms < _EARLY_STOP_MIN_MS or samples[0][0] > last_ms - _EARLY_STOP_WINDOW_MS:
+        return None
+    window = [bw for t, bw in samples if t >= last_ms - _EARLY_STOP_WINDOW_MS]
+    if len(window) < 3:
+        return None
+    avg = sum(window) / len(window)
+    if all(abs(bw - avg) <= _EARLY_STOP_TOLERANCE * avg for bw in window):
+        return avg
+    return None
+
+
+def _ssh_speedtest_streaming(ssh: paramiko.SSHClient) -> dict | None:
+    """Запустить Ookla CLI с прогрессом и собрать результат в формате его JSON.
+    Download проходит целиком, upload обрывается досрочно (закрытие канала — процесс
+    получает SIGPIPE на следующей строке прогресса). None, если прогресса в выводе нет.
+    """
+    transport = ssh.get_transport()
+    if transport is None or not transport.is_active():
+        return None
+    chan = transport.open_session(timeout=20)
+    try:
+        chan.settimeout(120)
+        chan.exec_command(_SPEEDTEST_STREAM_CMD)
+        data: dict = {}
+        upload: list[tuple[float, float]] = []
+        for raw in chan.makefile('r'):
+            line = raw.strip()
+            if not line.startswith('{'):
+                continue
+            try:
+                event = _json_loads(line)
+            except ValueError:
+                continue
+            kind = event.get('type')
+            if kind == 'result':
+                return event
+            if kind == 'testStart':
+                data['server'] = event.get('server') or {}
+            elif kind in ('ping', 'download'):
+                data[kind] = event.get(kind) or {}
+            elif kind == 'upload':
+                up = event.get('upload') or {}
+                data['upload'] = up
+                if up.get('elapsed') is None or not up.get('bandwidth'):
+                    continue
+                upload.append((float(up['elapsed']), float(up['bandwidth'])))
+                stable = _stable_bandwidth(upload)
+                if stable is not None or upload[-1][0] >= _UPLOAD_MAX_MS:
+                    data['upload'] = {'bandwidth': stable if stable is not None else upload[-1][1]}
+                    return data
+        return data if (data.get('download') or {}).get('bandwidth') else None
+    finally:
+        chan.close()
+
+
 def _parse_ookla_json(data: dict) -> dict:
     # Ookla CLI JSON format (-f json)
     try:
@@ -173,43 +365,35 @@ async def ssh_speedtest_for_host(host_row: dict) -> dict:
         'error': None,
     }
     ssh_host = (host_row.get('ssh_host') or '').strip()
-    ssh_port = int(host_row.get('ssh_port') or 22)
     ssh_user = (host_row.get('ssh_user') or '').strip()
-    ssh_password = host_row.get('ssh_password')
-    ssh_key_path = (host_row.get('ssh_key_path') or '').strip() or None
 
     if not ssh_host or not ssh_user:
         result['error'] = 'SSH settings are not configured for host'
         return result
 
     def _run_ssh() -> dict:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        if ssh_key_path:
-            pkey = None
+        # Подключение берётся из общего пула SSH (тот же, что у мониторинга ресурсов)
+        ssh = resource_monitor.acquire_ssh(host_row)
+        try:
+            data, err = None, None
             try:
-                pkey = paramiko.RSAKey.from_private_key_file(ssh_key_path)
-            except Exception:
-                try:
-                    pkey = paramiko.Ed25519Key.from_private_key_file(ssh_key_path)
-                except Exception:
-                    pkey = None
-            ssh.connect(ssh_host, port=ssh_port, username=ssh_user, password=ssh_password, pkey=pkey, timeout=20)
-        else:
-            ssh.connect(ssh_host, port=ssh_port, username=ssh_user, password=ssh_password, timeout=20)
-
-        # Prefer Ookla CLI json format
-        data, err = _ssh_exec_json(ssh, [
-            # Ookla CLI with auto-accept (new flags)
-            'speedtest --accept-license --accept-gdpr -f json',
-            'speedtest --accept-license --accept-gdpr --format=json',
-            # Fallbacks without flags (на случай старых версий, уже принявших лицензию)
-            'speedtest -f json',
-            'speedtest --format=json',
-            # Python speedtest-cli (sivel)
-            'speedtest-cli --json'
-        ])
-        ssh.close()
+                data = _ssh_speedtest_streaming(ssh)
+            except Exception as e:
+                logger.debug(f"Streaming speedtest failed on '{host_row.get('host_name')}': {e}")
+            if not data:
+                # Prefer Ookla CLI json format
+                data, err = _ssh_exec_json(ssh, [
+                    # Ookla CLI with auto-accept (new flags)
+                    'speedtest --accept-license --accept-gdpr -f json',
+                    'speedtest --accept-license --accept-gdpr --format=json',
+                    # Fallbacks without flags (на случай старых версий, уже принявших лицензию)
+                    'speedtest -f json',
+                    'speedtest --format=json',
+                    # Python speedtest-cli (sivel)
+                    'speedtest-cli --json'
+                ])
+        finally:
+            resource_monitor.release_ssh(host_row, ssh)
         if data:
             parsed = _parse_ookla_json(data)
             if not parsed.get('download_mbps') and 'download' in data:
@@ -219,8 +403,8 @@ async def ssh_speedtest_for_host(host_row: dict) -> dict:
         return {'ok': False, 'error': err or 'unknown'}
 
     try:
-        loop = asyncio.get_event_loop()
-        out = await loop.run_in_executor(None, _run_ssh)
+        loop = asyncio.get_running_loop()
+        out = await loop.run_in_executor(_SSH_EXECUTOR, _run_ssh)
         result.update(out)
     except Exception as e:
         result['error'] = str(e)
@@ -228,114 +412,183 @@ async def ssh_speedtest_for_host(host_row: dict) -> dict:
     return result
 
 
-async def run_and_store_net_probe(host_name: str) -> dict:
+# Строки хостов на несколько секунд: run_both_for_host и пачки тестов читают один хост
+# по нескольку раз подряд
+_HOST_CACHE_TTL_SECONDS = 5
+_host_cache: dict[str, tuple[float, dict]] = {}
+
+
+def _get_host_cached(host_name: str) -> dict | None:
+    now = time.monotonic()
+    hit = _host_cache.get(host_name)
+    if hit is not None and now - hit[0] < _HOST_CACHE_TTL_SECONDS:
+        return hit[1]
     host = database.get_host(host_name)
+    if host:
+        _host_cache[host_name] = (now, host)
+    else:
+        _host_cache.pop(host_name, None)
+    return host
+
+
+# Последний успешный результат сетевой пробы по хосту: повторные запуски в пределах TTL
+# отдают его без запроса в сеть и без новой записи в БД
+_NET_PROBE_TTL_SECONDS = 30
+_net_probe_cache: dict[str, tuple[float, dict]] = {}
+
+
+def _speedtest_row(host_name: str, method: str, res: dict) -> dict:
+    """Аргументы database.insert_host_speedtest для результата теста."""
+    return {
+        'host_name': host_name,
+        'method': method,
+        'ping_ms': res.get('ping_ms'),
+        'jitter_ms': res.get('jitter_ms'),
+        'download_mbps': res.get('download_mbps'),
+        'upload_mbps': res.get('upload_mbps'),
+        'server_name': res.get('server_name'),
+        'server_id': res.get('server_id'),
+        'ok': bool(res.get('ok')),
+        'error': res.get('error'),
+    }
+
+
+async def _net_probe_row(host_name: str, force: bool = False) -> tuple[dict, dict | None]:
+    """Результат сетевой пробы и строка для БД (None — писать нечего: кэш или нет хоста)."""
+    hit = None if force else _net_probe_cache.get(host_name)
+    if hit is not None and time.monotonic() - hit[0] < _NET_PROBE_TTL_SECONDS:
+        return hit[1], None
+    host = _get_host_cached(host_name)
     if not host:
-        return {'ok': False, 'error': 'host not found'}
+        return {'ok': False, 'error': 'host not found'}, None
     res = await net_probe_for_host(host)
-    database.insert_host_speedtest(
-        host_name=host_name,
-        method='net',
-        ping_ms=res.get('ping_ms'),
-        jitter_ms=res.get('jitter_ms'),
-        download_mbps=res.get('download_mbps'),
-        upload_mbps=res.get('upload_mbps'),
-        server_name=res.get('server_name'),
-        server_id=res.get('server_id'),
-        ok=bool(res.get('ok')),
-        error=res.get('error'),
-    )
-    return res
+    if res.get('ok'):
+        _net_probe_cache[host_name] = (time.monotonic(), res)
+    return res, _speedtest_row(host_name, 'net', res)
 
 
-async def run_and_store_ssh_speedtest(host_name: str) -> dict:
-    host = database.get_host(host_name)
+async def _ssh_speedtest_row(host_name: str) -> tuple[dict, dict | None]:
+    host = _get_host_cached(host_name)
     if not host:
-        return {'ok': False, 'error': 'host not found'}
+        return {'ok': False, 'error': 'host not found'}, None
     res = await ssh_speedtest_for_host(host)
-    database.insert_host_speedtest(
-        host_name=host_name,
-        method='ssh',
-        ping_ms=res.get('ping_ms'),
-        jitter_ms=res.get('jitter_ms'),
-        download_mbps=res.get('download_mbps'),
-        upload_mbps=res.get('upload_mbps'),
-        server_name=res.get('server_name'),
-        server_id=res.get('server_id'),
-        ok=bool(res.get('ok')),
-        error=res.get('error'),
-    )
+    return res, _speedtest_row(host_name, 'ssh', res)
+
+
+async def run_and_store_net_probe(host_name: str, force: bool = False) -> dict:
+    res, row = await _net_probe_row(host_name, force)
+    if row:
+        database.insert_host_speedtest(**row)
+    return res
+
+
+async def run_and_store_ssh_speedtest(host_name: str) -> dict:
+    res, row = await _ssh_speedtest_row(host_name)
+    if row:
+        database.insert_host_speedtest(**row)
     return res
 
 
-async def run_both_for_host(host_name: str) -> dict:
+async def _run_both(host_name: str, force: bool = False) -> tuple[dict, list[dict]]:
     ok = True
     errors: list[str] = []
     out = {'ssh': None, 'net': None}
-    try:
-        out['ssh'] = await run_and_store_ssh_speedtest(host_name)
-        if not out['ssh'].get('ok'):
+    rows: list[dict] = []
+    # Проба и SSH-спидтест независимы: запускаем одновременно. HTTP-проба успевает
+    # завершиться, пока speedtest на хосте ещё выбирает сервер и меряет пинг.
+    results = await asyncio.gather(
+        _ssh_speedtest_row(host_name),
+        _net_probe_row(host_name, force),
+        return_exceptions=True,
+    )
+    for kind, item in zip(('ssh', 'net'), results):
+        if isinstance(item, BaseException):
             ok = False
-            if out['ssh'].get('error'):
-                errors.append(f"ssh: {out['ssh'].get('error')}")
-    except Exception as e:
-        ok = False
-        errors.append(f'ssh exception: {e}')
-    try:
-        out['net'] = await run_and_store_net_probe(host_name)
-        if not out['net'].get('ok'):
+            errors.append(f'{kind} exception: {item}')
+            continue
+        res, row = item
+        if row:
+            rows.append(row)
+        out[kind] = res
+        if not res.get('ok'):
             ok = False
-            if out['net'].get('error'):
-                errors.append(f"net: {out['net'].get('error')}")
-    except Exception as e:
-        ok = False
-        errors.append(f'net exception: {e}')
-    return {'ok': ok, 'details': out, 'error': '; '.join(errors) if errors else None}
+            if res.get('error'):
+                errors.append(f"{kind}: {res.get('error')}")
+    return {'ok': ok, 'details': out, 'error': '; '.join(errors) if errors else None}, rows
 
 
-def _ssh_connect(host_row: dict) -> paramiko.SSHClient:
-    ssh_host = (host_row.get('ssh_host') or '').strip()
-    ssh_port = int(host_row.get('ssh_port') or 22)
-    ssh_user = (host_row.get('ssh_user') or '').strip()
-    ssh_password = host_row.get('ssh_password')
-    ssh_key_path = (host_row.get('ssh_key_path') or '').strip() or None
-    if not ssh_host or not ssh_user:
-        raise RuntimeError('SSH settings are not configured for host')
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    pkey = None
-    if ssh_key_path:
-        try:
-            pkey = paramiko.RSAKey.from_private_key_file(ssh_key_path)
-        except Exception:
-            try:
-                pkey = paramiko.Ed25519Key.from_private_key_file(ssh_key_path)
-            except Exception:
-                pkey = None
-    ssh.connect(ssh_host, port=ssh_port, username=ssh_user, password=ssh_password, pkey=pkey, timeout=20)
-    return ssh
+async def run_both_for_host(host_name: str, force: bool = False) -> dict:
+    """SSH-спидтест и сетевая проба хоста; force=True — не брать пробу из кэша (ручной запуск)."""
+    out, rows = await _run_both(host_name, force)
+    database.insert_host_speedtests_batch(rows)
+    return out
+
+
+async def run_both_for_hosts(host_names: list[str], concurrency: int = SPEEDTEST_CONCURRENCY, force: bool = False) -> dict[str, dict]:
+    """run_both_for_host для нескольких хостов параллельно (не больше concurrency одновременно).
+    Результаты всех хостов записываются в БД одной транзакцией в конце.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(name: str) -> tuple[dict, list[dict]]:
+        async with sem:
+            return await _run_both(name, force)
+
+    results = await asyncio.gather(*(_one(n) for n in host_names), return_exceptions=True)
+    out: dict[str, dict] = {}
+    rows: list[dict] = []
+    for name, item in zip(host_names, results):
+        if isinstance(item, BaseException):
+            out[name] = {'ok': False, 'details': {'ssh': None, 'net': None}, 'error': str(item)}
+            continue
+        out[name] = item[0]
+        rows.extend(item[1])
+    database.insert_host_speedtests_batch(rows)
+    return out
+
+
+# Установка Ookla CLI 1.2.0 из tarball: uname -m сопоставляется с именем архива на самом хосте.
+# set -x пишет выполняемые команды в stderr для лога; после ===VERIFY=== — путь к бинарю
+# (или NO) и вывод --version
+_OOKLA_TARBALL_INSTALL_SCRIPT = """set -x
+case "$(uname -m)" in
+  x86_64|amd64) T=linux-x86_64 ;;
+  aarch64|arm64) T=linux-aarch64 ;;
+  armv7l) T=linux-armhf ;;
+  *) T=linux-x86_64 ;;
+esac
+URL="https://install.speedtest.net/app/cli/ookla-speedtest-1.2.0-$T.tgz"
+curl -fsSL "$URL" -o /tmp/ookla-speedtest.tgz || wget -O /tmp/ookla-speedtest.tgz "$URL"
+mkdir -p /tmp/ookla-speedtest && tar -xf /tmp/ookla-speedtest.tgz -C /tmp/ookla-speedtest
+install -m 0755 /tmp/ookla-speedtest/speedtest /usr/local/bin/speedtest || (cp /tmp/ookla-speedtest/speedtest /usr/local/bin/speedtest && chmod +x /usr/local/bin/speedtest)
+speedtest --accept-license --accept-gdpr --version || true
+rm -rf /tmp/ookla-speedtest /tmp/ookla-speedtest.tgz
+set +x
+echo ===VERIFY===
+command -v speedtest || echo NO
+speedtest --version 2>&1 || true
+"""
 
 
 def _ssh_exec(ssh: paramiko.SSHClient, cmd: str, timeout: int = 180) -> tuple[int, str, str]:
-    stdin, stdout, stderr = ssh.exec_command(cmd, timeout=timeout)
-    out = stdout.read().decode('utf-8', errors='ignore')
-    err = stderr.read().decode('utf-8', errors='ignore')
-    rc = stdout.channel.recv_exit_status() if hasattr(stdout, 'channel') else 0
-    return rc, out, err
+    """Выполнить команду установки через общий resource_monitor.ssh_exec_raw (болтливые
+    apt/pip не упираются в заполненный буфер одного из потоков)."""
+    rc, out, err = resource_monitor.ssh_exec_raw(ssh, cmd, timeout=timeout)
+    return rc, out.decode('utf-8', errors='ignore'), err.decode('utf-8', errors='ignore')
 
 
 async def auto_install_speedtest_on_host(host_name: str) -> dict:
     """Attempt to auto-install Ookla speedtest or speedtest-cli on remote host via SSH.
     Tries package manager scripts, falls back to pip speedtest-cli. Returns {'ok', 'log'}.
     """
-    host = database.get_host(host_name)
+    host = _get_host_cached(host_name)
     if not host:
         return {'ok': False, 'log': 'host not found'}
 
     def _install() -> dict:
         log_lines: list[str] = []
         try:
-            ssh = _ssh_connect(host)
+            ssh = resource_monitor.acquire_ssh(host)
         except Exception as e:
             return {'ok': False, 'log': f'SSH connect failed: {e}'}
         try:
@@ -366,38 +619,16 @@ async def auto_install_speedtest_on_host(host_name: str) -> dict:
             log_lines.append('OS detection: ' + out.strip())
 
             # Сначала: УСТАНОВКА ЧЕРЕЗ TARBALL СТРОГОЙ ВЕРСИИ 1.2.0 (предпочтительно)
-            # Detect arch
-            rc, arch_out, _ = _ssh_exec(ssh, 'uname -m || echo unknown')
-            arch = (arch_out or '').strip()
-            # Map to Ookla naming
-            if arch in ('x86_64', 'amd64'):
-                arch_tag = 'linux-x86_64'
-            elif arch in ('aarch64', 'arm64'):
-                arch_tag = 'linux-aarch64'
-            elif arch in ('armv7l',):
-                arch_tag = 'linux-armhf'
-            else:
-                arch_tag = 'linux-x86_64'
-            tar_url = f'https://install.speedtest.net/app/cli/ookla-speedtest-1.2.0-{arch_tag}.tgz'
-            cmds_tar = [
-                f'curl -fsSL {tar_url} -o /tmp/ookla-speedtest.tgz || wget -O /tmp/ookla-speedtest.tgz {tar_url}',
-                'mkdir -p /tmp/ookla-speedtest && tar -xf /tmp/ookla-speedtest.tgz -C /tmp/ookla-speedtest',
-                'install -m 0755 /tmp/ookla-speedtest/speedtest /usr/local/bin/speedtest || (cp /tmp/ookla-speedtest/speedtest /usr/local/bin/speedtest && chmod +x /usr/local/bin/speedtest)',
-                # Принятие лицензии сразу после установки бинаря (идемпотентно)
-                'speedtest --accept-license --accept-gdpr --version || true',
-                'rm -rf /tmp/ookla-speedtest /tmp/ookla-speedtest.tgz'
-            ]
-            for c in cmds_tar:
-                rc, o, e = _ssh_exec(ssh, c)
-                log_lines.append(f'$ {c}\n{o}{e}'.strip())
+            # Архитектура, загрузка, установка и проверка версии — одним скриптом на хосте
+            rc, o, e = _ssh_exec(ssh, _OOKLA_TARBALL_INSTALL_SCRIPT)
+            install_out, _, verify_out = o.partition('===VERIFY===')
+            log_lines.append(f'$ <ookla tarball install>\n{e}{install_out}'.strip())
 
             # Verify version is exactly 1.2.0
-            rc, out, err = _ssh_exec(ssh, 'command -v speedtest || echo "NO"')
-            if 'NO' not in out:
-                rcv, ov, ev = _ssh_exec(ssh, 'speedtest --version 2>&1 || true')
-                ver_info = (ov + ev).strip()
+            bin_path, _, ver_info = verify_out.strip().partition('\n')
+            if bin_path and 'NO' not in bin_path:
                 if '1.2.0' in ver_info:
-                    log_lines.append('Installed Ookla speedtest via tarball (1.2.0): ' + out.strip())
+                    log_lines.append('Installed Ookla speedtest via tarball (1.2.0): ' + bin_path.strip())
                     return {'ok': True, 'log': '\n'.join(log_lines)}
                 else:
                     log_lines.append('Tarball install finished but version check did not return 1.2.0; continuing fallbacks.')
@@ -460,10 +691,7 @@ async def auto_install_speedtest_on_host(host_name: str) -> dict:
 
             return {'ok': False, 'log': 'Failed to install speedtest using available methods.\n' + '\n'.join(log_lines)}
         finally:
-            try:
-                ssh.close()
-            except Exception:
-                pass
+            resource_monitor.release_ssh(host, ssh)
 
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, _install)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_SSH_EXECUTOR, _install)
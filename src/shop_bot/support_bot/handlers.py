@@ -24,6 +24,7 @@ from shop_bot.data_manager.database import (
     ban_user,
     unban_user,
 )
+from shop_bot.bot.middlewares import add_banned, remove_banned
 
 logger = logging.getLogger(__name__)
 
@@ -754,10 +755,15 @@ def get_support_router() -> Router:
         except Exception:
             currently_banned = False
         try:
+            # Множество забаненных обновляем только после успешной записи в БД
             if currently_banned:
-                unban_user(user_id)
+                if not unban_user(user_id):
+                    raise RuntimeError("ошибка базы данных")
+                remove_banned(user_id)
             else:
-                ban_user(user_id)
+                if not ban_user(user_id):
+                    raise RuntimeError("ошибка базы данных")
+                add_banned(user_id)
         except Exception as e:
             await callback.message.answer(f"❌ Не удалось обновить статус блокировки: {e}")
             return
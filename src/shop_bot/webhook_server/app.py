@@ -23,6 +23,7 @@ logging.getLogger('werkzeug').setLevel(logging.WARNING)
 from shop_bot.modules import xui_api
 from shop_bot.bot import handlers
 from shop_bot.bot import keyboards
+from shop_bot.bot.middlewares import add_banned, remove_banned, load_ban_set
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from shop_bot.support_bot_controller import SupportBotController
 from shop_bot.data_manager import speedtest_runner
@@ -938,12 +939,12 @@ def create_webhook_app(bot_controller_instance):
         method = (request.form.get('method') or '').strip().lower()
         try:
             if method == 'ssh':
-                res = asyncio.run(speedtest_runner.run_and_store_ssh_speedtest(host_name))
+                res = speedtest_runner.run_sync(speedtest_runner.run_and_store_ssh_speedtest(host_name))
             elif method == 'net':
-                res = asyncio.run(speedtest_runner.run_and_store_net_probe(host_name))
+                res = speedtest_runner.run_sync(speedtest_runner.run_and_store_net_probe(host_name, force=True))
             else:
                 # both
-                res = asyncio.run(speedtest_runner.run_both_for_host(host_name))
+                res = speedtest_runner.run_sync(speedtest_runner.run_both_for_host(host_name, force=True))
         except Exception as e:
             res = {'ok': False, 'error': str(e)}
         wants_json = 'application/json' in (request.headers.get('Accept') or '') or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
@@ -978,18 +979,17 @@ def create_webhook_app(bot_controller_instance):
             hosts = []
         errors = []
         ok_count = 0
-        for h in hosts:
-            name = h.get('host_name')
-            if not name:
-                continue
-            try:
-                res = asyncio.run(speedtest_runner.run_both_for_host(name))
-                if res and res.get('ok'):
-                    ok_count += 1
-                else:
-                    errors.append(f"{name}: {res.get('error') if res else 'unknown'}")
-            except Exception as e:
-                errors.append(f"{name}: {e}")
+        names = [h['host_name'] for h in hosts if h.get('host_name')]
+        try:
+            results = speedtest_runner.run_sync(speedtest_runner.run_both_for_hosts(names, force=True))
+        except Exception as e:
+            results = {}
+            errors.append(str(e))
+        for name, res in results.items():
+            if res and res.get('ok'):
+                ok_count += 1
+            else:
+                errors.append(f"{name}: {res.get('error') if res else 'unknown'}")
 
         wants_json = 'application/json' in (request.headers.get('Accept') or '') or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
         if wants_json:
@@ -1006,7 +1006,7 @@ def create_webhook_app(bot_controller_instance):
     def auto_install_speedtest_route(host_name: str):
         # Supports both HTML form and AJAX
         try:
-            res = asyncio.run(speedtest_runner.auto_install_speedtest_on_host(host_name))
+            res = speedtest_runner.run_sync(speedtest_runner.auto_install_speedtest_on_host(host_name))
         except Exception as e:
             res = {'ok': False, 'log': str(e)}
         wants_json = 'application/json' in (request.headers.get('Accept') or '') or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
@@ -1339,6 +1339,7 @@ def create_webhook_app(bot_controller_instance):
                 file.save(dest_path)
                 ok = backup_manager.restore_from_file(dest_path)
             if ok:
+                load_ban_set(database.get_banned_user_ids())
                 flash('Восстановление выполнено успешно.', 'success')
             else:
                 flash('Восстановление не удалось. Проверьте файл и повторите.', 'danger')
@@ -1527,7 +1528,10 @@ def create_webhook_app(bot_controller_instance):
     @flask_app.route('/users/ban/<int:user_id>', methods=['POST'])
     @login_required
     def ban_user_route(user_id):
-        ban_user(user_id)
+        if not ban_user(user_id):
+            flash(f'Не удалось заблокировать пользователя {user_id}: ошибка базы данных.', 'danger')
+            return redirect(url_for('users_page'))
+        add_banned(user_id)
         flash(f'Пользователь {user_id} был заблокирован.', 'success')
         # Telegram-уведомление пользователю о бане с кнопкой поддержки (без кнопки "Назад в меню")
         try:
@@ -1574,7 +1578,10 @@ def create_webhook_app(bot_controller_instance):
     @flask_app.route('/users/unban/<int:user_id>', methods=['POST'])
     @login_required
     def unban_user_route(user_id):
-        unban_user(user_id)
+        if not unban_user(user_id):
+            flash(f'Не удалось разблокировать пользователя {user_id}: ошибка базы данных.', 'danger')
+            return redirect(url_for('users_page'))
+        remove_banned(user_id)
         flash(f'Пользователь {user_id} был разблокирован.', 'success')
         # Telegram-уведомление пользователю о разбане с кнопкой перехода в главное меню
         try:
@@ -1988,6 +1995,7 @@ def create_webhook_app(bot_controller_instance):
                 from shop_bot.data_manager.database import create_button_config
                 button_id = create_button_config(data)
                 if button_id:
+                    keyboards.invalidate_button_configs()
                     return jsonify({"success": True, "id": button_id})
                 else:
                     return jsonify({"success": False, "error": "Failed to create button config"}), 500
@@ -2013,6 +2021,7 @@ def create_webhook_app(bot_controller_instance):
                 from shop_bot.data_manager.database import update_button_config
                 success = update_button_config(button_id, data)
                 if success:
+                    keyboards.invalidate_button_configs()
                     return jsonify({"success": True})
                 else:
                     return jsonify({"success": False, "error": "Button config not found or update failed"}), 404
@@ -2024,6 +2033,7 @@ def create_webhook_app(bot_controller_instance):
                 from shop_bot.data_manager.database import delete_button_config
                 success = delete_button_config(button_id)
                 if success:
+                    keyboards.invalidate_button_configs()
                     return jsonify({"success": True})
                 else:
                     return jsonify({"success": False, "error": "Button config not found"}), 404
@@ -2039,6 +2049,7 @@ def create_webhook_app(bot_controller_instance):
             from shop_bot.data_manager.database import reorder_button_configs
             success = reorder_button_configs(menu_type, button_orders)
             if success:
+                keyboards.invalidate_button_configs(menu_type)
                 return jsonify({"success": True})
             else:
                 return jsonify({"success": False, "error": "Failed to reorder buttons"}), 500
@@ -2053,6 +2064,7 @@ def create_webhook_app(bot_controller_instance):
             from shop_bot.data_manager.database import force_button_migration
             success = force_button_migration()
             if success:
+                keyboards.invalidate_button_configs()
                 return jsonify({"success": True, "message": "Миграция кнопок выполнена успешно"})
             else:
                 return jsonify({"success": False, "error": "Миграция не удалась"}), 500
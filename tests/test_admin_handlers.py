@@ -0,0 +1,24 @@
+import pytest
+
+from shop_bot.bot.admin_handlers import _BALANCE_PICK_USER_RE
+
+
+@pytest.mark.parametrize("data, expected", [
+    ("admin_add_balance_123", ("add", "123")),
+    ("admin_deduct_balance_pick_user_45", ("deduct", "45")),
+    ("admin_add_balance_pick_user_7", ("add", "7")),
+])
+def test_balance_pick_user_callback_matches(data, expected):
+    """Один обработчик для начисления и списания: из списка и из карточки пользователя"""
+    assert _BALANCE_PICK_USER_RE.match(data).groups() == expected
+
+
+@pytest.mark.parametrize("data", [
+    "admin_add_balance_",
+    "admin_add_balance_pick_user_",
+    "admin_refund_balance_1",
+    "admin_add_balance_12x",
+])
+def test_balance_pick_user_callback_rejects_other_data(data):
+    """Чужие и неполные callback_data не перехватываются"""
+    assert _BALANCE_PICK_USER_RE.match(data) is None
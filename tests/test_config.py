@@ -0,0 +1,15 @@
+import pytest
+
+from shop_bot.config import parse_bool
+
+
+@pytest.mark.parametrize("value", ["true", "True", " 1 ", "yes", "ON", "y", "t", True, 1])
+def test_parse_bool_true_values(value):
+    """Все принятые в настройках варианты «включено» дают True"""
+    assert parse_bool(value) is True
+
+
+@pytest.mark.parametrize("value", ["false", "0", "no", "off", "", "enabled", None, False, 0])
+def test_parse_bool_false_values(value):
+    """Всё остальное, включая None и пустую строку, — False"""
+    assert parse_bool(value) is False
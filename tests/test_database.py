@@ -0,0 +1,30 @@
+import sqlite3
+
+from shop_bot.data_manager import database
+
+
+def _is_banned(user_id):
+    with sqlite3.connect(database.DB_FILE) as conn:
+        return conn.execute("SELECT is_banned FROM users WHERE telegram_id = ?", (user_id,)).fetchone()[0]
+
+
+def test_ban_unban_report_success(tmp_path, monkeypatch):
+    """ban_user/unban_user возвращают True после записи в БД"""
+    monkeypatch.setattr(database, "DB_FILE", tmp_path / "users.db")
+    database.initialize_db()
+    with sqlite3.connect(database.DB_FILE) as conn:
+        conn.execute("INSERT INTO users (telegram_id, username) VALUES (5, 'u')")
+
+    assert database.ban_user(5) is True
+    assert _is_banned(5) == 1
+    assert database.unban_user(5) is True
+    assert _is_banned(5) == 0
+
+
+def test_ban_unban_report_db_error(tmp_path, monkeypatch):
+    """При ошибке БД возвращается False, чтобы вызывающий не трогал множество забаненных"""
+    # Каталог вместо файла: sqlite не сможет открыть БД
+    monkeypatch.setattr(database, "DB_FILE", tmp_path)
+
+    assert database.ban_user(5) is False
+    assert database.unban_user(5) is False
@@ -0,0 +1,24 @@
+from unittest.mock import patch
+
+from shop_bot.bot import keyboards
+
+
+def _cfg(button_id, text, row, col=0, sort=0, width=2):
+    return {
+        'button_id': button_id, 'text': text, 'callback_data': f"cb_{text}", 'url': None,
+        'button_width': width, 'row_position': row, 'column_position': col, 'sort_order': sort,
+    }
+
+
+def test_db_keyboard_keeps_config_order_on_ties():
+    """Кнопки с одинаковыми позицией и sort_order идут в порядке конфигов, дубли button_id отбрасываются"""
+    configs = [
+        _cfg(None, "unnamed", row=0),
+        _cfg("b", "named", row=0),
+        _cfg("b", "duplicate", row=0),
+        _cfg("a", "first_row", row=-1),
+    ]
+    with patch.object(keyboards, "_get_button_configs_cached", return_value=configs):
+        markup = keyboards._build_keyboard_from_db("main_menu")
+
+    assert [[b.text for b in row] for row in markup.inline_keyboard] == [["first_row"], ["unnamed"], ["named"]]
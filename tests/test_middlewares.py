@@ -0,0 +1,15 @@
+from shop_bot.bot import middlewares
+
+
+def test_ban_set_load_add_remove():
+    """Множество забаненных заменяется при загрузке и поддерживается при ban/unban"""
+    middlewares.load_ban_set(["1", 2])
+    assert middlewares._BANNED_IDS == {1, 2}
+
+    middlewares.add_banned("3")
+    middlewares.remove_banned(1)
+    middlewares.remove_banned(999)
+    assert middlewares._BANNED_IDS == {2, 3}
+
+    middlewares.load_ban_set([])
+    assert middlewares._BANNED_IDS == set()
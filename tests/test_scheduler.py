@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+
+from shop_bot.data_manager.scheduler import _build_orphan, _extract_user_id
+
+
+def test_extract_user_id_standard_and_legacy_emails():
+    """user_id из стандартного email ключа и из нестандартного формата"""
+    assert _extract_user_id("user12345-key1-abcd@telegram.bot") == 12345
+    assert _extract_user_id("trial_user777@telegram.bot") == 777
+    assert _extract_user_id("someone@example.com") is None
+
+
+def test_build_orphan_adds_reset_days_to_expiry():
+    """Срок осиротевшего клиента продлевается на reset дней, UUID берётся из id"""
+    client = SimpleNamespace(id="uuid-1", email="user42-key1@telegram.bot", expiry_time=1_000, reset=2)
+
+    assert _build_orphan(client.email, client, "host-a") == (42, 1_000 + 2 * 24 * 3600 * 1000, "uuid-1")
+
+
+def test_build_orphan_skips_unlinkable_clients():
+    """Без user_id в email или без id/email клиента привязать нельзя"""
+    assert _build_orphan("noid@example.com", SimpleNamespace(id="uuid-1"), "host-a") is None
+    assert _build_orphan("user42@telegram.bot", SimpleNamespace(id=None, email=None), "host-a") is None
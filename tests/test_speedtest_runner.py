@@ -1,8 +1,10 @@
 import pytest
 import asyncio
+import threading
 from unittest.mock import patch, AsyncMock, MagicMock
 import aiohttp
-from shop_bot.data_manager.speedtest_runner import net_probe_for_host
+from shop_bot.data_manager import speedtest_runner
+from shop_bot.data_manager.speedtest_runner import net_probe_for_host, _extract_json, _stable_bandwidth
 
 
 @pytest.fixture
@@ -64,6 +66,8 @@ async def test_net_probe_for_host_ssl_disabled_success(mock_tcp_connection):
             assert result['ok'] is True, f"Функция должна вернуть ok=True, но вернула {result}"
             assert 'http_ms' in result
             assert result['http_ms'] is not None
+            # Событий установки соединения не было (как у тёплого соединения из пула) — ping по времени ответа
+            assert result['ping_ms'] == result['http_ms']
 
 
 @pytest.mark.asyncio
@@ -112,13 +116,41 @@ async def test_net_probe_for_host_ssl_disabled_fallback_to_get(mock_tcp_connecti
             with patch('aiohttp.TCPConnector', side_effect=capture_connector):
                 result = await net_probe_for_host(host_row)
             
-            # Проверяем что SSL был отключен в обоих случаях (HEAD и GET fallback)
-            assert len(connector_captured) >= 2, "Должно быть создано минимум 2 connector'а (для HEAD и GET)"
-            assert all(ssl is False for ssl in connector_captured), "Все connector'ы должны иметь ssl=False"
+            # HEAD и GET fallback идут через одну общую сессию; SSL в ней отключен
+            assert mock_session.call_count == 1, "HEAD и GET должны использовать одну сессию"
+            assert len(connector_captured) == 1, f"Должен быть создан один connector, создано {len(connector_captured)}"
+            assert connector_captured[0] is False, "SSL должен быть отключен (ssl=False)"
+            mock_session_instance.head.assert_called_once()
+            mock_session_instance.get.assert_called_once()
             assert result['ok'] is True
             assert 'http_ms' in result
 
 
+def _response_cm(status):
+    response = MagicMock()
+    response.status = status
+    cm = MagicMock()
+    cm.__aenter__ = AsyncMock(return_value=response)
+    cm.__aexit__ = AsyncMock(return_value=False)
+    return cm
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("head_status", [403, 405, 501])
+async def test_net_probe_for_host_falls_back_to_get_on_rejected_head(head_status):
+    """HEAD, отклонённый сервером или CDN (403/405/501), повторяется через GET на один байт"""
+    session = MagicMock()
+    session.head = MagicMock(return_value=_response_cm(head_status))
+    session.get = MagicMock(return_value=_response_cm(206))
+
+    with patch.object(speedtest_runner, '_get_session', AsyncMock(return_value=session)):
+        result = await net_probe_for_host({'host_url': 'https://example.com'})
+
+    session.get.assert_called_once()
+    assert session.get.call_args.kwargs['headers'] == {'Range': 'bytes=0-0'}
+    assert result['ok'] is True
+
+
 @pytest.mark.asyncio
 async def test_net_probe_for_host_invalid_url():
     """Тест обработки невалидного URL"""
@@ -149,3 +181,63 @@ async def test_net_probe_for_host_tcp_connection_failed():
     assert result['ok'] is False
     assert 'error' in result
     assert 'TCP connect failed' in result['error']
+
+
+@pytest.mark.asyncio
+async def test_session_reused_within_loop_and_recreated_after_close():
+    """В пределах одного event loop сессия общая; close_session закрывает её"""
+    first = await speedtest_runner._get_session()
+    second = await speedtest_runner._get_session()
+    assert first is second
+
+    await speedtest_runner.close_session()
+    assert first.closed
+
+    third = await speedtest_runner._get_session()
+    assert third is not first
+    await speedtest_runner.close_session()
+    assert third.closed
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_per_loop():
+    """У другого event loop своя сессия; run_sync закрывает только её"""
+    own = await speedtest_runner._get_session()
+    other = []
+
+    thread = threading.Thread(
+        target=lambda: other.append(speedtest_runner.run_sync(speedtest_runner._get_session()))
+    )
+    thread.start()
+    thread.join()
+
+    assert other[0] is not own
+    assert other[0].closed
+    assert not own.closed
+    await speedtest_runner.close_session()
+
+
+def test_extract_json_takes_last_json_line_after_noise():
+    """Из вывода с прогрессом и предупреждениями берётся JSON из последней строки"""
+    out = b'[warn] license accepted\n{"type": "log"}\nprogress...\n{"ping": {"latency": 12.5}}\n'
+    assert _extract_json(out) == {"ping": {"latency": 12.5}}
+
+
+def test_extract_json_without_json():
+    """Пустой вывод и текст без JSON дают None"""
+    assert _extract_json(b"") is None
+    assert _extract_json(b"speedtest: command not found") is None
+
+
+def test_stable_bandwidth_detects_plateau():
+    """Ровная скорость в окне после минимального времени — возвращается среднее"""
+    samples = [(t, 1000.0 if t < 1500 else 5000.0) for t in range(0, 4001, 250)]
+    assert _stable_bandwidth(samples) == pytest.approx(5000.0)
+
+
+def test_stable_bandwidth_rejects_early_or_unstable_samples():
+    """Слишком рано или скорость в окне скачет — None"""
+    early = [(t, 5000.0) for t in range(0, 2001, 250)]
+    unstable = [(t, 5000.0 if (t // 250) % 2 else 4000.0) for t in range(0, 4001, 250)]
+    assert _stable_bandwidth(early) is None
+    assert _stable_bandwidth(unstable) is None
@@ -0,0 +1,92 @@
+import asyncio
+import sqlite3
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from shop_bot.data_manager import database
+from shop_bot.bot import admin_handlers
+
+
+def _drain_pool():
+    """Закрывает соединения пула, открытые к предыдущему файлу БД"""
+    while not database._conn_pool.empty():
+        database._conn_pool.get_nowait().close()
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Временная БД с тремя пользователями: баланс выше порога, ровно порог и ниже порога"""
+    _drain_pool()
+    monkeypatch.setattr(database, "DB_FILE", tmp_path / "users.db")
+    database.initialize_db()
+    with sqlite3.connect(database.DB_FILE) as conn:
+        conn.executemany(
+            "INSERT INTO users (telegram_id, username, referral_balance, referral_balance_all) VALUES (?, ?, ?, ?)",
+            [(1, "rich", 250.0, 400.0), (2, "edge", 100.0, 100.0), (3, "poor", 40.0, 40.0)],
+        )
+    yield database.DB_FILE
+    _drain_pool()
+
+
+def _balances(db_file):
+    with sqlite3.connect(db_file) as conn:
+        return dict(conn.execute("SELECT telegram_id, referral_balance FROM users").fetchall())
+
+
+def test_bulk_zeroes_only_users_above_threshold(temp_db):
+    """Смешанные балансы и неизвестный ID: обнуляются только найденные пользователи с балансом >= порога"""
+    zeroed, existing = database.zero_referral_balances_bulk([1, 2, 3, 999], min_balance=100)
+
+    assert zeroed == {1: 250.0, 2: 100.0}
+    assert existing == {1, 2, 3}
+    assert _balances(temp_db) == {1: 0.0, 2: 0.0, 3: 40.0}
+
+
+def test_bulk_repeat_call_does_not_pay_twice(temp_db):
+    """Повторное подтверждение уже обнулённого пользователя ничего не выплачивает"""
+    database.zero_referral_balances_bulk([1], min_balance=100)
+
+    zeroed, existing = database.zero_referral_balances_bulk([1], min_balance=100)
+
+    assert zeroed == {}
+    assert existing == {1}
+
+
+def test_bulk_without_threshold_and_empty_input(temp_db):
+    """Без порога обнуляются все найденные; пустой список не трогает БД"""
+    assert database.zero_referral_balances_bulk([]) == ({}, set())
+
+    zeroed, existing = database.zero_referral_balances_bulk([3, 3, 999])
+
+    assert zeroed == {3: 40.0}
+    assert existing == {3}
+
+
+@pytest.mark.asyncio
+async def test_batched_approvals_report_each_outcome(temp_db):
+    """Пакет подтверждений: выплата, дубль, низкий баланс и неизвестный пользователь"""
+    with patch.object(admin_handlers, "_notify", new_callable=AsyncMock) as notify:
+        futures = [admin_handlers._enqueue_withdraw_approval(None, uid) for uid in (1, 1, 3, 999)]
+        results = await asyncio.gather(*futures)
+        await admin_handlers.shutdown_withdraw_approvals()
+
+    assert results == [
+        (250.0, None),
+        (None, admin_handlers.WITHDRAW_ALREADY_PROCESSED_MSG),
+        (None, admin_handlers.WITHDRAW_LOW_BALANCE_MSG),
+        (None, admin_handlers.WITHDRAW_USER_NOT_FOUND_MSG),
+    ]
+    assert notify.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_shutdown_flushes_pending_approvals(temp_db):
+    """Остановка бота дообрабатывает подтверждения, ещё ждущие окна пакета"""
+    with patch.object(admin_handlers, "_notify", new_callable=AsyncMock):
+        future = admin_handlers._enqueue_withdraw_approval(None, 2)
+        await admin_handlers.shutdown_withdraw_approvals()
+
+    assert future.result() == (100.0, None)
+    assert admin_handlers._approve_flusher is None
+    assert _balances(temp_db)[2] == 0.0